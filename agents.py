@@ -1,10 +1,11 @@
+import asyncio
+import contextvars
 import os
 from datetime import datetime
-from langchain import hub
 from langchain.agents import Tool, AgentExecutor
 from langchain.agents.format_scratchpad import format_log_to_str
 from langchain.agents.output_parsers import ReActSingleInputOutputParser
-from langchain.memory import ChatMessageHistory, ConversationBufferWindowMemory
+from langchain.memory import ChatMessageHistory
 from langchain.tools.render import render_text_description
 from langchain.utilities import DuckDuckGoSearchAPIWrapper
 from langchain_google_genai import (
@@ -14,16 +15,17 @@ from langchain_google_genai import (
 )
 import streamlit as st
 
-from planing_tools import weatherapi_forecast_periods, query_rag
-from calendar_tools import list_calendar_list, list_calendar_events, insert_calendar_event, create_calendar
+from planing_tools import weatherapi_forecast_range, query_rag, list_attractions, optimize_itinerary
+from calendar_tools import list_calendar_list, list_calendar_events, insert_calendar_event, insert_calendar_events, create_calendar
+from lazy_init import lazy_resource, pull_prompt
+from llm_cache import get_llm_cache
+from multi_action import PARALLEL_TOOLS_INSTRUCTIONS, ReActMultiActionOutputParser
+from sessions import AgentSession, AgentSessionRegistry
+from conversation_memory import TokenBudgetMemory
+from search_service import SearchService
+from tracing import Trace, TracingCallbackHandler, activate
 from dotenv import load_dotenv
 
-hoje = datetime.today()
-
-data_formatada = hoje.strftime("%Y/%m/%d")
-# Pega o dia da semana em inglês
-dia_da_semana_ingles = hoje.strftime("%A")
-
 # Dicionário para mapear os dias da semana de inglês para português
 dias_da_semana_pt = {
     "Monday": "segunda-feira",
@@ -35,50 +37,93 @@ dias_da_semana_pt = {
     "Sunday": "domingo"
 }
 
-# Traduz o dia da semana para português
-dia_da_semana_pt = dias_da_semana_pt.get(dia_da_semana_ingles, dia_da_semana_ingles)
 
-# Formata a data para utilizar no prompt
-data_atual = f"{dia_da_semana_pt}, {data_formatada}"
+def get_data_atual():
+    """
+    Formata a data de hoje para utilizar no prompt (ex.: "sábado, 2025/08/02").
+
+    Calculada a cada chamada para continuar correta em servidores de longa duração.
+    """
+    hoje = datetime.today()
+    data_formatada = hoje.strftime("%Y/%m/%d")
+    # Pega o dia da semana em inglês e traduz para português
+    dia_da_semana_ingles = hoje.strftime("%A")
+    dia_da_semana_pt = dias_da_semana_pt.get(dia_da_semana_ingles, dia_da_semana_ingles)
+    return f"{dia_da_semana_pt}, {data_formatada}"
+
 
 load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv('GOOGLE_API_KEY')
-os.environ["LANGCHAIN_API_KEY"] = os.getenv('LANGCHAIN_API_KEY')
-
-llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    convert_system_message_to_human=True,
-    handle_parsing_errors=True,
-    temperature=0.6,
-    max_tokens= 1000,
-    safety_settings = {
-        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
-        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_ONLY_HIGH,
-        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
-        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
-    },
-)
+
+# Reaproveita respostas do LLM para prompts idênticos (ex.: nova tentativa de um turno).
+# Desligado por padrão: com temperatura 0.6, repetir a resposta nem sempre é desejado.
+LLM_CACHE_AGENTS = os.getenv("LLM_CACHE_AGENTS") == "1"
+# O AgentExecutor chama o LLM por `stream`, que não consulta o cache do LangChain.
+# Com o cache ligado, os agentes usam `invoke` e a resposta final deixa de
+# aparecer token a token na interface.
+AGENT_STREAM_RUNNABLE = not LLM_CACHE_AGENTS
+
+
+@lazy_resource("Gemini LLM")
+def get_llm():
+    return ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash",
+        convert_system_message_to_human=True,
+        handle_parsing_errors=True,
+        temperature=0.6,
+        max_tokens= 1000,
+        cache=get_llm_cache("agentes") if LLM_CACHE_AGENTS else None,
+        safety_settings = {
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_ONLY_HIGH,
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
+        },
+    )
+
+# Destino da conversa atual. Por ser uma ContextVar, continua visível nas threads
+# em que o AgentExecutor roda as ferramentas no modo paralelo.
+destino_atual = contextvars.ContextVar("destino_atual", default=None)
+
+
+# Sessão (memória e executores) da conversa em andamento
+sessao_atual = contextvars.ContextVar("sessao_atual", default=None)
+
+
+def get_destino():
+    return destino_atual.get() or st.session_state.selected_destino
+
 
 def transfer_to_calendar_agent(input_str):
-    return calendar_agent_executor.invoke({"input": input_str})
+    return get_current_session().calendar_executor.invoke({"input": input_str})
 def transfer_to_travel_agent(input_str):
-    return travel_agent_executor.invoke({"input": input_str})
+    return get_current_session().travel_executor.invoke({"input": input_str})
+
+
+@lazy_resource("DuckDuckGo search")
+def get_ddg_search():
+    return DuckDuckGoSearchAPIWrapper()
+
+
+@lazy_resource("Search service")
+def get_search_service():
+    # Cache, deduplicação e prazo máximo em volta do DuckDuckGo
+    return SearchService(get_ddg_search())
 
-ddg_search = DuckDuckGoSearchAPIWrapper()
 
 travel_planing_tools = [
     Tool(
         name="DuckDuckGo Search",
-        func=ddg_search.run,
+        func=lambda query: get_search_service().search(query, get_destino()),
         description="""Essa ferramenta DEVE ser utilizada para buscar eventos relevantes no período fornecido pelo usuário. 
         Ela é útil para obter informações sobre eventos ou atividades especiais que estão acontecendo na cidade de destino nas datas que o usuário informou. 
-        O modelo deve usá-la para complementar as sugestões de atividades."""
+        O modelo deve usá-la para complementar as sugestões de atividades.
+        Para pesquisar vários assuntos de uma vez, informe uma busca por linha ou separe-as com ";"."""
     ),
     Tool(
         name="Weather Forecast",
-        func=lambda date_string: weatherapi_forecast_periods(date_string, st.session_state.selected_destino),
+        func=lambda date_range: weatherapi_forecast_range(date_range, get_destino()),
         description="""Esta ferramenta DEVE ser usada obrigatoriamente *antes* de gerar o roteiro turístico, e somente após coletar todas as informações necessárias do usuário, incluindo o intervalo exato de datas. 
-        A consulta do clima deve ser feita separadamente para cada dia do período informado, garantindo que as atividades planejadas no roteiro sejam compatíveis com as condições climáticas previstas. 
+        A consulta do clima deve ser feita em uma única chamada para todo o período informado, garantindo que as atividades planejadas no roteiro sejam compatíveis com as condições climáticas previstas. 
 
         **Quando usar:**
         - O clima é um fator relevante para a definição de atividades no roteiro.
@@ -86,31 +131,43 @@ travel_planing_tools = [
 
         **Instruções:**
         1. Certifique-se de coletar as datas exatas do período solicitado pelo usuário.
-        2. Consulte a previsão do tempo para cada dia separadamente no intervalo de datas fornecido.
+        2. Consulte a previsão do tempo informando a data inicial e a data final do período, no formato "yyyy/mm/dd - yyyy/mm/dd". Para um único dia, informe apenas a data. A previsão cobre no máximo os próximos 14 dias.
         3. Use o resultado da previsão para ajustar o planejamento das atividades de acordo com as condições climáticas.
 
         **Exemplo de uso:**
-        - Entrada do usuário: "Planeje um roteiro entre os dias 1º de agosto e 4 de março."
-        - Ações do modelo:
-            Action input: 2025/08/01
-            Action input: 2025/08/02
-            Action input: 2025/08/03
-            Action input: 2025/08/04
+        - Entrada do usuário: "Planeje um roteiro entre os dias 1º e 4 de agosto."
+        - Ação do modelo:
+            Action input: 2025/08/01 - 2025/08/04
     """
     ),
+    Tool(
+        name="Itinerary Optimizer",
+        func=lambda tool_input: optimize_itinerary(tool_input, get_destino()),
+        description="""Monta em milissegundos a distribuição das atrações pelos dias e períodos (Manhã, Tarde, Noite) da viagem,
+        ordenando as visitas pela menor distância e evitando atividades ao ar livre nos períodos com chance alta de chuva.
+        Use-a depois da Weather Forecast, em vez de decidir sozinho a ordem das atividades, e complete o roteiro com o resultado.
+        Entrada: o intervalo de datas e os interesses do usuário separados por ";".
+        - Exemplo: 2025/08/01 - 2025/08/03; praias e museus"""
+    ),
     Tool(
         name="Query RAG",
-        func=lambda query_text: query_rag(query_text, st.session_state.selected_destino),
+        func=lambda query_text: query_rag(query_text, get_destino()),
         description="""Esta ferramenta deve ser usada quando o modelo souber a cidade de destino e os interesses do usuário, com o objetivo de fornecer informações sobre pontos turísticos e atrações que se alinham com esses interesses. 
         O modelo deve utilizar essa ferramenta para sugerir atividades e lugares específicos a visitar, baseados na cidade e nos interesses fornecidos."""
     ),
+    Tool(
+        name="List Attractions",
+        func=lambda interest: list_attractions(interest, get_destino()),
+        description="""Lista rapidamente os pontos turísticos do destino, com categoria, duração típica, bairro e se são ao ar livre.
+        Use-a para escolher as atrações do roteiro a partir dos interesses do usuário (ex.: "praias e trilhas", "museus", "dia de chuva")
+        e recorra à ferramenta Query RAG apenas para detalhes de uma atração específica."""
+    ),
     Tool(
         name="Calendar Agent",
         func=transfer_to_calendar_agent,
         description="Esse agente lida com tudo relacionado ao calendário. As mensagens enviadas a ele devem estar em Português."
     ),
 ]
-from calendar_tools import list_calendar_list, list_calendar_events, insert_calendar_event, create_calendar
 
 google_calendar_tools = [
     Tool(
@@ -140,6 +197,7 @@ google_calendar_tools = [
         Você precisa fornecer o ID do calendário e, opcionalmente, o número máximo de eventos a serem listados.
         - Exemplo de uso para o calendário principal: forneça 'primary' como o ID do calendário.
         - Exemplo de uso com limite: forneça o ID do calendário e o número máximo de eventos, como 'primary', 20.
+        - Exemplo de uso com período: forneça o ID, o máximo e as datas de início e fim, como 'primary', 20, 2025-08-01, 2025-08-05.
         - Para listar eventos de um calendário específico, primeiro liste seus calendários para encontrar o ID correto.
         """
     ),
@@ -197,57 +255,217 @@ google_calendar_tools = [
 
         No final forneça o link para o calendário google: [https://www.google.com/calendar]
     """
+    ),
+    Tool(
+    name="Insert Calendar Events",
+    func=insert_calendar_events,
+    description="""
+        Use a função Insert Calendar Events para adicionar **vários eventos de uma só vez** a um calendário Google,
+        por exemplo todas as atividades de um roteiro de viagem. Prefira esta função à 'Insert Calendar Event'
+        sempre que houver mais de um evento para agendar.
+
+        **Formato de entrada esperado:**
+        Uma descrição completa em linguagem natural **por linha**, seguindo as mesmas regras da função
+        'Insert Calendar Event' (calendar_id, o que, quando, onde). Todos os eventos são criados em uma única chamada.
+
+        **Exemplo de uso**
+
+        *Agente:* (Chama 'Insert Calendar Events' com a Action Input:
+        "Visita ao Forte dos Reis Magos no calendário abc123 em 2025/08/01 das 9h às 11h.
+        Almoço no restaurante Camarões no calendário abc123 em 2025/08/01 das 12h às 13h30.")
+
+        O resultado traz, para cada evento, o status ("criado" ou "erro"), o título, o início e o link.
+        Informe ao usuário quais eventos foram criados e quais falharam.
+
+        No final forneça o link para o calendário google: [https://www.google.com/calendar]
+    """
     )
 ]
 
-travel_planing_prompt = hub.pull("tales/agente_turismo")
-google_calendar_prompt = hub.pull("tales/agente_calendario")
+@lazy_resource("Prompt tales/agente_turismo")
+def get_planing_prompt():
+    return pull_prompt("tales/agente_turismo").partial(
+        tools=render_text_description(travel_planing_tools),
+        tool_names=", ".join([t.name for t in travel_planing_tools]),
+    )
 
-llm_with_stop = llm.bind(stop=["\nObservation"])
 
-planing_prompt = travel_planing_prompt.partial(
-    tools=render_text_description(travel_planing_tools),
-    tool_names=", ".join([t.name for t in travel_planing_tools]),
-)
+@lazy_resource("Prompt tales/agente_turismo (paralelo)")
+def get_parallel_planing_prompt():
+    return pull_prompt("tales/agente_turismo").partial(
+        tools=render_text_description(travel_planing_tools) + PARALLEL_TOOLS_INSTRUCTIONS,
+        tool_names=", ".join([t.name for t in travel_planing_tools]),
+    )
 
-calendar_prompt = google_calendar_prompt.partial(
-    tools=render_text_description(google_calendar_tools),
-    tool_names=", ".join([t.name for t in google_calendar_tools]),
-)
 
-history = ChatMessageHistory()
-memory = ConversationBufferWindowMemory(
-    k=20, 
-    chat_memory=history, 
-    memory_key="chat_history",
-    input_key="input",
-    other_memory_key=["destino"])
-
-travel_planing_agent = (
-    {
-        "input": lambda x: x["input"],
-        "destino": lambda x: x.get("destino"),
-        "agent_scratchpad": lambda x: format_log_to_str(x["intermediate_steps"]),
-        "chat_history": lambda x: x["chat_history"],
-        "data_atual": lambda x: data_atual,
-    }
-    | planing_prompt
-    | llm_with_stop
-    | ReActSingleInputOutputParser()
-)
+@lazy_resource("Prompt tales/agente_calendario")
+def get_calendar_prompt():
+    return pull_prompt("tales/agente_calendario").partial(
+        tools=render_text_description(google_calendar_tools),
+        tool_names=", ".join([t.name for t in google_calendar_tools]),
+    )
+
+
+def create_memory():
+    """
+    Cria a memória de uma conversa: as trocas recentes ficam na íntegra e as
+    antigas são resumidas pelo LLM quando o histórico passa do orçamento de tokens.
+    """
+    history = ChatMessageHistory()
+    return TokenBudgetMemory(
+        llm=get_llm(),
+        chat_memory=history,
+        memory_key="chat_history",
+        input_key="input",
+        output_key="output")
+
+
+def build_travel_planing_agent(prompt, output_parser):
+    llm_with_stop = get_llm().bind(stop=["\nObservation"])
+
+    return (
+        {
+            "input": lambda x: x["input"],
+            "destino": lambda x: x.get("destino"),
+            "agent_scratchpad": lambda x: format_log_to_str(x["intermediate_steps"]),
+            "chat_history": lambda x: x["chat_history"],
+            "data_atual": lambda x: get_data_atual(),
+        }
+        | prompt
+        | llm_with_stop
+        | output_parser
+    )
+
+
+# Os agentes (prompt | LLM | parser) não guardam estado e são compartilhados por
+# todas as sessões; cada sessão só cria executores leves com a sua memória.
+@lazy_resource("Travel planing agent")
+def get_travel_planing_agent():
+    return build_travel_planing_agent(get_planing_prompt(), ReActSingleInputOutputParser())
+
+
+@lazy_resource("Parallel travel planing agent")
+def get_parallel_travel_planing_agent():
+    """
+    Variante do agente de viagem em que o modelo pode pedir várias ferramentas
+    independentes na mesma etapa (ex.: clima, RAG e busca). As chamadas são
+    executadas concorrentemente pelo `AgentExecutor.ainvoke` e as observações
+    voltam juntas ao modelo, reduzindo o número de idas e voltas ao LLM.
+    """
+    return build_travel_planing_agent(get_parallel_planing_prompt(), ReActMultiActionOutputParser())
+
+
+@lazy_resource("Google calendar agent")
+def get_google_calendar_agent():
+    llm_with_stop = get_llm().bind(stop=["\nObservation"])
+
+    return (
+        {
+            "input": lambda x: x["input"],
+            "agent_scratchpad": lambda x: format_log_to_str(x["intermediate_steps"]),
+            "chat_history": lambda x: x["chat_history"],
+            "data_atual": lambda x: get_data_atual(),
+        }
+        | get_calendar_prompt()
+        | llm_with_stop
+        | ReActSingleInputOutputParser()
+    )
+
+
+def create_agent_session(session_id: str, history=()) -> AgentSession:
+    """
+    Cria a memória e os executores de uma conversa. Os agentes de viagem e de
+    calendário da mesma conversa compartilham a memória, como antes.
+
+    `history` são as mensagens que a interface já mostra; se a sessão tinha sido
+    descartada por inatividade, a memória é reconstruída a partir delas.
+    """
+    memory = create_memory()
+    if history:
+        memory.load_history(history)
+    return AgentSession(
+        session_id,
+        memory=memory,
+        travel_executor=AgentExecutor(agent=get_travel_planing_agent(), tools=travel_planing_tools, verbose=True, memory=memory, handle_parsing_errors=True, stream_runnable=AGENT_STREAM_RUNNABLE),
+        parallel_travel_executor=AgentExecutor(agent=get_parallel_travel_planing_agent(), tools=travel_planing_tools, verbose=True, memory=memory, handle_parsing_errors=True, stream_runnable=AGENT_STREAM_RUNNABLE),
+        calendar_executor=AgentExecutor(agent=get_google_calendar_agent(), tools=google_calendar_tools, verbose=True, memory=memory, stream_runnable=AGENT_STREAM_RUNNABLE),
+    )
+
+
+session_registry = AgentSessionRegistry(create_agent_session)
+
+
+@lazy_resource("Default agent session")
+def get_default_session():
+    # Sessão usada fora do Streamlit (scripts, notebook) e pelos nomes antigos do módulo
+    return create_agent_session("default")
+
+
+def get_current_session() -> AgentSession:
+    return sessao_atual.get() or get_default_session()
+
+
+def get_memory():
+    return get_default_session().memory
+
+
+def get_travel_agent_executor():
+    return get_default_session().travel_executor
+
+
+def get_parallel_travel_agent_executor():
+    return get_default_session().parallel_travel_executor
+
+
+def get_calendar_agent_executor():
+    return get_default_session().calendar_executor
+
+
+def run_travel_agent(input_text: str, destino: str, parallel: bool = False, callbacks=None, session_id: str = None, history=()) -> dict:
+    """
+    Executa o agente de viagem para uma mensagem do usuário.
+
+    Args:
+        parallel (bool): Se True, usa o modo com várias ferramentas por etapa.
+        callbacks (list, opcional): Handlers que recebem os eventos da execução,
+            como o `StreamlitAgentCallbackHandler` que transmite a resposta.
+        session_id (str, opcional): O id da sessão do Streamlit. Cada sessão tem
+            memória e executores próprios; sem id, usa a sessão padrão do processo.
+        history (list, opcional): As mensagens anteriores exibidas na interface,
+            usadas para reconstruir a memória de uma sessão descartada por inatividade.
+
+    O tempo de cada chamada ao LLM, ferramenta e operação interna do turno fica
+    em um `Trace`, guardado em `session.traces` e exportado para `TRACE_FILE`.
+    """
+    session = session_registry.get(session_id, history) if session_id else get_default_session()
+    destino_token = destino_atual.set(destino)
+    sessao_token = sessao_atual.set(session)
+    trace = Trace("Travel agent", session_id=session.session_id, destino=destino, parallel=parallel)
+    try:
+        inputs = {"input": input_text, "destino": destino}
+        config = {"callbacks": [*(callbacks or []), TracingCallbackHandler(trace)]}
+        # Execuções de sessões diferentes rodam em paralelo; a mesma sessão, uma por vez
+        with session.lock, activate(trace):
+            if parallel:
+                return asyncio.run(session.parallel_travel_executor.ainvoke(inputs, config=config))
+            return session.travel_executor.invoke(inputs, config=config)
+    finally:
+        trace.finish()
+        session.traces.append(trace)
+        sessao_atual.reset(sessao_token)
+        destino_atual.reset(destino_token)
+
+
+# Nomes antigos do módulo, resolvidos sob demanda (ex.: `from agents import travel_agent_executor`)
+_LAZY_ATTRIBUTES = {
+    "llm": get_llm,
+    "memory": get_memory,
+    "travel_agent_executor": get_travel_agent_executor,
+    "calendar_agent_executor": get_calendar_agent_executor,
+}
 
-travel_agent_executor = AgentExecutor(agent=travel_planing_agent, tools=travel_planing_tools, verbose=True, memory=memory, handle_parsing_errors=True)
-
-google_calendar_agent = (
-    {
-        "input": lambda x: x["input"],
-        "agent_scratchpad": lambda x: format_log_to_str(x["intermediate_steps"]),
-        "chat_history": lambda x: x["chat_history"],
-        "data_atual": lambda x: data_atual,
-    }
-    | calendar_prompt
-    | llm_with_stop
-    | ReActSingleInputOutputParser()
-)
 
-calendar_agent_executor = AgentExecutor(agent=google_calendar_agent, tools=google_calendar_tools, verbose=True, memory=memory)
\ No newline at end of file
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,12 @@
 import streamlit as st
-from agents import travel_agent_executor
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from agents import run_travel_agent, session_registry
+from lazy_init import format_startup_report
+from llm_cache import llm_cache_report
+from planing_tools import preload_chroma_dbs
+from streaming import StreamlitAgentCallbackHandler
+from tracing import format_summary
 from unidecode import unidecode
-import chromadb
 
 DESTINOS = {
     "Natal": "natal",
@@ -9,12 +14,23 @@ DESTINOS = {
     "Pipa": "pipa"
 }
 
+
+@st.cache_resource
+def carregar_bancos_vetoriais():
+    # Executado uma única vez por processo, compartilhado entre as sessões
+    return preload_chroma_dbs(DESTINOS.values())
+
 if __name__ == '__main__':
 
     st.title('Agente Turístico')
+    carregar_bancos_vetoriais()
     st.sidebar.title('Escolha um destino')
     
     destino_selecionado = st.sidebar.selectbox('Destino', list(DESTINOS.keys()))
+    ferramentas_em_paralelo = st.sidebar.toggle(
+        'Ferramentas em paralelo',
+        help='Permite que o agente consulte clima, RAG e busca ao mesmo tempo em cada etapa.'
+    )
     
     if destino_selecionado:
         st.write(f"Você selecionou {destino_selecionado}")
@@ -27,19 +43,57 @@ if __name__ == '__main__':
         with st.chat_message(message['role']):
             st.markdown(message['content'])
 
+    session_id = get_script_run_ctx().session_id
+
     if prompt := st.chat_input('Digite a sua mensagem.'):
+        # Histórico exibido antes desta mensagem: reconstrói a memória se a sessão foi descartada
+        historico = list(st.session_state.messages)
         st.session_state.messages.append({'role': 'user', 'content': prompt})
 
         with st.chat_message('user', avatar='🧑‍💻'):
             st.markdown(prompt)
 
         with st.chat_message('ai', avatar='🤖'):
+            # Mostra o andamento das ferramentas e os tokens da resposta à medida que chegam
+            status = st.status('Pensando…')
+            resposta_placeholder = st.empty()
+            streaming_handler = StreamlitAgentCallbackHandler(status, resposta_placeholder)
+
             # Passa o destino selecionado como contexto para o agente
-            response = travel_agent_executor.invoke({
-                "input": prompt,
-                "destino": unidecode(DESTINOS[destino_selecionado].lower())
-            })
+            response = run_travel_agent(
+                prompt,
+                unidecode(DESTINOS[destino_selecionado].lower()),
+                parallel=ferramentas_em_paralelo,
+                callbacks=[streaming_handler],
+                session_id=session_id,
+                history=historico
+            )
             agent_response = response['output']
-            st.markdown(agent_response)
+            status.update(label='Resposta pronta', state='complete', expanded=False)
+            resposta_placeholder.markdown(agent_response)
 
         st.session_state.messages.append({'role': 'assistant', 'content': agent_response})
+
+    # A sessão do agente só é criada ao enviar uma mensagem, não a cada rerun
+    sessao = session_registry.peek(session_id)
+    uso_de_tokens = sessao.memory.token_usage if sessao else None
+    if uso_de_tokens:
+        st.sidebar.caption(
+            f"Histórico no prompt: {uso_de_tokens['history_tokens']} tokens "
+            f"({uso_de_tokens['recent_messages']} mensagens recentes + resumo de {uso_de_tokens['summary_tokens']} tokens)"
+        )
+
+    with st.sidebar.expander('Inicialização'):
+        st.text(format_startup_report())
+
+    relatorio_cache = llm_cache_report()
+    if relatorio_cache:
+        with st.sidebar.expander('Cache do LLM'):
+            for cadeia, metricas in relatorio_cache.items():
+                st.text(f"{cadeia}: {metricas['hits']} acertos, {metricas['misses']} faltas ({metricas['hit_rate']:.0%})")
+
+    if sessao and sessao.traces:
+        with st.sidebar.expander('Tempo por turno'):
+            for numero, trace in reversed(list(enumerate(sessao.traces, 1))):
+                st.caption(f"Turno {numero}")
+                st.text(format_summary(trace.summary()))
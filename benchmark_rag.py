@@ -0,0 +1,404 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from unidecode import unidecode
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESULTS_PATH = "benchmark_results"
+OFFLINE_DIM = 512
+OFFLINE_MODEL = f"benchmark/hashing-{OFFLINE_DIM}"
+
+# Consultas rotuladas: (destino, consulta, termo que deve aparecer em algum chunk retornado).
+# Parte delas vem de guias que não estão em `pdf/` (ebook de Natal, guia da CVC,
+# inventário de Caicó); sem esses guias na base, elas são puladas (`answerable_queries`).
+LABELED_QUERIES = [
+    ("natal", "Forte dos Reis Magos", "reis magos"),
+    ("natal", "horário de visita do forte", "reis magos"),
+    ("natal", "praia urbana com calçadão e barracas", "ponta negra"),
+    ("natal", "duna famosa que não pode ser escalada", "morro do careca"),
+    ("natal", "Teatro Alberto Maranhão", "alberto maranhao"),
+    ("natal", "trilhas em área de preservação ambiental", "parque das dunas"),
+    ("natal", "Museu Câmara Cascudo", "camara cascudo"),
+    ("natal", "sede do governo do estado", "potengi"),
+    ("caico", "Mercado Público", "mercado publico"),
+    ("caico", "açude para passeio e pôr do sol", "itans"),
+    ("caico", "artesanato e bordados da região", "casa do artesao"),
+    ("caico", "Catedral de Sant'Ana", "catedral"),
+    ("caico", "Ilha de Sant'Ana", "ilha de sant"),
+    ("caico", "Casa de Pedra", "casa de pedra"),
+    ("caico", "Capela de São Sebastião", "sao sebastiao"),
+    ("pipa", "onde ver golfinhos", "golfinhos"),
+    ("pipa", "Praia do Madeiro", "madeiro"),
+    ("pipa", "Praia do Amor", "praia do amor"),
+    ("pipa", "reserva com trilhas e mirantes", "santuario ecologico"),
+    ("pipa", "praia principal da vila", "praia do centro"),
+]
+
+MODES = {
+    "vetorial": {"hybrid": False, "mmr": False},
+    "híbrido": {"hybrid": True, "mmr": False},
+    "híbrido+mmr": {"hybrid": True, "mmr": True},
+}
+
+# Métricas comparadas com o resultado anterior: (caminho, True se maior é melhor)
+TRACKED_METRICS = [
+    (("query_rag", "recall@k"), True),
+    (("query_rag", "p50_ms"), False),
+    (("query_rag", "p95_ms"), False),
+    (("concurrency", "queries_per_s"), True),
+    (("memory", "peak_rss_mb"), False),
+]
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Modelo de embedding substituto para rodar o benchmark sem baixar o modelo real.
+
+    Cada termo (e cada par de termos vizinhos) é projetado por hashing em um
+    vetor de dimensão fixa, normalizado. É determinístico e não precisa de rede,
+    mas só captura sobreposição lexical: serve para medir regressões do
+    pipeline (chunking, BM25, fusão), não a qualidade do modelo.
+    """
+
+    def __init__(self, dim: int = OFFLINE_DIM):
+        self.dim = dim
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = re.findall(r"[a-z0-9]+", normalize(text))
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dim] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+def normalize(text: str) -> str:
+    return unidecode(text.lower()).replace("’", "'")
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo em MB, ou None se não disponível."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def answerable_queries() -> tuple[list, list]:
+    """
+    Separa as consultas rotuladas cujo termo esperado aparece em algum chunk da
+    base do destino das que não podem ser respondidas por ela.
+
+    Returns:
+        tuple[list, list]: As consultas avaliadas e as puladas.
+    """
+    from chroma_store import city_filter, get_collection
+
+    collection = get_collection()
+    corpus = {}
+    for destino in {destino for destino, _query, _expected in LABELED_QUERIES}:
+        documents = collection.get(where=city_filter(destino), include=["documents"])["documents"]
+        corpus[destino] = normalize(" ".join(documents))
+    queries, skipped = [], []
+    for destino, query, expected in LABELED_QUERIES:
+        (queries if expected in corpus[destino] else skipped).append((destino, query, expected))
+    return queries, skipped
+
+
+def build_scratch_index(chroma_path: str, offline: bool = False) -> dict:
+    """
+    Indexa o corpus de `pdf/` em `chroma_path` com a configuração de embedding
+    atual, ou com o modelo substituto se `offline`.
+
+    As bases em `chroma/` foram geradas com o modelo real na configuração
+    padrão, cujos vetores não são comparáveis aos de outro modelo ou backend.
+    """
+    os.environ["CHROMA_PATH"] = chroma_path
+    if offline:
+        os.environ["EMBEDDING_MODEL"] = OFFLINE_MODEL
+    # Importados só depois de definir as variáveis, que são lidas na importação
+    from get_embedding_function import register_embedding_function
+    import populate_database
+
+    embeddings = None
+    if offline:
+        embeddings = HashingEmbeddings()
+        register_embedding_function(embeddings)
+    report = populate_database.run_ingestion(populate_database.list_cities(), embeddings=embeddings)
+    return report["total"]
+
+
+def run_benchmark(k: int = 5, repeats: int = 3, concurrency: int = 4, offline: bool = False,
+                  reindex: bool = False) -> dict:
+    """
+    Mede latência, throughput, memória e recall@k do RAG nas consultas rotuladas
+    que a base consegue responder; as demais ficam em `queries.skipped`.
+
+    - `query_rag`: latência ponta a ponta (embedding + busca) e recall@k, com o
+      cache de resultados desligado para que toda consulta chegue à base;
+    - `concurrency`: consultas por segundo com `concurrency` threads;
+    - modos de busca: o embedding de cada consulta é calculado uma vez e
+      compartilhado, de modo que a latência medida é a da busca em si.
+
+    Args:
+        offline (bool): Se True, usa o modelo substituto (`HashingEmbeddings`)
+            sobre uma base temporária gerada a partir de `pdf/`.
+        reindex (bool): Se True, gera a base temporária com o modelo real na
+            configuração atual (`EMBEDDING_BACKEND`, `EMBEDDING_DIM`).
+
+    Returns:
+        dict: O relatório completo, no formato salvo em JSON.
+    """
+    scratch_path = tempfile.mkdtemp(prefix="rag-benchmark-") if offline or reindex else None
+    try:
+        report = {"config": {"k": k, "repeats": repeats, "concurrency": concurrency, "offline": offline}}
+        if scratch_path:
+            report["ingestion"] = build_scratch_index(scratch_path, offline)
+
+        import planing_tools
+        from get_embedding_function import config_key, embedding_config, get_embedding_function
+        from populate_database import CHUNK_OVERLAP, CHUNK_SIZE
+        from rag_cache import QueryCache
+
+        report["config"].update({
+            "model": config_key(embedding_config()),
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "rag_k": planing_tools.RAG_K,
+        })
+        # Sem entradas retidas: cada consulta vai até a base
+        planing_tools.rag_cache = QueryCache(max_entries=0)
+
+        queries, skipped = answerable_queries()
+        report["queries"] = {"evaluated": len(queries), "skipped": [query for _destino, query, _expected in skipped]}
+
+        inicio = time.perf_counter()
+        planing_tools.preload_chroma_dbs({destino for destino, _query, _expected in queries})
+        report["memory"] = {"load_s": time.perf_counter() - inicio, "rss_after_load_mb": peak_rss_mb()}
+
+        latencies = []
+        hits = 0
+        for destino, query, expected in queries:
+            for _ in range(repeats):
+                inicio = time.perf_counter()
+                context = planing_tools.query_rag(query, destino)
+                latencies.append(time.perf_counter() - inicio)
+            if expected in normalize(context):
+                hits += 1
+        report["query_rag"] = {
+            "recall@k": hits / len(queries),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+        }
+
+        workload = [(query, destino) for destino, query, _expected in queries] * repeats
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda item: planing_tools.query_rag(*item), workload))
+        elapsed = time.perf_counter() - inicio
+        report["concurrency"] = {"threads": concurrency, "queries": len(workload), "queries_per_s": len(workload) / elapsed}
+
+        embeddings = get_embedding_function()
+        embed_times = []
+        query_embeddings = []
+        for _destino, query, _expected in queries:
+            inicio = time.perf_counter()
+            query_embeddings.append(embeddings.embed_query(query))
+            embed_times.append(time.perf_counter() - inicio)
+        report["embed_ms"] = statistics.mean(embed_times) * 1000
+
+        report["modes"] = {}
+        for mode, options in MODES.items():
+            hits = 0
+            latencies = []
+            for (destino, query, expected), query_embedding in zip(queries, query_embeddings):
+                for _ in range(repeats):
+                    inicio = time.perf_counter()
+                    results = planing_tools.retrieve(query, destino, k=k, query_embedding=query_embedding, **options)
+                    latencies.append(time.perf_counter() - inicio)
+                if any(expected in normalize(text) for _doc_id, text in results):
+                    hits += 1
+            report["modes"][mode] = {
+                "recall@k": hits / len(queries),
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+            }
+
+        report["memory"]["peak_rss_mb"] = peak_rss_mb()
+        return report
+    finally:
+        if scratch_path:
+            shutil.rmtree(scratch_path, ignore_errors=True)
+
+
+def compare_backends(specs: list[str], k: int = 5, repeats: int = 3, concurrency: int = 4) -> dict:
+    """
+    Compara precisão e latência entre configurações de embedding.
+
+    Cada configuração ("backend" ou "backend:dimensão", ex.: "onnx-int8:256")
+    roda em um processo próprio, com `--reindex`, porque a configuração é lida
+    na importação e a base precisa ser gerada com o mesmo modelo das consultas.
+
+    Returns:
+        dict: Recall, latência e memória por configuração.
+    """
+    results = {}
+    for spec in specs:
+        backend, _, dim = spec.partition(":")
+        env = {**os.environ, "EMBEDDING_BACKEND": backend, "EMBEDDING_DIM": dim or "0"}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, "report.json")
+            print(f"🔄 Executando o benchmark com {spec}")
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--reindex", "--output", output, "--k", str(k),
+                 "--repeats", str(repeats), "--concurrency", str(concurrency)],
+                env=env, check=True,
+            )
+            with open(output, encoding="utf-8") as f:
+                report = json.load(f)
+        results[spec] = {
+            "model": report["config"]["model"],
+            "recall@k": report["query_rag"]["recall@k"],
+            "p50_ms": report["query_rag"]["p50_ms"],
+            "p95_ms": report["query_rag"]["p95_ms"],
+            "embed_ms": report["embed_ms"],
+            "load_s": report["memory"]["load_s"],
+            "peak_rss_mb": report["memory"]["peak_rss_mb"],
+        }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_report(report: dict, path: str = None, prefix: str = "rag") -> str:
+    """Salva o relatório (por padrão em `benchmark_results/<prefixo>-<data>.json`) e retorna o caminho."""
+    report = {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(), **report}
+    path = path or os.path.join(RESULTS_PATH, f"{prefix}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare_reports(previous: dict, current: dict, tolerance: float = 0.1) -> list[str]:
+    """
+    Compara as métricas acompanhadas com um relatório anterior.
+
+    Returns:
+        list[str]: Uma linha por métrica que piorou mais que `tolerance` (relativo).
+    """
+    regressions = []
+    for (section, metric), higher_is_better in TRACKED_METRICS:
+        before = previous.get(section, {}).get(metric)
+        after = current.get(section, {}).get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{section}.{metric}: {before:.2f} -> {after:.2f} ({change:+.0%})")
+    return regressions
+
+
+def print_report(report: dict):
+    k = report["config"]["k"]
+    rag_k = report["config"]["rag_k"]
+    print(f"⚙️ Modelo: {report['config']['model']}, chunks de {report['config']['chunk_size']} caracteres")
+    if "ingestion" in report:
+        print(f"📥 Base temporária: {report['ingestion']['new_chunks']} chunks em {report['ingestion']['elapsed_s']:.1f}s")
+    skipped = report["queries"]["skipped"]
+    if skipped:
+        print(f"⏭️ {len(skipped)} consultas rotuladas puladas (termo ausente da base): {', '.join(skipped)}")
+    rag = report["query_rag"]
+    print(f"🔎 query_rag: recall@{rag_k}={rag['recall@k']:.2f}, p50={rag['p50_ms']:.1f} ms, p95={rag['p95_ms']:.1f} ms")
+    concurrency = report["concurrency"]
+    print(f"🚀 {concurrency['threads']} threads: {concurrency['queries_per_s']:.1f} consultas/s")
+    memory = report["memory"]
+    if memory["peak_rss_mb"] is not None:
+        print(f"💾 Memória: {memory['rss_after_load_mb']:.0f} MB após carregar, pico de {memory['peak_rss_mb']:.0f} MB")
+    print(f"⏱️ Embedding da consulta: {report['embed_ms']:.1f} ms")
+    for mode, metrics in report["modes"].items():
+        print(
+            f"📊 {mode}: recall@{k}={metrics['recall@k']:.2f}, "
+            f"p50={metrics['p50_ms']:.1f} ms, p95={metrics['p95_ms']:.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=5, help="Chunks retornados por consulta.")
+    parser.add_argument("--repeats", type=int, default=3, help="Repetições de cada consulta para medir latência.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Threads no teste de throughput.")
+    parser.add_argument("--offline", action="store_true", help="Usa o modelo substituto e uma base temporária.")
+    parser.add_argument("--reindex", action="store_true", help="Gera uma base temporária com a configuração de embedding atual.")
+    parser.add_argument("--backends", nargs="+", help="Configurações a comparar, ex.: torch onnx onnx-int8:256.")
+    parser.add_argument("--output", help="Caminho do relatório JSON (padrão: benchmark_results/).")
+    parser.add_argument("--compare", help="Relatório JSON anterior para detectar regressões.")
+    args = parser.parse_args()
+
+    if args.backends:
+        results = compare_backends(args.backends, k=args.k, repeats=args.repeats, concurrency=args.concurrency)
+        for spec, metrics in results.items():
+            rss = f", pico de {metrics['peak_rss_mb']:.0f} MB" if metrics["peak_rss_mb"] is not None else ""
+            print(
+                f"📊 {spec}: recall={metrics['recall@k']:.2f}, p50={metrics['p50_ms']:.1f} ms, "
+                f"p95={metrics['p95_ms']:.1f} ms, embedding={metrics['embed_ms']:.1f} ms{rss}"
+            )
+        print(f"💾 Resultado salvo em '{save_report({'backends': results}, args.output, prefix='embeddings')}'")
+        return
+
+    report = run_benchmark(
+        k=args.k, repeats=args.repeats, concurrency=args.concurrency, offline=args.offline, reindex=args.reindex
+    )
+    print_report(report)
+    print(f"💾 Resultado salvo em '{save_report(report, args.output)}'")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare_reports(json.load(f), report)
+        if regressions:
+            print("⚠️ Regressões em relação a", args.compare)
+            for line in regressions:
+                print(f"   {line}")
+            raise SystemExit(1)
+        print(f"✅ Sem regressões em relação a '{args.compare}'")
+
+
+if __name__ == "__main__":
+    main()
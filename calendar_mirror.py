@@ -0,0 +1,229 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from googleapiclient.errors import HttpError
+from tracing import count, span
+
+CALENDAR_MIRROR_PATH = "calendar_mirror.sqlite3"
+MAX_STALENESS = 30  # Segundos até a próxima sincronização incremental
+PAGE_SIZE = 250
+# Fuso dos horários sem offset, como "2025-08-01T09:00:00" ou as datas dos eventos de dia inteiro
+LOCAL_TIMEZONE = ZoneInfo("America/Fortaleza")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendars (
+    id TEXT PRIMARY KEY,
+    summary TEXT,
+    description TEXT,
+    body TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT,
+    id TEXT,
+    start_utc TEXT,
+    end_utc TEXT,
+    body TEXT,
+    PRIMARY KEY (calendar_id, id)
+);
+CREATE INDEX IF NOT EXISTS events_by_time ON events (calendar_id, start_utc, end_utc);
+CREATE TABLE IF NOT EXISTS sync_state (
+    resource TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL
+);
+"""
+
+
+def _zone(name: str):
+    try:
+        return ZoneInfo(name) if name else LOCAL_TIMEZONE
+    except (ZoneInfoNotFoundError, ValueError):
+        return LOCAL_TIMEZONE
+
+
+def to_utc(value: dict) -> str:
+    """
+    Converte o campo start/end de um evento ("dateTime" ou "date") em uma
+    string ISO em UTC, ordenável como texto.
+
+    Horários sem offset e eventos de dia inteiro são interpretados no fuso do
+    próprio campo ("timeZone") ou, na falta dele, em `LOCAL_TIMEZONE`.
+    """
+    if not value:
+        return ""
+    tz = _zone(value.get("timeZone"))
+    if "dateTime" in value:
+        moment = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+    else:
+        moment = datetime.fromisoformat(value["date"])
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=tz)
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _bound_to_utc(value) -> str:
+    if isinstance(value, datetime):
+        return to_utc({"dateTime": value.isoformat()})
+    value = str(value).strip()
+    return to_utc({"dateTime": value} if "T" in value else {"date": value.replace("/", "-")})
+
+
+class CalendarMirror:
+    """
+    Espelho local (SQLite) dos calendários e eventos do Google Calendar.
+
+    A primeira leitura de um recurso faz a paginação completa e guarda o
+    `nextSyncToken`; as seguintes buscam apenas as alterações desde então
+    (sincronização incremental), no máximo uma vez a cada `max_staleness`
+    segundos. As consultas por intervalo de tempo são respondidas localmente.
+    """
+
+    def __init__(self, service, path: str = CALENDAR_MIRROR_PATH, max_staleness: float = MAX_STALENESS):
+        self.service = service
+        self.max_staleness = max_staleness
+        self.stats = {"full_syncs": 0, "incremental_syncs": 0, "api_pages": 0, "local_reads": 0}
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def _sync_state(self, resource: str):
+        row = self._db.execute("SELECT sync_token, synced_at FROM sync_state WHERE resource = ?", (resource,)).fetchone()
+        return row if row else (None, 0.0)
+
+    def _save_sync_state(self, resource: str, sync_token: str):
+        self._db.execute(
+            "INSERT OR REPLACE INTO sync_state (resource, sync_token, synced_at) VALUES (?, ?, ?)",
+            (resource, sync_token, time.time()),
+        )
+
+    def _paginate(self, request_factory, sync_token: str):
+        """
+        Percorre todas as páginas de uma listagem e retorna (itens, nextSyncToken).
+        """
+        items = []
+        page_token = None
+        while True:
+            with span("google_calendar.list", incremental=sync_token is not None):
+                response = request_factory(pageToken=page_token, syncToken=sync_token).execute()
+            self.stats["api_pages"] += 1
+            items.extend(response.get("items", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return items, response.get("nextSyncToken")
+
+    def _sync(self, resource: str, request_factory, apply_items, force: bool = False):
+        with self._lock:
+            sync_token, synced_at = self._sync_state(resource)
+            if not force and sync_token and time.time() - synced_at < self.max_staleness:
+                count("cache_hits")
+                return
+            try:
+                items, next_sync_token = self._paginate(request_factory, sync_token)
+                full = sync_token is None
+            except HttpError as e:
+                # 410 Gone: o token expirou e é preciso refazer a sincronização completa
+                if e.resp.status != 410:
+                    raise
+                items, next_sync_token = self._paginate(request_factory, None)
+                full = True
+            self.stats["full_syncs" if full else "incremental_syncs"] += 1
+            with self._db:
+                apply_items(items, full)
+                self._save_sync_state(resource, next_sync_token)
+
+    def sync_calendars(self, force: bool = False):
+        def request_factory(pageToken, syncToken):
+            return self.service.calendarList().list(
+                maxResults=PAGE_SIZE, pageToken=pageToken, syncToken=syncToken, showDeleted=True
+            )
+
+        def apply_items(items, full):
+            if full:
+                self._db.execute("DELETE FROM calendars")
+            for calendar in items:
+                if calendar.get("deleted"):
+                    self._db.execute("DELETE FROM calendars WHERE id = ?", (calendar["id"],))
+                else:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO calendars (id, summary, description, body) VALUES (?, ?, ?, ?)",
+                        (calendar["id"], calendar.get("summary", ""), calendar.get("description", ""), json.dumps(calendar)),
+                    )
+
+        self._sync("calendarList", request_factory, apply_items, force)
+
+    def sync_events(self, calendar_id: str, force: bool = False):
+        def request_factory(pageToken, syncToken):
+            return self.service.events().list(
+                calendarId=calendar_id, maxResults=PAGE_SIZE, pageToken=pageToken,
+                syncToken=syncToken, showDeleted=True, singleEvents=True,
+            )
+
+        def apply_items(items, full):
+            if full:
+                self._db.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+            for event in items:
+                if event.get("status") == "cancelled":
+                    self._db.execute("DELETE FROM events WHERE calendar_id = ? AND id = ?", (calendar_id, event["id"]))
+                else:
+                    self._upsert_event(calendar_id, event)
+
+        self._sync(f"events:{calendar_id}", request_factory, apply_items, force)
+
+    def _upsert_event(self, calendar_id: str, event: dict):
+        self._db.execute(
+            "INSERT OR REPLACE INTO events (calendar_id, id, start_utc, end_utc, body) VALUES (?, ?, ?, ?, ?)",
+            (calendar_id, event["id"], to_utc(event.get("start")), to_utc(event.get("end")), json.dumps(event)),
+        )
+
+    def record_event(self, calendar_id: str, event: dict):
+        """Registra no espelho um evento recém-criado pela aplicação."""
+        with self._lock, self._db:
+            self._upsert_event(calendar_id, event)
+
+    def record_calendar(self, calendar: dict):
+        """Registra no espelho um calendário recém-criado pela aplicação."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO calendars (id, summary, description, body) VALUES (?, ?, ?, ?)",
+                (calendar["id"], calendar.get("summary", ""), calendar.get("description", ""), json.dumps(calendar)),
+            )
+
+    def list_calendars(self, limit: int = None) -> list[dict]:
+        self.sync_calendars()
+        with self._lock:
+            self.stats["local_reads"] += 1
+            rows = self._db.execute(
+                "SELECT id, summary, description FROM calendars ORDER BY summary LIMIT ?",
+                (limit if limit is not None else -1,),
+            ).fetchall()
+        return [{"id": id_, "name": summary, "description": description or ""} for id_, summary, description in rows]
+
+    def list_events(self, calendar_id: str, time_min=None, time_max=None, limit: int = None) -> list[dict]:
+        """
+        Lista os eventos de um calendário que intersectam o intervalo [time_min, time_max),
+        ordenados pelo início.
+
+        Args:
+            time_min, time_max (str | datetime, opcional): Limites do intervalo, como
+                datetime ou string ISO ("2025-08-01" ou "2025-08-01T09:00:00-03:00").
+                Sem offset, são interpretados em `LOCAL_TIMEZONE`. Sem `time_min`,
+                a listagem começa agora, como na agenda do Google: eventos já
+                encerrados só aparecem com um `time_min` explícito.
+        """
+        self.sync_events(calendar_id)
+        if time_min is None:
+            time_min = datetime.now(timezone.utc)
+        query = "SELECT body FROM events WHERE calendar_id = ? AND end_utc > ?"
+        params = [calendar_id, _bound_to_utc(time_min)]
+        if time_max is not None:
+            query += " AND start_utc < ?"
+            params.append(_bound_to_utc(time_max))
+        query += " ORDER BY start_utc LIMIT ?"
+        params.append(limit if limit is not None else -1)
+        with self._lock:
+            self.stats["local_reads"] += 1
+            rows = self._db.execute(query, params).fetchall()
+        return [json.loads(body) for (body,) in rows]
@@ -1,10 +1,21 @@
+import contextvars
 import json
-import time
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from pydantic import BaseModel, Field, ValidationError
 from typing import List
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import ChatPromptTemplate
+import httplib2
+from googleapiclient.errors import HttpError
 from google_apis import create_service
+from calendar_mirror import CalendarMirror
+from lazy_init import lazy_resource
+from llm_cache import get_llm_cache
+from event_parser import parse_event
+from rate_limiter import AdaptiveRateLimiter
+from tracing import span
 from langchain_google_genai import (
     ChatGoogleGenerativeAI,
     HarmBlockThreshold,
@@ -12,6 +23,16 @@ from langchain_google_genai import (
 )
 client_secret = 'client_secret.json'
 
+BATCH_MAX_REQUESTS = 50  # Limite recomendado de requisições por lote na API do Google Calendar
+MAX_BATCH_RETRIES = 3
+# Motivos de erro da API que indicam limite de taxa; outros 403 são de permissão ou cota diária
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+EXTRACTION_WORKERS = 4
+DIAS_DA_SEMANA = ("segunda-feira", "terça-feira", "quarta-feira", "quinta-feira", "sexta-feira", "sábado", "domingo")
+
+# Controla a taxa de requisições ao Google Calendar (substitui as pausas fixas)
+calendar_rate_limiter = AdaptiveRateLimiter()
+
 class Evento(BaseModel):
     calendar_id: str = Field(default="primary", description="Identificador do calendário do Google Agenda onde o evento será criado. Por padrão, utiliza o calendário principal do usuário ('primary'). Para usar um calendário diferente, forneça o ID do calendário específico.")
     summary: str = Field(description="Título ou resumo conciso do evento, que será exibido no Google Agenda.")
@@ -38,7 +59,17 @@ def construct_google_calendar_client(client_secret):
     service = create_service(client_secret, API_NAME, API_VERSION, SCOPES)
     return service
 
-calendar_service = construct_google_calendar_client(client_secret)
+@lazy_resource("Google Calendar service")
+def get_calendar_service():
+    """
+    Retorna o cliente do Google Calendar, criado (e autenticado) na primeira chamada.
+    """
+    return construct_google_calendar_client(client_secret)
+
+
+@lazy_resource("Calendar mirror")
+def get_calendar_mirror():
+    return CalendarMirror(get_calendar_service())
 
 def create_calendar(calendar_name):
     """
@@ -54,13 +85,18 @@ def create_calendar(calendar_name):
     calendar_list = {
         'summary': calendar_name
     }
-    created_calendar_list = calendar_service.calendars().insert(body=calendar_list).execute()
+    with span("google_calendar.calendars.insert"):
+        created_calendar_list = get_calendar_service().calendars().insert(body=calendar_list).execute()
+    get_calendar_mirror().record_calendar(created_calendar_list)
     return created_calendar_list
 
 def list_calendar_list(max_capacity=200):
     """
     Lista todas as listas de calendários disponíveis, com limite de capacidade.
 
+    A leitura é feita no espelho local (`CalendarMirror`), mantido atualizado
+    por sincronização incremental com o Google Calendar.
+
     Parâmetros:
     - max_capacity (int, opcional): O número máximo de calendários a serem retornados. 
       Padrão: 200.
@@ -70,76 +106,88 @@ def list_calendar_list(max_capacity=200):
       de um calendário (ID, nome e descrição).
     """
     if isinstance(max_capacity, str):
-        max_capacity = int(max_capacity)
+        max_capacity = int(max_capacity.strip().strip("'\"") or 200)
 
-    all_calendars = []
-    all_calendars_cleaned = []
-    next_page_token = None
-    capacity_tracker = 0
-
-    while True:
-        calendar_list = calendar_service.calendarList().list(
-            maxResults = min(200, max_capacity - capacity_tracker),
-            pageToken = next_page_token
-        ).execute()
-        calendars = calendar_list.get('items', [])
-        all_calendars.extend(calendars)
-        capacity_tracker += len(calendars)
-        if capacity_tracker >= max_capacity:
-            break
-        next_page_token = calendar_list.get('nextPageToken')
-        if not next_page_token:
-            break
-    
-    for calendar in all_calendars:
-        all_calendars_cleaned.append(
-            {
-                'id': calendar['id'],
-                'name': calendar['summary'],
-                'description': calendar.get('description', '')
-            })
-    return all_calendars_cleaned
+    return get_calendar_mirror().list_calendars(limit=max_capacity)
 
-def list_calendar_events(calendar_id, max_capacity=20):
+def list_calendar_events(calendar_id, max_capacity=20, time_min=None, time_max=None):
     """
     Lista os eventos de um calendário específico.
 
+    A leitura é feita no espelho local (`CalendarMirror`): a primeira chamada
+    percorre todas as páginas do calendário e as seguintes buscam apenas as
+    alterações, então filtrar por período não exige nova consulta à API.
+
     Parâmetros:
-    - calendar_id (str): O ID do calendário para listar os eventos.
+    - calendar_id (str): O ID do calendário para listar os eventos. Também aceita
+      a entrada da ferramenta no formato "ID, máximo, início, fim"
+      (ex.: "'primary', 20, 2025-08-01, 2025-08-05").
     - max_capacity (int, opcional): O número máximo de eventos a serem retornados.
       Padrão: 20.
+    - time_min, time_max (str, opcional): Início e fim do período (yyyy-mm-dd ou ISO 8601),
+      no horário de Fortaleza quando não tiverem offset. Sem início, lista a partir de agora.
 
     Retorna:
     - list: Uma lista de dicionários contendo os detalhes dos eventos.
     """
+    if "," in calendar_id:
+        partes = [parte.strip().strip("'\"") for parte in calendar_id.split(",")]
+        calendar_id = partes[0]
+        if len(partes) > 1 and partes[1]:
+            max_capacity = partes[1]
+        if len(partes) > 2 and partes[2]:
+            time_min = partes[2]
+        if len(partes) > 3 and partes[3]:
+            time_max = partes[3]
+    calendar_id = calendar_id.strip().strip("'\"")
     if isinstance(max_capacity, str):
         max_capacity = int(max_capacity)
 
-    all_events = []
-    next_page_token = None
-    capacity_tracker = 0
-    while True:
-        events_list = calendar_service.events().list(
-            calendarId=calendar_id,
-            maxResults=min(250, max_capacity - capacity_tracker),
-            pageToken=next_page_token
-        ).execute()
-        events = events_list.get('items', [])
-        all_events.extend(events)
-        capacity_tracker += len(events)
-        if capacity_tracker >= max_capacity:
-            break
-        if not next_page_token:
-            break
-    return all_events
+    return get_calendar_mirror().list_events(calendar_id, time_min=time_min, time_max=time_max, limit=max_capacity)
+
+@lazy_resource("Event extraction chain")
+def get_extraction_chain():
+    """
+    Retorna a cadeia prompt | LLM | parser usada para extrair eventos.
+
+    O cliente do Gemini, o parser e o prompt (com as instruções de formato
+    já renderizadas) são criados uma única vez e reutilizados entre chamadas.
+    Com temperatura 0 a extração é determinística, então a mesma descrição é
+    respondida pelo cache de respostas do LLM sem nova chamada ao Gemini. A data
+    de hoje faz parte do prompt (e, portanto, da chave do cache), para que datas
+    relativas como "amanhã" não sejam respondidas com a data de outro dia.
+    """
+    llm = ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash",
+        convert_system_message_to_human=True,
+        handle_parsing_errors=True,
+        temperature=0,
+        max_tokens= 1000,
+        cache=get_llm_cache("extracao_eventos"),
+        safety_settings = {
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_ONLY_HIGH,
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
+        },
+    )
+    parser = PydanticOutputParser(pydantic_object=Evento)
+
+    prompt = ChatPromptTemplate.from_messages([
+    ("system", "Você é um assistente especialista em extrair informações de eventos de textos. Extraia os parâmetros necessários para criar um evento, incluindo data e hora de início e fim. Hoje é {hoje} ({dia_da_semana}): resolva datas relativas como 'amanhã' ou 'sábado' a partir desta data. Retorne a resposta formatada em JSON de acordo com o esquema fornecido.\n\n{format_instructions}\n"),
+    ("human", "{user_query}")
+    ]).partial(format_instructions=parser.get_format_instructions())
+    return prompt | llm | parser
+
 
 def extract_event_parameters(query):
     """
     Extrai parâmetros de um evento a partir de uma descrição em linguagem natural.
 
-    Esta função utiliza um modelo de linguagem grande para interpretar a descrição do evento
-    fornecida e extrair informações como resumo, local, descrição, horário de início e fim,
-    e fuso horário. A resposta é formatada como um JSON de acordo com o esquema definido pela
+    Frases comuns ("sábado das 9h às 12h") são interpretadas por regras, sem chamada ao LLM.
+    Quando as regras não bastam, esta função utiliza um modelo de linguagem grande para
+    interpretar a descrição do evento fornecida e extrair informações como resumo, local,
+    descrição, horário de início e fim, e fuso horário. A resposta é formatada como um JSON de acordo com o esquema definido pela
     classe `Evento`.
 
     Args:
@@ -159,32 +207,16 @@ def extract_event_parameters(query):
                  "timezone": "Fuso horário do evento (padrão: 'America/Fortaleza')"
              }
     """
-    llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    convert_system_message_to_human=True,
-    handle_parsing_errors=True,
-    temperature=0.6,
-    max_tokens= 1000,
-    safety_settings = {
-        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
-        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_ONLY_HIGH,
-        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
-        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
-    },
-)
-    parser = PydanticOutputParser(pydantic_object=Evento)
-
-    prompt = ChatPromptTemplate.from_messages([
-    ("system", "Você é um assistente especialista em extrair informações de eventos de textos. Extraia os parâmetros necessários para criar um evento, incluindo data e hora de início e fim. Retorne a resposta formatada em JSON de acordo com o esquema fornecido.\n\n{format_instructions}\n"),
-    ("human", "{user_query}")
-    ])
-    chain = prompt | llm | parser
-
-    resposta = chain.invoke({
-    "language": "Portuguese",
-    "user_query": query,
-    "format_instructions": parser.get_format_instructions(),
-    })
+    dados = parse_event(query)
+    if dados is not None:
+        resposta = Evento(**dados)
+    else:
+        hoje = date.today()
+        resposta = get_extraction_chain().invoke({
+            "user_query": query,
+            "hoje": hoje.isoformat(),
+            "dia_da_semana": DIAS_DA_SEMANA[hoje.weekday()],
+        })
     resposta_dict = {
         'summary': resposta.summary,
         'location': resposta.location,
@@ -228,9 +260,151 @@ def insert_calendar_event(event):
 
     calendar_id, event_details = extracted_data
     request_body = json.loads(event_details)
-    time.sleep(1) ## Evitar limites de requisições do plano gratuito
-    event = calendar_service.events().insert(
-        calendarId = calendar_id,
-        body = request_body
-    ).execute()
-    return event
\ No newline at end of file
+    calendar_rate_limiter.acquire()
+    try:
+        with span("google_calendar.events.insert"):
+            event = get_calendar_service().events().insert(
+                calendarId = calendar_id,
+                body = request_body
+            ).execute()
+    except HttpError as e:
+        if is_rate_limit_error(e):
+            calendar_rate_limiter.on_rate_limited()
+        raise
+    calendar_rate_limiter.on_success()
+    get_calendar_mirror().record_event(calendar_id, event)
+    return event
+
+
+def error_reasons(error: HttpError) -> set:
+    """Motivos ("reason") informados no corpo JSON de um erro da API do Google."""
+    try:
+        erro = json.loads(error.content.decode("utf-8"))["error"]
+        return {detalhe.get("reason") for detalhe in erro.get("errors", [])}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return set()
+
+
+def is_rate_limit_error(error) -> bool:
+    """
+    Verifica se o erro é de limite de requisições: todo 429, mas um 403 só
+    quando o motivo é `RATE_LIMIT_REASONS` (e não falta de permissão, por exemplo).
+    """
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 429:
+        return True
+    return error.resp.status == 403 and bool(error_reasons(error) & RATE_LIMIT_REASONS)
+
+
+def split_event_descriptions(events: str) -> list[str]:
+    """
+    Separa uma entrada com vários eventos (um por linha ou separados por ";")
+    em descrições individuais, removendo marcadores de lista.
+    """
+    descricoes = []
+    for linha in re.split(r"[\n;]+", events):
+        linha = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", linha).strip().strip("'\"")
+        if linha:
+            descricoes.append(linha)
+    return descricoes
+
+
+def insert_calendar_events(events):
+    """
+    Insere vários eventos em calendários Google de uma só vez.
+
+    As descrições são interpretadas em paralelo por `extract_event_parameters` e os
+    eventos são enviados pelo endpoint de lote (batch) da API do Google Calendar.
+    Eventos recusados por limite de requisições são reenviados em um novo lote,
+    com a taxa ajustada pelo limitador adaptativo.
+
+    Parâmetros:
+    - events (str | list): As descrições dos eventos em linguagem natural, uma por
+      linha (ou separadas por ";"), ou uma lista de descrições.
+
+    Retorna:
+    - list: Um resultado por evento, na ordem recebida, com o status ("criado" ou
+      "erro"), o título, o início e o link do evento, ou a mensagem de erro.
+    """
+    descricoes = split_event_descriptions(events) if isinstance(events, str) else list(events)
+    resultados = [{"descricao": descricao} for descricao in descricoes]
+
+    def extrair(descricao):
+        try:
+            return extract_event_parameters(descricao)
+        except Exception as e:
+            return e
+
+    # Cada extração roda com uma cópia do contexto, para que as chamadas ao LLM entrem no trace do turno
+    with ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, extrair, descricao) for descricao in descricoes]
+        extraidos = [future.result() for future in futures]
+
+    pendentes = []
+    for indice, extraido in enumerate(extraidos):
+        if isinstance(extraido, Exception) or not extraido:
+            resultados[indice].update(status="erro", erro=f"Não foi possível extrair os detalhes do evento: {extraido}")
+        else:
+            calendar_id, event_details = extraido
+            pendentes.append((indice, calendar_id, json.loads(event_details)))
+
+    for _tentativa in range(MAX_BATCH_RETRIES):
+        if not pendentes:
+            break
+        pendentes = _execute_insert_batches(pendentes, resultados)
+
+    for indice, _calendar_id, _body in pendentes:
+        resultados[indice].update(status="erro", erro="Limite de requisições da API excedido.")
+    return resultados
+
+
+def _execute_insert_batches(pendentes, resultados):
+    """
+    Envia as inserções em lotes e retorna as que devem ser reenviadas por limite de taxa.
+
+    Se o envio de um lote falhar (erro de rede ou da requisição do lote), os
+    eventos do lote sem resposta são marcados como erro, sem perder os
+    resultados já recebidos nem interromper os lotes seguintes.
+    """
+    reenviar = []
+    for inicio in range(0, len(pendentes), BATCH_MAX_REQUESTS):
+        lote = pendentes[inicio:inicio + BATCH_MAX_REQUESTS]
+        por_id = {str(indice): (indice, calendar_id, body) for indice, calendar_id, body in lote}
+        respondidos = set()
+
+        def callback(request_id, response, exception):
+            respondidos.add(request_id)
+            indice = por_id[request_id][0]
+            if exception is None:
+                calendar_rate_limiter.on_success()
+                get_calendar_mirror().record_event(por_id[request_id][1], response)
+                resultados[indice].update(
+                    status="criado",
+                    id=response.get("id"),
+                    summary=response.get("summary"),
+                    start=response.get("start"),
+                    link=response.get("htmlLink"),
+                )
+            elif is_rate_limit_error(exception):
+                calendar_rate_limiter.on_rate_limited()
+                reenviar.append(por_id[request_id])
+            else:
+                resultados[indice].update(status="erro", erro=str(exception))
+
+        batch = get_calendar_service().new_batch_http_request(callback=callback)
+        for request_id, (_indice, calendar_id, body) in por_id.items():
+            batch.add(get_calendar_service().events().insert(calendarId=calendar_id, body=body), request_id=request_id)
+        calendar_rate_limiter.acquire(len(lote))
+        try:
+            with span("google_calendar.batch", requests=len(lote)):
+                batch.execute()
+        except (HttpError, httplib2.HttpLib2Error, OSError) as e:
+            sem_resposta = [por_id[request_id] for request_id in por_id if request_id not in respondidos]
+            if is_rate_limit_error(e):
+                calendar_rate_limiter.on_rate_limited()
+                reenviar.extend(sem_resposta)
+                continue
+            for indice, _calendar_id, _body in sem_resposta:
+                resultados[indice].update(status="erro", erro=f"Falha ao enviar o lote de eventos: {e}")
+    return reenviar
\ No newline at end of file
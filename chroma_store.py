@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import shutil
+import uuid
+import chromadb
+from get_embedding_function import check_embedding_config, embedding_config
+from hybrid_retrieval import build_bm25_index
+from index_manifest import IndexManifest, chunk_id, content_hash, normalize_source
+from lazy_init import lazy_resource
+from poi_index import build_poi_index
+from rag_cache import mark_corpus_changed
+
+CHROMA_PATH = os.getenv("CHROMA_PATH", "chroma")
+COLLECTION_NAME = "agente-turistico"
+CITY_FIELD = "city"
+
+# Layout antigo: um banco Chroma por cidade em `chroma/<cidade>/`, na coleção padrão do langchain
+LEGACY_COLLECTION_NAME = "langchain"
+LEGACY_DB_FILE = "chroma.sqlite3"
+# Gravado na pasta da cidade quando a cópia do banco antigo termina
+MIGRATED_FILE = "migrated.json"
+MIGRATION_BATCH_SIZE = 256
+
+
+@lazy_resource("Chroma client")
+def get_client():
+    """
+    Retorna o cliente Chroma do processo, aberto sobre `CHROMA_PATH`.
+
+    Todas as cidades ficam em uma única coleção, com o campo `city` nos
+    metadados, de modo que novos destinos não abrem novos bancos.
+    """
+    return chromadb.PersistentClient(path=CHROMA_PATH)
+
+
+def get_collection():
+    """
+    Abre (ou cria) a coleção compartilhada por todas as cidades.
+
+    A configuração de embedding fica nos metadados da coleção, de modo que a
+    ingestão e as consultas não misturem vetores de modelos diferentes.
+    """
+    collection = get_client().get_or_create_collection(name=COLLECTION_NAME)
+    # Coleção nova (vazia) ou anterior ao registro da configuração: passa a registrá-la
+    if (not collection.metadata and collection.count() == 0) or check_embedding_config(collection.metadata, CHROMA_PATH):
+        collection.modify(metadata=embedding_config())
+    return collection
+
+
+def city_filter(city: str) -> dict:
+    return {CITY_FIELD: city}
+
+
+def city_path(city: str) -> str:
+    """
+    Pasta com os arquivos auxiliares de uma cidade (manifesto, índice BM25,
+    versão do corpus), que continuam separados por cidade.
+    """
+    return os.path.join(CHROMA_PATH, city)
+
+
+def list_legacy_stores(chroma_root: str = None) -> dict:
+    """Retorna o mapeamento cidade -> pasta dos bancos ainda no layout antigo."""
+    chroma_root = chroma_root or CHROMA_PATH
+    if not os.path.isdir(chroma_root):
+        return {}
+    return {
+        city: os.path.join(chroma_root, city)
+        for city in sorted(os.listdir(chroma_root))
+        if os.path.exists(os.path.join(chroma_root, city, LEGACY_DB_FILE))
+    }
+
+
+def pending_legacy_stores(chroma_root: str = None) -> dict:
+    """Retorna os bancos no layout antigo cuja cópia para a coleção compartilhada ainda não terminou."""
+    return {
+        city: legacy_path
+        for city, legacy_path in list_legacy_stores(chroma_root).items()
+        if not os.path.exists(os.path.join(legacy_path, MIGRATED_FILE))
+    }
+
+
+def _legacy_order(legacy_id: str, metadata: dict):
+    # IDs antigos no formato "fonte:página:índice": preserva a ordem da divisão do PDF
+    index = legacy_id.rsplit(":", 1)[-1]
+    return (metadata.get("page") or 0, int(index) if index.isdigit() else 0)
+
+
+def migrate_legacy_stores(delete_legacy: bool = False) -> dict:
+    """
+    Copia os bancos por cidade do layout antigo para a coleção compartilhada.
+
+    Executada automaticamente pelo `populate_database.py` e na abertura do
+    banco pelo aplicativo, ou por `python chroma_store.py`. Os vetores são
+    copiados como estão (sem novo embedding), mas cada chunk passa a usar o
+    formato atual: a fonte com "/" como separador (os bancos antigos foram
+    gerados no Windows), o ID pelo hash do conteúdo e a cidade nos metadados.
+    O manifesto da cidade é semeado com os PDFs ainda presentes em `pdf/`, e os
+    índices BM25 e de pontos turísticos são reconstruídos, de modo que a
+    ingestão seguinte não duplica nenhum chunk. Fontes sem PDF correspondente
+    são copiadas e mantidas.
+
+    Os arquivos do banco antigo são mantidos, a menos que `delete_legacy` seja
+    True, e só são apagados depois de conferida a cópia.
+
+    Returns:
+        dict: Quantidade de chunks migrados por cidade.
+    """
+    migrated = {}
+    pending = pending_legacy_stores()
+    for city, legacy_path in list_legacy_stores().items():
+        if city in pending:
+            migrated[city] = _migrate_legacy_store(city, legacy_path)
+        if delete_legacy:
+            _remove_legacy_files(legacy_path)
+            print(f"🗑️ Banco antigo de '{legacy_path}' removido")
+    return migrated
+
+
+def _migrate_legacy_store(city: str, legacy_path: str) -> int:
+    legacy = chromadb.PersistentClient(path=legacy_path).get_collection(LEGACY_COLLECTION_NAME)
+    check_embedding_config(legacy.metadata, legacy_path)
+    collection = get_collection()
+    total = legacy.count()
+    print(f"🔀 Migrando {total} chunk(s) de '{legacy_path}' para a coleção '{COLLECTION_NAME}'")
+
+    items = {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+    for offset in range(0, total, MIGRATION_BATCH_SIZE):
+        batch = legacy.get(include=["embeddings", "documents", "metadatas"], limit=MIGRATION_BATCH_SIZE, offset=offset)
+        for key in items:
+            items[key].extend(batch[key])
+
+    chunks_by_source = {}
+    for legacy_id, embedding, document, metadata in zip(*items.values()):
+        metadata = dict(metadata or {})
+        source = normalize_source(metadata["source"]) if metadata.get("source") else ""
+        chunks_by_source.setdefault(source, []).append((legacy_id, embedding, document, {**metadata, "source": source}))
+
+    new_ids, embeddings, documents, metadatas = [], [], [], []
+    hashes_by_source = {}
+    for source, chunks in chunks_by_source.items():
+        seen_ids = {}
+        for legacy_id, embedding, document, metadata in sorted(chunks, key=lambda c: _legacy_order(c[0], c[3])):
+            digest = content_hash(document)
+            new_id = chunk_id(source, metadata.get("page"), digest, seen_ids)
+            hashes_by_source.setdefault(source, {})[new_id] = digest
+            new_ids.append(new_id)
+            embeddings.append(embedding)
+            documents.append(document)
+            metadatas.append({**metadata, "id": new_id, "content_hash": digest, CITY_FIELD: city})
+
+    # Cópias feitas com os IDs antigos (por uma migração anterior) são substituídas
+    for offset in range(0, total, MIGRATION_BATCH_SIZE):
+        collection.delete(ids=items["ids"][offset:offset + MIGRATION_BATCH_SIZE])
+    for offset in range(0, total, MIGRATION_BATCH_SIZE):
+        end = offset + MIGRATION_BATCH_SIZE
+        collection.upsert(
+            ids=new_ids[offset:end], embeddings=embeddings[offset:end],
+            documents=documents[offset:end], metadatas=metadatas[offset:end],
+        )
+    copied = len(collection.get(ids=new_ids, include=[])["ids"])
+    if copied < len(set(new_ids)):
+        raise RuntimeError(f"Migração incompleta de '{legacy_path}': {copied} de {total} chunks copiados")
+
+    manifest = IndexManifest(city_path(city))
+    manifest.files = {}
+    for source, chunk_hashes in hashes_by_source.items():
+        if os.path.isfile(source):
+            manifest.update(source, chunk_hashes)
+    manifest.save()
+    build_bm25_index(collection, city_path(city), where=city_filter(city))
+    build_poi_index(collection, city_path(city), where=city_filter(city))
+    mark_corpus_changed(city_path(city))
+    with open(os.path.join(legacy_path, MIGRATED_FILE), "w", encoding="utf-8") as f:
+        json.dump({"chunks": total, "sources": sorted(chunks_by_source)}, f, ensure_ascii=False, indent=1)
+    return total
+
+
+def _remove_legacy_files(legacy_path: str):
+    os.remove(os.path.join(legacy_path, LEGACY_DB_FILE))
+    for name in os.listdir(legacy_path):
+        # Segmentos do índice HNSW ficam em pastas nomeadas pelo UUID do segmento
+        try:
+            uuid.UUID(name)
+        except ValueError:
+            continue
+        shutil.rmtree(os.path.join(legacy_path, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra os bancos Chroma por cidade para a coleção compartilhada.")
+    parser.add_argument(
+        "--delete-legacy", action="store_true",
+        help="Apaga os bancos antigos depois de conferir a cópia (por padrão eles são mantidos).",
+    )
+    args = parser.parse_args()
+    migrated = migrate_legacy_stores(delete_legacy=args.delete_legacy)
+    if not migrated:
+        print("✅ Nenhum banco no layout antigo pendente de migração")
+    for city, total in migrated.items():
+        print(f"✅ {city}: {total} chunk(s) migrado(s)")
+
+
+if __name__ == "__main__":
+    main()
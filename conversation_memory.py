@@ -0,0 +1,187 @@
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.messages import AIMessage, HumanMessage, get_buffer_string
+
+MAX_TOKEN_LIMIT = 1500
+MAX_MESSAGE_TOKENS = 350
+KEEP_RECENT_TURNS = 2  # Trocas mais recentes mantidas na íntegra (ex.: o roteiro que acabou de ser gerado)
+
+# Linhas de estrutura (ex.: "Dia 2 - 02/08", "**Manhã:**", "## Roteiro") nunca são unificadas
+CABECALHO = re.compile(r"^\W*(?:dia\s+\d+\b|#+\s|manh[ãa]\b|tarde\b|noite\b)|:\W*$", re.IGNORECASE)
+
+SUMMARY_PROMPT = """Atualize o resumo de uma conversa entre um usuário e um agente de planejamento de viagens.
+Mantenha em poucas frases os fatos úteis para continuar a conversa: destino, datas, interesses,
+orçamento, decisões tomadas, roteiro combinado e eventos agendados. Descarte detalhes brutos
+como previsões hora a hora e trechos de guias.
+
+Resumo atual:
+{summary}
+
+Novas mensagens:
+{new_lines}
+
+Resumo atualizado:"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa local de tokens (~4 caracteres por token), sem chamada à API."""
+    return math.ceil(len(text) / 4)
+
+
+def compact_text(text: str, max_tokens: int, token_counter: Callable[[str], int] = estimate_tokens) -> str:
+    """
+    Reduz uma mensagem longa (ex.: previsão hora a hora ou contexto do RAG)
+    para caber em `max_tokens`: remove espaços e linhas repetidas e corta o excesso.
+    """
+    text = re.sub(r"[ \t]+", " ", str(text))
+    text = re.sub(r"\n\s*\n+", "\n", text).strip()
+    if token_counter(text) <= max_tokens:
+        return text
+    linhas = []
+    repeticoes = {}
+    for linha in text.split("\n"):
+        if CABECALHO.search(linha):
+            linhas.append(linha)
+            continue
+        # Linhas com o mesmo formato (ex.: "Hora: 05:00 - Temp: ...") são mantidas uma vez
+        padrao = re.sub(r"\d+([.,:]\d+)?", "#", linha)
+        if padrao in repeticoes:
+            repeticoes[padrao][1] += 1
+            continue
+        repeticoes[padrao] = [len(linhas), 0]
+        linhas.append(linha)
+    for indice, repetidas in repeticoes.values():
+        if repetidas:
+            linhas[indice] += f" (+{repetidas} linhas semelhantes)"
+    text = "\n".join(linhas)
+    if token_counter(text) <= max_tokens:
+        return text
+    limite = max(1, len(text) * max_tokens // token_counter(text))
+    return text[:limite].rstrip() + " […]"
+
+
+class TokenBudgetMemory(BaseChatMemory):
+    """
+    Memória de conversa limitada por um orçamento de tokens.
+
+    As mensagens recentes ficam na íntegra enquanto couberem em `max_token_limit`;
+    as mais antigas são incorporadas a um resumo atualizado incrementalmente pelo
+    LLM. As últimas `keep_recent_turns` trocas nunca são alteradas; mensagens
+    longas anteriores a elas (como as observações de ferramentas repassadas
+    ao agente de calendário) são compactadas.
+
+    `token_usage` mostra quantos tokens o histórico ocupa no último prompt.
+    """
+
+    llm: Optional[Any] = None
+    memory_key: str = "chat_history"
+    human_prefix: str = "Human"
+    ai_prefix: str = "AI"
+    max_token_limit: int = MAX_TOKEN_LIMIT
+    max_message_tokens: int = MAX_MESSAGE_TOKENS
+    keep_recent_turns: int = KEEP_RECENT_TURNS
+    token_counter: Callable[[str], int] = estimate_tokens
+    moving_summary_buffer: str = ""
+    token_usage: Dict[str, int] = {}
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def _messages_tokens(self, messages) -> int:
+        return sum(self.token_counter(str(message.content)) for message in messages)
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        messages = self.chat_memory.messages
+        recentes = get_buffer_string(messages, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+        resumo = f"Resumo da conversa anterior: {self.moving_summary_buffer}\n" if self.moving_summary_buffer else ""
+        self.token_usage = {
+            "summary_tokens": self.token_counter(resumo),
+            "recent_tokens": self.token_counter(recentes),
+            "recent_messages": len(messages),
+        }
+        self.token_usage["history_tokens"] = self.token_usage["summary_tokens"] + self.token_usage["recent_tokens"]
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {self.memory_key: resumo + recentes}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, Any]) -> None:
+        input_str, output_str = self._get_input_output(inputs, outputs)
+        self.chat_memory.add_messages([HumanMessage(content=input_str), AIMessage(content=output_str)])
+        self.compact_old_messages()
+        self.prune()
+
+    def load_history(self, history) -> None:
+        """
+        Reconstrói a memória a partir das mensagens exibidas na interface
+        ({"role": "user" | "assistant", "content": ...}), aplicando o mesmo orçamento.
+        """
+        self.clear()
+        self.chat_memory.add_messages([
+            HumanMessage(content=message["content"]) if message["role"] == "user" else AIMessage(content=message["content"])
+            for message in history
+        ])
+        self.compact_old_messages()
+        self.prune()
+
+    def compact_old_messages(self) -> None:
+        """Compacta as mensagens longas anteriores às `keep_recent_turns` trocas mais recentes."""
+        messages = list(self.chat_memory.messages)
+        antigas = len(messages) - 2 * self.keep_recent_turns
+        if antigas <= 0:
+            return
+        alterada = False
+        for indice, message in enumerate(messages[:antigas]):
+            if self.token_counter(str(message.content)) > self.max_message_tokens:
+                compactada = compact_text(message.content, self.max_message_tokens, self.token_counter)
+                messages[indice] = type(message)(content=compactada)
+                alterada = True
+        if alterada:
+            self.chat_memory.clear()
+            self.chat_memory.add_messages(messages)
+
+    def prune(self) -> None:
+        """
+        Move as mensagens mais antigas para o resumo até o histórico recente caber
+        no orçamento. Poda até metade do limite, para que o resumo (uma chamada ao
+        LLM) seja atualizado a cada várias trocas, e não a cada mensagem; as
+        `keep_recent_turns` trocas mais recentes nunca vão para o resumo.
+
+        Se essas trocas recentes sozinhas passarem do orçamento, as suas mensagens
+        mais antigas são compactadas com `compact_text`, sem nova chamada ao LLM.
+        """
+        messages = list(self.chat_memory.messages)
+        if self._messages_tokens(messages) <= self.max_token_limit:
+            return
+        podadas = []
+        while len(messages) > 2 * self.keep_recent_turns and self._messages_tokens(messages) > self.max_token_limit // 2:
+            # Remove a troca inteira (pergunta e resposta) para não deixar respostas órfãs
+            podadas.extend(messages[:2])
+            messages = messages[2:]
+        if podadas:
+            self.moving_summary_buffer = self.summarize(podadas)
+        for indice, message in enumerate(messages):
+            if self._messages_tokens(messages) <= self.max_token_limit:
+                break
+            if self.token_counter(str(message.content)) > self.max_message_tokens:
+                compactada = compact_text(message.content, self.max_message_tokens, self.token_counter)
+                messages[indice] = type(message)(content=compactada)
+        self.chat_memory.clear()
+        self.chat_memory.add_messages(messages)
+
+    def summarize(self, messages) -> str:
+        novas = get_buffer_string(messages, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+        if self.llm is not None:
+            try:
+                resposta = self.llm.invoke(SUMMARY_PROMPT.format(summary=self.moving_summary_buffer or "(vazio)", new_lines=novas))
+                return compact_text(getattr(resposta, "content", resposta), self.max_token_limit // 2, self.token_counter)
+            except Exception as e:
+                print(f"Não foi possível resumir o histórico com o LLM: {e}")
+        # Sem LLM: mantém uma versão compacta das mensagens no resumo
+        return compact_text(f"{self.moving_summary_buffer}\n{novas}", self.max_token_limit // 2, self.token_counter)
+
+    def clear(self) -> None:
+        super().clear()
+        self.moving_summary_buffer = ""
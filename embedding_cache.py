@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = "embedding_cache"
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.txt"
+META_FILE = "meta.json"
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Envolve um modelo de embedding com um cache persistente em disco,
+    indexado por (nome do modelo, sha256 do texto).
+
+    Cada modelo tem sua própria pasta com:
+    - vectors.f32: matriz float32 (linhas x dimensão) lida via memória mapeada;
+    - index.txt: um hash por linha, na mesma ordem das linhas da matriz;
+    - meta.json: nome do modelo e dimensão dos vetores.
+
+    Os dois arquivos só recebem acréscimos no final, então o cache sobrevive a
+    `populate_database.py --reset` e a mudanças nos parâmetros do chunker.
+    Apenas `embed_documents` usa o cache; as consultas passam direto ao modelo.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache_dir: str = EMBEDDING_CACHE_PATH):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._index = {}
+        self._dim = None
+        self._vectors = None
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        if not os.path.exists(self._file(META_FILE)):
+            return
+        with open(self._file(META_FILE), encoding="utf-8") as f:
+            self._dim = json.load(f)["dim"]
+        with open(self._file(INDEX_FILE), encoding="ascii") as f:
+            hashes = f.read().split()
+        self._index = {text_hash: row for row, text_hash in enumerate(hashes)}
+
+        # Descarta vetores gravados sem a linha correspondente no índice (escrita interrompida)
+        expected_size = len(hashes) * self._dim * 4
+        if os.path.getsize(self._file(VECTORS_FILE)) > expected_size:
+            with open(self._file(VECTORS_FILE), "r+b") as f:
+                f.truncate(expected_size)
+        self._remap()
+
+    def _remap(self):
+        rows = len(self._index)
+        self._vectors = (
+            np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r", shape=(rows, self._dim))
+            if rows else None
+        )
+
+    def _append(self, hashes: list[str], vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self._dim is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._dim = vectors.shape[1]
+            with open(self._file(META_FILE), "w", encoding="utf-8") as f:
+                json.dump({"model_name": self.model_name, "dim": self._dim}, f)
+            open(self._file(INDEX_FILE), "w").close()
+
+        # Os vetores são gravados antes do índice para que toda linha indexada exista
+        with open(self._file(VECTORS_FILE), "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self._file(INDEX_FILE), "a", encoding="ascii") as f:
+            f.write("".join(f"{text_hash}\n" for text_hash in hashes))
+        for text_hash in hashes:
+            self._index[text_hash] = len(self._index)
+        self._remap()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        hashes = [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts]
+
+        with self._lock:
+            missing = {}
+            for text, text_hash in zip(texts, hashes):
+                if text_hash not in self._index and text_hash not in missing:
+                    missing[text_hash] = text
+            self.stats["misses"] += len(missing)
+            self.stats["hits"] += len(texts) - len(missing)
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            with self._lock:
+                new_hashes = [text_hash for text_hash in missing if text_hash not in self._index]
+                if new_hashes:
+                    by_hash = dict(zip(missing, new_vectors))
+                    self._append(new_hashes, [by_hash[text_hash] for text_hash in new_hashes])
+
+        with self._lock:
+            vectors = self._vectors
+            rows = [self._index[text_hash] for text_hash in hashes]
+        return vectors[rows].tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
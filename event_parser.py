@@ -0,0 +1,260 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional
+from unidecode import unidecode
+
+DEFAULT_DURATION = timedelta(hours=1)
+
+DIAS_DA_SEMANA = {
+    "segunda": 0, "terca": 1, "quarta": 2, "quinta": 3, "sexta": 4, "sabado": 5, "domingo": 6,
+}
+
+MESES = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4, "maio": 5, "junho": 6, "julho": 7,
+    "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+}
+
+# Verbos de comando no início da descrição, que não fazem parte do título
+PREFIXOS_DE_COMANDO = re.compile(
+    r"^(?:por favor,?\s*)?(?:agendar|agende|marcar|marque|criar|crie|adicionar|adicione|bloquear|bloqueie|"
+    r"reservar|reserve|incluir|inclua)\s+(?:um|uma)?\s*(?:compromisso|evento|lembrete)?\s*(?:para|de)?\s*"
+    r"(?:minha agenda para\s*)?",
+    re.IGNORECASE,
+)
+
+# Horário com "h" ou ":" obrigatório (ex.: "9h", "14:30") e horário em que o "h" é
+# opcional, aceito apenas logo após "às", "das" ou "a partir das" (ex.: "das 9 às 11h")
+HORA_ESTRITA = r"(\d{1,2})(?:(?:h|:)(\d{2})?|h)(?:\s*min)?(?:\s+da\s+(manha|tarde|noite))?"
+HORA = r"(\d{1,2})(?:(?:h|:)(\d{2})?)?(?:\s*min)?(?:\s+da\s+(manha|tarde|noite))?\b"
+INTERVALO_DE_HORAS = re.compile(rf"\b(?:das|entre)\s+{HORA}\s*(?:as|a|ate|e|-)\s+{HORA}")
+INTERVALO_COMPACTO = re.compile(rf"\b{HORA_ESTRITA}\s*-\s*{HORA_ESTRITA}")
+HORA_DE_INICIO = re.compile(rf"\b(?:as|das|a partir das)\s+{HORA}")
+# Duração: "de 3h", "por 2 horas", "durante 1h30"
+DURACAO = re.compile(r"\b(?:de|por|durante)\s+(\d{1,2})\s*(?:h|horas?)\s*(?:e\s+)?(?:(\d{2})\s*(?:min(?:utos)?)?)?\b")
+# "de 9h às 11h" pode ser um intervalo ou uma duração seguida do início
+DURACAO_OU_INTERVALO = re.compile(r"\s*(?:as|a|ate)\s+\d")
+MEIO_DIA = re.compile(r"\b(?:ao|as|a)?\s*meio[- ]dia\b")
+# Qualquer horário escrito ("9h", "14:30"): todos precisam ser explicados por um intervalo, início ou duração
+HORARIO_ESCRITO = re.compile(r"\b\d{1,2}(?:h|:\d{2})")
+
+DATA_ISO = re.compile(r"\b(\d{4})[/-](\d{2})[/-](\d{2})\b")
+DATA_NUMERICA = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+DATA_POR_EXTENSO = re.compile(r"\b(?:dia\s+)?(\d{1,2})(?:º|o)?\s+de\s+(" + "|".join(MESES) + r")(?:\s+de\s+(\d{4}))?")
+DIA_DO_MES = re.compile(r"\bdia\s+(\d{1,2})\b")
+DIA_DA_SEMANA = re.compile(
+    r"\b(?:(?:n[oa]\s+)?(proxim[oa])\s+)?(" + "|".join(DIAS_DA_SEMANA) + r")(?:[- ]feira)?(?:\s+que\s+vem)?\b"
+)
+RELATIVO = re.compile(r"\b(depois de amanha|amanha|hoje)\b")
+
+CALENDARIO = re.compile(r"\bcalend[aá]rio\s+(?:(?:de\s+)?id\s+)?['\"]?([\w.+-]+@[\w.-]+|primary)['\"]?", re.IGNORECASE)
+
+# Local: "no/na/em/ao" seguido de palavras com inicial maiúscula (ex.: "no restaurante Camarões")
+LOCAL = re.compile(
+    r"(?:\b(?:no|na|nos|nas|em|ao|aos)|(?<!\w)[àÀ]s?)\s+((?:(?:restaurante|bar|praia|museu|parque|shopping|hotel|teatro|igreja|mercado|"
+    r"forte|centro|sala|feira|lagoa|cafe|café)\s+)?[A-ZÁÉÍÓÚÂÊÔÃÕÇ][\w'À-ÿ-]*"
+    r"(?:\s+(?:d[aoe]s?\s+)?[A-ZÁÉÍÓÚÂÊÔÃÕÇ][\w'À-ÿ-]*)*)"
+)
+LOCAL_COMUM = re.compile(
+    r"\b(?:no|na|nos|nas|em)\s+((?:sala|audit[oó]rio|escrit[oó]rio|recep[cç][aã]o|lobby|saguão)"
+    r"(?:\s+(?:d[aoe]s?\s+)?[\w'À-ÿ-]+)?)",
+    re.IGNORECASE,
+)
+
+
+def parse_event(query: str, hoje: Optional[date] = None) -> Optional[dict]:
+    """
+    Extrai os parâmetros de um evento de frases comuns em português, sem usar LLM.
+
+    Reconhece datas ("sábado", "próxima segunda", "amanhã", "10 de janeiro",
+    "2025/08/01", "10/01"), horários ("das 9h às 12h", "às 14h30", "ao meio-dia")
+    e durações ("de 3h", "por 2 horas").
+
+    Args:
+        query (str): A descrição do evento em linguagem natural.
+        hoje (date, opcional): A data de referência. Padrão: a data atual.
+
+    Returns:
+        dict: Os campos do modelo `Evento`, ou None se a data, o horário ou o
+        calendário não puderem ser determinados com segurança.
+    """
+    hoje = hoje or date.today()
+    texto = unidecode(query.lower())
+
+    calendar_id = "primary"
+    calendario = CALENDARIO.search(query)
+    if calendario:
+        calendar_id = calendario.group(1)
+    elif "calendario" in texto and not re.search(r"calendario (?:principal|padrao)", texto):
+        # Calendário citado pelo nome: o ID precisa ser resolvido pelo LLM
+        return None
+
+    dia = _parse_date(texto, hoje)
+    horarios = _parse_times(texto)
+    if dia is None or horarios is None:
+        return None
+    inicio, duracao = horarios
+    start = datetime.combine(dia, inicio)
+    end = start + (duracao if duracao is not None else DEFAULT_DURATION)
+    if end <= start or end.date() != start.date():
+        return None
+
+    local = LOCAL.search(query) or LOCAL_COMUM.search(query)
+    return {
+        "calendar_id": calendar_id,
+        "summary": _summary(query),
+        "location": local.group(1).strip() if local else "",
+        "description": query.strip(),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+    }
+
+
+def _parse_date(texto: str, hoje: date) -> Optional[date]:
+    # Mais de uma data ou dia da semana ("sábado e domingo", "dia 10 ou 12"): fica com o LLM
+    if _count_spans(texto, DATA_ISO, DATA_POR_EXTENSO, DATA_NUMERICA, RELATIVO, DIA_DA_SEMANA, DIA_DO_MES) > 1:
+        return None
+
+    match = DATA_ISO.search(texto)
+    if match:
+        return _safe_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+    match = DATA_POR_EXTENSO.search(texto)
+    if match:
+        ano = int(match.group(3)) if match.group(3) else None
+        return _next_date(hoje, int(match.group(1)), MESES[match.group(2)], ano)
+
+    match = DATA_NUMERICA.search(texto)
+    if match:
+        ano = int(match.group(3)) if match.group(3) else None
+        if ano is not None and ano < 100:
+            ano += 2000
+        return _next_date(hoje, int(match.group(1)), int(match.group(2)), ano)
+
+    match = RELATIVO.search(texto)
+    if match:
+        return hoje + timedelta(days={"hoje": 0, "amanha": 1, "depois de amanha": 2}[match.group(1)])
+
+    match = DIA_DA_SEMANA.search(texto)
+    if match:
+        dias = (DIAS_DA_SEMANA[match.group(2)] - hoje.weekday()) % 7
+        if match.group(1) and dias == 0:
+            dias = 7
+        return hoje + timedelta(days=dias)
+
+    match = DIA_DO_MES.search(texto)
+    if match:
+        dia = int(match.group(1))
+        data = _safe_date(hoje.year, hoje.month, dia)
+        if data is not None and data < hoje:
+            proximo_mes = (hoje.replace(day=1) + timedelta(days=32)).replace(day=1)
+            data = _safe_date(proximo_mes.year, proximo_mes.month, dia)
+        return data
+    return None
+
+
+def _count_spans(texto: str, *padroes) -> int:
+    """Quantidade de trechos do texto encontrados pelos padrões, unindo os sobrepostos."""
+    spans = sorted(match.span() for padrao in padroes for match in padrao.finditer(texto))
+    total = 0
+    fim_atual = -1
+    for inicio, fim in spans:
+        if inicio >= fim_atual:
+            total += 1
+        fim_atual = max(fim_atual, fim)
+    return total
+
+
+def _parse_times(texto: str):
+    """
+    Retorna (início, duração) do evento; a duração é None quando não informada.
+
+    Só aceita um horário de início precedido de "às", "das" ou "a partir das";
+    um número solto com "h" pode ser uma duração ("passeio de 3h"). Quando o
+    texto admite mais de uma leitura, retorna None e a extração fica com o LLM,
+    o que inclui qualquer horário escrito que não faça parte do intervalo, do
+    início ou da duração reconhecidos ("9h às 12h", "às 9h até 11h").
+    """
+    intervalos = list(INTERVALO_DE_HORAS.finditer(texto)) or list(INTERVALO_COMPACTO.finditer(texto))
+    ocupado = [match.span() for match in intervalos]
+
+    def livre(match):
+        return not any(inicio <= match.start() < fim for inicio, fim in ocupado)
+
+    inicios = [match for match in HORA_DE_INICIO.finditer(texto) if livre(match)]
+    duracoes = [match for match in DURACAO.finditer(texto) if livre(match)]
+    meio_dia = MEIO_DIA.search(texto)
+    if any(DURACAO_OU_INTERVALO.match(texto, match.end()) for match in duracoes):
+        return None
+
+    usados = [match.span() for match in intervalos + inicios + duracoes]
+    for horario in HORARIO_ESCRITO.finditer(texto):
+        if not any(inicio <= horario.start() < fim for inicio, fim in usados):
+            return None
+
+    if intervalos:
+        if len(intervalos) > 1 or inicios or duracoes or meio_dia:
+            return None
+        grupos = intervalos[0].groups()
+        inicio = _time(*grupos[:3])
+        fim = _time(*grupos[3:])
+        if inicio is None or fim is None:
+            return None
+        return inicio, datetime.combine(date.min, fim) - datetime.combine(date.min, inicio)
+
+    horarios = {_time(*match.groups()) for match in inicios}
+    if meio_dia:
+        horarios.add(_time("12", None, None))
+    if len(horarios) != 1 or None in horarios or len(duracoes) > 1:
+        return None
+    duracao = None
+    if duracoes:
+        horas, minutos = duracoes[0].groups()
+        duracao = timedelta(hours=int(horas), minutes=int(minutos or 0))
+        if not duracao:
+            return None
+    return horarios.pop(), duracao
+
+
+def _time(hora, minuto, periodo):
+    hora = int(hora)
+    minuto = int(minuto) if minuto else 0
+    # "12h da noite" (meia-noite ou meio-dia?) e "14h da manhã" ficam com o LLM
+    if periodo == "manha" and hora > 11 or periodo == "noite" and (hora < 6 or hora == 12):
+        return None
+    if periodo in ("tarde", "noite") and hora < 12:
+        hora += 12
+    if hora > 23 or minuto > 59:
+        return None
+    return datetime.min.time().replace(hour=hora, minute=minuto)
+
+
+def _safe_date(ano: int, mes: int, dia: int) -> Optional[date]:
+    try:
+        return date(ano, mes, dia)
+    except ValueError:
+        return None
+
+
+def _next_date(hoje: date, dia: int, mes: int, ano: Optional[int]) -> Optional[date]:
+    if ano is not None:
+        return _safe_date(ano, mes, dia)
+    data = _safe_date(hoje.year, mes, dia)
+    if data is not None and data < hoje:
+        data = _safe_date(hoje.year + 1, mes, dia)
+    return data
+
+
+def _summary(query: str) -> str:
+    titulo = PREFIXOS_DE_COMANDO.sub("", query.strip())
+    # O título termina antes da primeira indicação de data, horário ou local
+    corte = re.search(
+        r"\s+(?:n[oa]s?\s+(?:pr[oó]xim[oa]\s+)?(?:segunda|ter[cç]a|quarta|quinta|sexta|s[aá]bado|domingo|dia|calend)|"
+        r"(?:pr[oó]xim[oa]\s+)?(?:segunda|ter[cç]a|quarta|quinta|sexta|s[aá]bado|domingo)|"
+        r"amanh[aã]|hoje|dia\s+\d|em\s+\d|\d{4}[/-]|\d{1,2}/\d{1,2}|das\s+\d|de\s+\d|[àa]s\s+\d|ao\s+meio|"
+        r"n[oa]s?\s+[A-ZÁÉÍÓÚ]|em\s+[A-ZÁÉÍÓÚ])",
+        titulo,
+    )
+    if corte and corte.start() > 0:
+        titulo = titulo[:corte.start()]
+    titulo = titulo.strip(" .,'\"")
+    return titulo[:1].upper() + titulo[1:] if titulo else query.strip()
@@ -0,0 +1,83 @@
+import numpy as np
+
+# Intervalos [início, fim) das horas de cada período do dia
+PERIODS = {
+    "Manhã": (5, 12),
+    "Tarde": (13, 18),
+    "Noite": (18, 24)
+}
+
+
+def hourly_columns(forecast_data: dict) -> dict:
+    """
+    Converte as horas de um `forecastday` da WeatherAPI em arrays colunares.
+
+    O campo "time" ("yyyy-mm-dd HH:MM") é lido uma única vez por hora.
+    """
+    hourly_data = forecast_data.get("hour", [])
+    return {
+        "hora": np.fromiter((int(hour["time"][11:13]) for hour in hourly_data), dtype=np.int8, count=len(hourly_data)),
+        "hora_texto": np.array([hour["time"][11:16] for hour in hourly_data]),
+        "temperatura": np.fromiter((hour["temp_c"] for hour in hourly_data), dtype=np.float32, count=len(hourly_data)),
+        "chance_de_chuva": np.fromiter((hour["chance_of_rain"] for hour in hourly_data), dtype=np.int16, count=len(hourly_data)),
+        "umidade": np.fromiter((hour["humidity"] for hour in hourly_data), dtype=np.int16, count=len(hourly_data)),
+        "condicao": np.array([hour["condition"]["text"] for hour in hourly_data]),
+    }
+
+
+def summarize_periods(columns: dict) -> dict:
+    """
+    Calcula as estatísticas de cada período do dia.
+
+    Returns:
+        dict: Período -> {"temp_min", "temp_max", "temp_media", "chuva_max",
+        "umidade_media", "condicao", "mask"}, ou None se não houver horas no período.
+    """
+    resumo = {}
+    for period, (inicio, fim) in PERIODS.items():
+        mask = (columns["hora"] >= inicio) & (columns["hora"] < fim)
+        if not mask.any():
+            resumo[period] = None
+            continue
+        condicoes, contagens = np.unique(columns["condicao"][mask], return_counts=True)
+        resumo[period] = {
+            "temp_min": float(columns["temperatura"][mask].min()),
+            "temp_max": float(columns["temperatura"][mask].max()),
+            "temp_media": float(columns["temperatura"][mask].mean()),
+            "chuva_max": int(columns["chance_de_chuva"][mask].max()),
+            "umidade_media": float(columns["umidade"][mask].mean()),
+            "condicao": str(condicoes[np.argmax(contagens)]),
+            "mask": mask,
+        }
+    return resumo
+
+
+def format_forecast(forecast_data: dict, date_string: str, destino: str, detalhado: bool = False) -> str:
+    """
+    Formata a previsão de um dia em um resumo compacto por período.
+
+    Args:
+        detalhado (bool): Se True, inclui também a previsão de cada hora do período.
+    """
+    columns = hourly_columns(forecast_data)
+    linhas = [f"Previsão para {date_string} em {destino.capitalize()}:"]
+    for period, stats in summarize_periods(columns).items():
+        if stats is None:
+            linhas.append(f"{period}: nenhuma previsão encontrada para este período.")
+            continue
+        linhas.append(
+            f"{period}: {stats['condicao']}, {stats['temp_min']:.0f}-{stats['temp_max']:.0f}°C "
+            f"(média {stats['temp_media']:.1f}°C), chuva até {stats['chuva_max']}%, "
+            f"umidade {stats['umidade_media']:.0f}%"
+        )
+        if detalhado:
+            mask = stats["mask"]
+            for hora, temperatura, condicao, chuva, umidade in zip(
+                columns["hora_texto"][mask], columns["temperatura"][mask], columns["condicao"][mask],
+                columns["chance_de_chuva"][mask], columns["umidade"][mask],
+            ):
+                linhas.append(
+                    f"  Hora: {hora} - Temp: {temperatura:.1f}°C, Condição: {condicao}, "
+                    f"Chance de chuva: {chuva}%, Umidade: {umidade}%"
+                )
+    return "\n".join(linhas) + "\n"
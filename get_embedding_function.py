@@ -1,6 +1,160 @@
+import os
+import threading
+import time
 from langchain_huggingface import HuggingFaceEmbeddings
+from embedding_cache import CachedEmbeddings
 
-def get_embedding_function():
-    model_name = 'Snowflake/snowflake-arctic-embed-l-v2.0'
-    embeddings = HuggingFaceEmbeddings(model_name=model_name)
-    return embeddings
\ No newline at end of file
+MODEL_NAME = 'Snowflake/snowflake-arctic-embed-l-v2.0'
+
+# Configuração do embedding, compartilhada pela ingestão e pelas consultas
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", MODEL_NAME)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM") or 0)  # 0 = dimensão completa do modelo
+ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_int8.onnx")
+
+# Argumentos do SentenceTransformer por backend (onnx requer `optimum[onnxruntime]`)
+BACKENDS = {
+    "torch": {},
+    "onnx": {"backend": "onnx"},
+    "onnx-int8": {"backend": "onnx", "model_kwargs": {"file_name": ONNX_INT8_FILE}},
+}
+
+# Configuração assumida para as bases criadas antes do registro nos metadados
+LEGACY_CONFIG = {"embedding_model": MODEL_NAME, "embedding_backend": "torch", "embedding_dim": 0}
+
+# Registro de modelos de embedding residentes no processo (um por configuração)
+_embedding_registry = {}
+_registry_lock = threading.Lock()
+embedding_stats = {"loads": 0, "hits": 0, "load_time_s": 0.0}
+
+
+def embedding_config(model_name: str = None, backend: str = None, dim: int = None) -> dict:
+    """
+    Retorna a configuração de embedding, no formato gravado nos metadados de
+    cada coleção Chroma. Os valores omitidos vêm das variáveis de ambiente
+    `EMBEDDING_MODEL`, `EMBEDDING_BACKEND` e `EMBEDDING_DIM`.
+    """
+    return {
+        "embedding_model": model_name or EMBEDDING_MODEL,
+        "embedding_backend": backend or EMBEDDING_BACKEND,
+        "embedding_dim": EMBEDDING_DIM if dim is None else dim,
+    }
+
+
+def config_key(config: dict) -> str:
+    """
+    Identifica a configuração no registro e no cache em disco. A configuração
+    padrão mantém o nome do modelo como chave, preservando os caches existentes.
+    """
+    key = config["embedding_model"]
+    if config["embedding_backend"] != "torch":
+        key += f"@{config['embedding_backend']}"
+    if config["embedding_dim"]:
+        key += f"@{config['embedding_dim']}d"
+    return key
+
+
+def get_embedding_function(model_name: str = None, cached: bool = False, backend: str = None, dim: int = None):
+    """
+    Retorna o modelo de embedding, carregando-o apenas uma vez por processo.
+
+    O modelo fica residente em memória e é compartilhado entre todas as
+    chamadas e sessões do Streamlit. O arctic-embed v2 em fp32 ocupa cerca de
+    2 GB; os backends `onnx` e `onnx-int8` (quantizado) reduzem memória e
+    latência, e `dim` trunca os vetores (Matryoshka, ex.: 256).
+
+    Args:
+        model_name (str): O modelo do Hugging Face (padrão: `EMBEDDING_MODEL`).
+        cached (bool): Se True, envolve o modelo com o cache persistente de
+            embeddings em disco (`CachedEmbeddings`), usado na ingestão.
+        backend (str): Uma das chaves de `BACKENDS` (padrão: `EMBEDDING_BACKEND`).
+        dim (int): Dimensão dos vetores; 0 mantém a do modelo (padrão: `EMBEDDING_DIM`).
+    """
+    config = embedding_config(model_name, backend, dim)
+    key = config_key(config)
+    if cached:
+        return _get_cached_embedding_function(config, key)
+
+    embeddings = _embedding_registry.get(key)
+    if embeddings is not None:
+        embedding_stats["hits"] += 1
+        return embeddings
+
+    with _registry_lock:
+        embeddings = _embedding_registry.get(key)
+        if embeddings is None:
+            inicio = time.perf_counter()
+            embeddings = _load_model(config)
+            embedding_stats["load_time_s"] += time.perf_counter() - inicio
+            embedding_stats["loads"] += 1
+            _embedding_registry[key] = embeddings
+        else:
+            embedding_stats["hits"] += 1
+    return embeddings
+
+
+def _load_model(config: dict) -> HuggingFaceEmbeddings:
+    backend = config["embedding_backend"]
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de embedding inválido: {backend} (opções: {', '.join(BACKENDS)})")
+    model_kwargs = dict(BACKENDS[backend])
+    encode_kwargs = {}
+    if config["embedding_dim"]:
+        model_kwargs["truncate_dim"] = config["embedding_dim"]
+        # Vetores truncados deixam de ter norma 1
+        encode_kwargs["normalize_embeddings"] = True
+    return HuggingFaceEmbeddings(
+        model_name=config["embedding_model"], model_kwargs=model_kwargs, encode_kwargs=encode_kwargs
+    )
+
+
+def register_embedding_function(embeddings, config: dict = None):
+    """
+    Registra um modelo já construído no lugar da configuração informada (por
+    padrão, a atual), de modo que `get_embedding_function` o retorne sem
+    carregar o modelo real (ex.: o modelo substituto usado pelo benchmark offline).
+    """
+    with _registry_lock:
+        _embedding_registry[config_key(config or embedding_config())] = embeddings
+
+
+def check_embedding_config(metadata: dict, location: str, config: dict = None) -> bool:
+    """
+    Verifica se uma coleção Chroma foi gerada com a configuração de embedding atual.
+
+    Vetores de modelos, backends ou dimensões diferentes não são comparáveis,
+    então a divergência é um erro em vez de resultados ruins silenciosos.
+
+    Args:
+        metadata (dict): Os metadados da coleção.
+        location (str): A pasta da base, usada na mensagem de erro.
+
+    Returns:
+        bool: True se a coleção ainda não registra a configuração (base antiga,
+            assumida como `LEGACY_CONFIG`).
+    """
+    config = config or embedding_config()
+    metadata = metadata or {}
+    legacy = not any(key in metadata for key in LEGACY_CONFIG)
+    stored = LEGACY_CONFIG if legacy else {key: metadata.get(key) for key in LEGACY_CONFIG}
+    if stored != config:
+        raise ValueError(
+            f"A base '{location}' foi gerada com {config_key(stored)}, mas a configuração atual é "
+            f"{config_key(config)}. Ajuste EMBEDDING_MODEL, EMBEDDING_BACKEND e EMBEDDING_DIM "
+            f"ou recrie a base com `python populate_database.py --reset`."
+        )
+    return legacy
+
+
+def _get_cached_embedding_function(config: dict, key: str):
+    cache_key = ("cached", key)
+    with _registry_lock:
+        embeddings = _embedding_registry.get(cache_key)
+    if embeddings is None:
+        model = get_embedding_function(
+            config["embedding_model"], backend=config["embedding_backend"], dim=config["embedding_dim"]
+        )
+        embeddings = CachedEmbeddings(model, key)
+        with _registry_lock:
+            embeddings = _embedding_registry.setdefault(cache_key, embeddings)
+    return embeddings
@@ -0,0 +1,144 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from unidecode import unidecode
+from rag_cache import STOPWORDS
+
+BM25_FILE = "bm25.json"
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+MMR_LAMBDA = 0.7
+
+
+def tokenize(text: str) -> list[str]:
+    """Minúsculas, sem acentos e sem stopwords ("Forte dos Reis Magos" -> forte, reis, magos)."""
+    return [
+        token for token in re.findall(r"[a-z0-9]+", unidecode(text.lower()))
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    Índice invertido BM25 em memória para os chunks de uma cidade.
+
+    Complementa a busca vetorial em consultas com nomes exatos ("Forte dos Reis
+    Magos"), que os embeddings tendem a diluir. É construído pelo
+    `populate_database` e salvo em `chroma/<cidade>/bm25.json`.
+    """
+
+    def __init__(self, ids: list[str], texts: list[str]):
+        self.ids = ids
+        self.texts = texts
+        self.doc_lengths = []
+        self.postings = {}
+        for doc_index, text in enumerate(texts):
+            frequencies = Counter(tokenize(text))
+            self.doc_lengths.append(sum(frequencies.values()))
+            for term, frequency in frequencies.items():
+                self.postings.setdefault(term, []).append((doc_index, frequency))
+        self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        self._positions = {doc_id: doc_index for doc_index, doc_id in enumerate(ids)}
+
+    def search(self, query: str, k: int = 20) -> list[tuple[str, float]]:
+        """Retorna até `k` pares (id, score) ordenados pelo score BM25."""
+        n_docs = len(self.ids)
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_index, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_index] / self.avg_doc_length)
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        melhores = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.ids[doc_index], score) for doc_index, score in melhores]
+
+    def text(self, doc_id: str) -> str:
+        return self.texts[self._positions[doc_id]]
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["ids"], data["texts"])
+
+
+def build_bm25_index(collection, chroma_path: str, where: dict = None) -> BM25Index:
+    """
+    Constrói e salva o índice BM25 de uma cidade a partir da coleção Chroma,
+    usando apenas os chunks que satisfazem o filtro `where` (ex.: a cidade).
+    """
+    items = collection.get(where=where, include=["documents"])
+    index = BM25Index(items["ids"], items["documents"])
+    index.save(os.path.join(chroma_path, BM25_FILE))
+    return index
+
+
+# Índices carregados por caminho, recarregados quando o arquivo muda
+_bm25_cache = {}
+_bm25_lock = threading.Lock()
+
+
+def get_bm25_index(chroma_path: str):
+    """Retorna o índice BM25 da cidade, ou None se ele ainda não foi construído."""
+    path = os.path.join(chroma_path, BM25_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _bm25_lock:
+        cached = _bm25_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, BM25Index.load(path))
+            _bm25_cache[path] = cached
+    return cached[1]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    """
+    Combina várias listas ordenadas de ids: score = soma de 1 / (k + posição).
+    """
+    scores = {}
+    for ranking in rankings:
+        for position, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + position + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def mmr_select(candidates: list[tuple[str, float]], texts: dict, k: int, lambda_: float = MMR_LAMBDA) -> list[str]:
+    """
+    Seleciona `k` ids por Maximal Marginal Relevance, penalizando chunks muito
+    parecidos com os já escolhidos (como os trechos repetidos pela sobreposição
+    de 80 caracteres do `split_documents`). A similaridade é o Jaccard dos termos.
+    """
+    if not candidates:
+        return []
+    max_score = candidates[0][1] or 1.0
+    termos = {doc_id: set(tokenize(texts[doc_id])) for doc_id, _score in candidates}
+    restantes = list(candidates)
+    escolhidos = []
+    while restantes and len(escolhidos) < k:
+        def mmr(item):
+            doc_id, score = item
+            redundancia = max((_jaccard(termos[doc_id], termos[outro]) for outro in escolhidos), default=0.0)
+            return lambda_ * score / max_score - (1 - lambda_) * redundancia
+        melhor = max(restantes, key=mmr)
+        escolhidos.append(melhor[0])
+        restantes.remove(melhor)
+    return escolhidos
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = "manifest.json"
+
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_source(source: str) -> str:
+    """
+    Normaliza o caminho de um PDF para comparação, independente do sistema
+    em que foi indexado ("pdf\\natal\\guia.pdf" e "pdf/natal/guia.pdf").
+    """
+    return os.path.normpath(source.replace("\\", "/")).replace("\\", "/")
+
+
+def chunk_id(source: str, page, digest: str, seen_ids: dict) -> str:
+    """
+    ID de um chunk a partir da fonte, da página e do hash do conteúdo.
+
+    Chunks idênticos na mesma página recebem um sufixo; `seen_ids` conta as
+    ocorrências e deve ser compartilhado entre os chunks de um mesmo arquivo.
+    """
+    base_id = f"{source}:{page}:{digest[:16]}"
+    occurrence = seen_ids.get(base_id, 0)
+    seen_ids[base_id] = occurrence + 1
+    return base_id if occurrence == 0 else f"{base_id}:{occurrence}"
+
+
+class IndexManifest:
+    """
+    Manifesto da indexação incremental de uma cidade, salvo junto ao Chroma.
+
+    Guarda, para cada PDF indexado, o mtime, o tamanho e o sha256 do arquivo,
+    além do hash do conteúdo de cada chunk gerado a partir dele:
+
+        {"files": {"pdf/natal/guia.pdf": {"mtime_ns": ..., "size": ..., "sha256": "...",
+                                          "chunks": {"<chunk_id>": "<sha256 do texto>"}}}}
+    """
+
+    def __init__(self, chroma_path: str):
+        self.path = os.path.join(chroma_path, MANIFEST_FILE)
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def is_unchanged(self, pdf_path: str) -> bool:
+        """
+        Verifica se o PDF não mudou desde a última indexação.
+
+        Compara primeiro mtime e tamanho; o sha256 só é calculado quando
+        eles diferem (ex.: arquivo copiado ou tocado sem alteração).
+        """
+        entry = self.files.get(pdf_path)
+        if entry is None:
+            return False
+        stat = os.stat(pdf_path)
+        if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return True
+        if entry["size"] == stat.st_size and entry["sha256"] == file_sha256(pdf_path):
+            entry["mtime_ns"] = stat.st_mtime_ns
+            return True
+        return False
+
+    def chunk_ids(self, pdf_path: str) -> set:
+        return set(self.files.get(pdf_path, {}).get("chunks", {}))
+
+    def update(self, pdf_path: str, chunk_hashes: dict):
+        stat = os.stat(pdf_path)
+        self.files[pdf_path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": file_sha256(pdf_path),
+            "chunks": chunk_hashes,
+        }
+
+    def remove(self, pdf_path: str):
+        self.files.pop(pdf_path, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,204 @@
+import math
+from forecast import hourly_columns, summarize_periods
+from poi_index import _chave
+from poi_locations import canonical_name, locate
+
+# Janela de visitas de cada período do dia, em horas (os nomes seguem forecast.PERIODS)
+SLOT_HOURS = {
+    "Manhã": (8, 12),
+    "Tarde": (13, 18),
+    "Noite": (19, 22),
+}
+RAIN_LIMIT = 50  # Chance de chuva (%) a partir da qual atividades ao ar livre são evitadas no período
+DAYTIME_CATEGORIES = {"praia", "natureza", "museu", "historia"}  # Não são visitadas à noite
+POIS_PER_DAY = 6  # Candidatos considerados por dia de viagem
+
+# Estimativa de deslocamento de carro: a distância em linha reta vezes o fator
+# das ruas, na velocidade média urbana. Pontos sem coordenadas contam um
+# deslocamento fixo, o que os deixa por último na escolha do vizinho mais próximo.
+SPEED_KMH = 30
+ROAD_FACTOR = 1.3
+UNKNOWN_TRAVEL_MIN = 20
+
+
+def distance_km(a: tuple, b: tuple) -> float:
+    """Distância em linha reta (haversine) entre dois pares (latitude, longitude)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(h))
+
+
+def travel_min(origem, destino) -> float:
+    """Minutos de deslocamento entre duas coordenadas; 0 no primeiro ponto do dia (origem None)."""
+    if origem is None:
+        return 0.0
+    if origem == "?" or destino is None:
+        return UNKNOWN_TRAVEL_MIN
+    return distance_km(origem, destino) * ROAD_FACTOR / SPEED_KMH * 60
+
+
+def _posicao(poi: dict):
+    # "?" marca um ponto visitado sem coordenadas: o próximo deslocamento é desconhecido
+    return poi["coords"] or "?"
+
+
+def route_min(origem, paradas: list[dict]) -> float:
+    total = 0.0
+    for poi in paradas:
+        total += travel_min(origem, poi["coords"])
+        origem = _posicao(poi)
+    return total
+
+
+def two_opt(origem, paradas: list[dict]) -> list[dict]:
+    """
+    Melhora a ordem das paradas invertendo trechos da rota enquanto o
+    deslocamento total diminuir (2-opt), partindo de `origem`.
+    """
+    melhor = list(paradas)
+    melhor_min = route_min(origem, melhor)
+    melhorou = True
+    while melhorou:
+        melhorou = False
+        for i in range(len(melhor) - 1):
+            for j in range(i + 1, len(melhor)):
+                candidata = melhor[:i] + melhor[i:j + 1][::-1] + melhor[j + 1:]
+                candidata_min = route_min(origem, candidata)
+                if candidata_min < melhor_min - 1e-9:
+                    melhor, melhor_min = candidata, candidata_min
+                    melhorou = True
+    return melhor
+
+
+def rain_by_period(forecast_data: dict) -> dict:
+    """Chance máxima de chuva de cada período do dia; vazio sem previsão."""
+    if not forecast_data:
+        return {}
+    return {
+        period: stats["chuva_max"]
+        for period, stats in summarize_periods(hourly_columns(forecast_data)).items()
+        if stats is not None
+    }
+
+
+def fits_slot(poi: dict, slot: str, chuva) -> bool:
+    if slot == "Noite" and poi["category"] in DAYTIME_CATEGORIES:
+        return False
+    return not (poi["outdoor"] and chuva is not None and chuva >= RAIN_LIMIT)
+
+
+def candidate_pois(index, interest: str, destino: str, n_days: int) -> list[dict]:
+    """
+    Seleciona os pontos do índice que combinam com o interesse, com as suas
+    coordenadas. Nomes que apontam para o mesmo lugar ("Ponta Negra" e "Praia de
+    Ponta Negra") viram um só ponto pelo nome canônico; lugares distintos com as
+    mesmas coordenadas continuam separados. Os pontos sem coordenadas vão para o fim.
+    """
+    localizados = []
+    sem_coordenadas = []
+    vistos = set()
+    for poi in index.search(interest, k=len(index)):
+        chave = canonical_name(destino, poi["name"]) or _chave(poi["name"])
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+        coords = locate(destino, poi["name"])
+        if coords is None:
+            sem_coordenadas.append({**poi, "coords": None})
+        else:
+            localizados.append({**poi, "coords": coords})
+    return (localizados + sem_coordenadas)[:n_days * POIS_PER_DAY]
+
+
+def plan_itinerary(pois: list[dict], dias: list, forecasts: list = None) -> list[dict]:
+    """
+    Distribui os pontos turísticos pelos dias e períodos da viagem.
+
+    Cada dia começa pelo ponto mais relevante que ainda não foi visitado e segue,
+    período a período, para o vizinho mais próximo que cabe no tempo restante
+    do período e é compatível com ele: sem atividades ao ar livre quando a
+    chance de chuva do período passa de `RAIN_LIMIT`, e sem praias, trilhas ou
+    museus à noite. A rota de cada período é então refinada com 2-opt.
+
+    Args:
+        pois (list[dict]): Pontos do `candidate_pois`, do mais para o menos relevante.
+        dias (list[date]): Os dias da viagem.
+        forecasts (list): O `forecastday` de cada dia, ou None quando não houver previsão.
+
+    Returns:
+        list[dict]: Por dia, a chance de chuva de cada período e as paradas de
+            cada período com horário de início, fim e deslocamento em minutos.
+    """
+    forecasts = forecasts or [None] * len(dias)
+    restantes = list(pois)
+    plano = []
+    for dia, forecast_data in zip(dias, forecasts):
+        chuva = rain_by_period(forecast_data)
+        posicao = None
+        periodos = {}
+        for slot, (inicio, fim) in SLOT_HOURS.items():
+            origem = posicao
+            livre = (fim - inicio) * 60
+            paradas = []
+            while True:
+                candidatos = [
+                    poi for poi in restantes
+                    if fits_slot(poi, slot, chuva.get(slot))
+                    and travel_min(posicao, poi["coords"]) + poi["duration_min"] <= livre
+                ]
+                if not candidatos:
+                    break
+                # Sem posição (início do dia), o primeiro candidato é o mais relevante
+                escolhido = min(candidatos, key=lambda poi: travel_min(posicao, poi["coords"]))
+                livre -= travel_min(posicao, escolhido["coords"]) + escolhido["duration_min"]
+                restantes.remove(escolhido)
+                paradas.append(escolhido)
+                posicao = _posicao(escolhido)
+
+            paradas = two_opt(origem, paradas)
+            horario = inicio * 60
+            visitas = []
+            for poi in paradas:
+                deslocamento = travel_min(origem, poi["coords"])
+                horario += deslocamento
+                visitas.append({"poi": poi, "inicio": horario, "fim": horario + poi["duration_min"],
+                                "deslocamento_min": deslocamento})
+                horario += poi["duration_min"]
+                origem = _posicao(poi)
+            if paradas:
+                posicao = origem
+            periodos[slot] = visitas
+        plano.append({"dia": dia, "chuva": chuva, "periodos": periodos})
+    return plano
+
+
+def _hora(minutos: float) -> str:
+    minutos = int(round(minutos))
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def format_itinerary(plano: list[dict], destino: str) -> str:
+    """Formata o roteiro em texto compacto, um período por linha."""
+    deslocamento_total = sum(
+        visita["deslocamento_min"]
+        for dia in plano for visitas in dia["periodos"].values() for visita in visitas
+    )
+    linhas = [f"Roteiro otimizado para {destino.capitalize()} (cerca de {deslocamento_total:.0f} min de deslocamento no total):"]
+    if any(not dia["chuva"] for dia in plano):
+        linhas.append("(Sem previsão do tempo para alguns dias: consulte o Weather Forecast antes para considerar a chuva.)")
+    for dia in plano:
+        linhas.append(dia["dia"].strftime("%Y/%m/%d"))
+        for slot, visitas in dia["periodos"].items():
+            chuva = f" (chuva até {dia['chuva'][slot]}%)" if slot in dia["chuva"] else ""
+            if not visitas:
+                linhas.append(f"  {slot}{chuva}: livre")
+                continue
+            paradas = []
+            for visita in visitas:
+                poi = visita["poi"]
+                detalhes = [poi["category"], "ao ar livre" if poi["outdoor"] else "coberto"]
+                if poi["coords"] is None:
+                    detalhes.append("localização desconhecida")
+                paradas.append(f"{_hora(visita['inicio'])}-{_hora(visita['fim'])} {poi['name']} ({', '.join(detalhes)})")
+            linhas.append(f"  {slot}{chuva}: " + "; ".join(paradas))
+    return "\n".join(linhas)
@@ -0,0 +1,126 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from langchain_core.load import dumpd, load
+
+PROMPT_CACHE_PATH = "prompts"
+LATEST_FILE = "latest"
+
+# Tempo de criação de cada recurso, na ordem em que foram inicializados
+_startup_timings = []
+_startup_lock = threading.Lock()
+
+
+def lazy_resource(name: str):
+    """
+    Decorador para fábricas de recursos caros (clientes, modelos, executores).
+
+    A fábrica é executada apenas na primeira chamada; as seguintes retornam o
+    mesmo objeto. O tempo de criação é registrado em `startup_report()`.
+    """
+    def decorator(factory):
+        instance = []
+        lock = threading.Lock()
+
+        @functools.wraps(factory)
+        def wrapper():
+            if not instance:
+                with lock:
+                    if not instance:
+                        inicio = time.perf_counter()
+                        resource = factory()
+                        with _startup_lock:
+                            _startup_timings.append({"name": name, "seconds": time.perf_counter() - inicio})
+                        instance.append(resource)
+            return instance[0]
+
+        wrapper.is_initialized = lambda: bool(instance)
+        return wrapper
+    return decorator
+
+
+def startup_report() -> list[dict]:
+    """
+    Retorna o tempo gasto na criação de cada recurso já inicializado.
+
+    Recursos que dependem de outros incluem o tempo das dependências criadas
+    durante a sua própria inicialização.
+    """
+    with _startup_lock:
+        return list(_startup_timings)
+
+
+def format_startup_report() -> str:
+    linhas = [f"{item['name']}: {item['seconds'] * 1000:.0f} ms" for item in startup_report()]
+    return "\n".join(linhas) if linhas else "Nenhum recurso inicializado."
+
+
+def _prompt_dir(repo: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, repo.replace("/", "__"))
+
+
+def _save_prompt(prompt, repo: str, version: str, cache_dir: str):
+    prompt_dir = _prompt_dir(repo, cache_dir)
+    os.makedirs(prompt_dir, exist_ok=True)
+    with open(os.path.join(prompt_dir, f"{version}.json"), "w", encoding="utf-8") as f:
+        json.dump(dumpd(prompt), f, ensure_ascii=False, indent=1)
+    with open(os.path.join(prompt_dir, LATEST_FILE), "w", encoding="utf-8") as f:
+        f.write(version)
+
+
+def _load_prompt(repo: str, version: str, cache_dir: str):
+    prompt_dir = _prompt_dir(repo, cache_dir)
+    if version is None:
+        latest_path = os.path.join(prompt_dir, LATEST_FILE)
+        if not os.path.exists(latest_path):
+            return None
+        with open(latest_path, encoding="utf-8") as f:
+            version = f.read().strip()
+    path = os.path.join(prompt_dir, f"{version}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return load(json.load(f))
+
+
+def _pull_and_cache(ref: str, repo: str, version: str, cache_dir: str):
+    from langchain import hub
+
+    prompt = hub.pull(ref)
+    metadata = getattr(prompt, "metadata", None) or {}
+    version = version or metadata.get("lc_hub_commit_hash") or hashlib.sha256(
+        json.dumps(dumpd(prompt), sort_keys=True).encode("utf-8")
+    ).hexdigest()[:12]
+    _save_prompt(prompt, repo, version, cache_dir)
+    return prompt
+
+
+def pull_prompt(ref: str, cache_dir: str = PROMPT_CACHE_PATH):
+    """
+    Obtém um prompt do LangChain Hub com cache local versionado.
+
+    Se houver uma cópia em disco, ela é usada imediatamente e o hub é consultado
+    em segundo plano para atualizar o cache da próxima inicialização. Sem cópia
+    local, o prompt é baixado e salvo em `prompts/<dono>__<repo>/<versão>.json`.
+
+    Args:
+        ref (str): O identificador no hub, com versão opcional ("dono/repo:commit").
+    """
+    repo, _, version = ref.partition(":")
+    version = version or None
+    cached = _load_prompt(repo, version, cache_dir)
+    if cached is not None:
+        if version is None:
+            threading.Thread(target=_refresh_prompt, args=(ref, repo, cache_dir), daemon=True).start()
+        return cached
+    return _pull_and_cache(ref, repo, version, cache_dir)
+
+
+def _refresh_prompt(ref: str, repo: str, cache_dir: str):
+    try:
+        _pull_and_cache(ref, repo, None, cache_dir)
+    except Exception as e:
+        print(f"Não foi possível atualizar o prompt '{ref}' do hub: {e}")
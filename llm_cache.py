@@ -0,0 +1,119 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumpd, load
+from tracing import count
+
+LLM_CACHE_PATH = "llm_cache.sqlite3"
+LLM_CACHE_MAX_ENTRIES = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    namespace TEXT,
+    generations TEXT,
+    last_used REAL
+);
+CREATE INDEX IF NOT EXISTS responses_by_use ON responses (namespace, last_used);
+"""
+
+
+def cache_key(namespace: str, llm_string: str, prompt: str) -> str:
+    """
+    sha256 de (cadeia, modelo e parâmetros, prompt renderizado).
+
+    O `llm_string` do LangChain já inclui o modelo, a temperatura, os
+    `stop` e os demais parâmetros do cliente.
+    """
+    return hashlib.sha256("\0".join((namespace, llm_string, prompt)).encode("utf-8")).hexdigest()
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Cache das respostas do LLM em SQLite, endereçado pelo conteúdo da chamada.
+
+    É ativado por cadeia, passando `cache=get_llm_cache("<cadeia>")` ao criar o
+    cliente do modelo, e faz sentido para sub-cadeias determinísticas (como a
+    extração de eventos com temperatura 0), em que a mesma entrada deve gerar
+    a mesma resposta. Cada cadeia guarda no máximo `max_entries` respostas;
+    as usadas há mais tempo são descartadas primeiro.
+    """
+
+    def __init__(self, namespace: str, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = cache_key(self.namespace, llm_string, prompt)
+        with self._lock:
+            row = self._db.execute("SELECT generations FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.stats["hits"] += 1
+        count("cache_hits")
+        return [load(generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        key = cache_key(self.namespace, llm_string, prompt)
+        generations = json.dumps([dumpd(generation) for generation in return_val], ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, namespace, generations, last_used) VALUES (?, ?, ?, ?)",
+                (key, self.namespace, generations, time.time()),
+            )
+            excess = self._db.execute(
+                "SELECT COUNT(*) FROM responses WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses WHERE namespace = ? ORDER BY last_used LIMIT ?)",
+                    (self.namespace, excess),
+                )
+                self.stats["evictions"] += excess
+            self._db.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE namespace = ?", (self.namespace,))
+            self._db.commit()
+
+    def hit_rate(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def report(self) -> dict:
+        with self._lock:
+            entries = self._db.execute(
+                "SELECT COUNT(*) FROM responses WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        return {**self.stats, "entries": entries, "hit_rate": self.hit_rate()}
+
+
+# Um cache por cadeia, compartilhado no processo
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(namespace: str) -> SQLiteLLMCache:
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = SQLiteLLMCache(namespace)
+        return _caches[namespace]
+
+
+def llm_cache_report() -> dict:
+    """Estatísticas de acertos e faltas de cada cadeia com cache."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {namespace: cache.report() for namespace, cache in caches.items()}
@@ -0,0 +1,70 @@
+import re
+from typing import Union
+from langchain.agents import AgentOutputParser
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.exceptions import OutputParserException
+
+FINAL_ANSWER_ACTION = "Final Answer:"
+
+ACTION_PATTERN = re.compile(
+    r"Action\s*\d*\s*:[\s]*(.*?)[\s]*Action\s*\d*\s*Input\s*\d*\s*:[\s]*(.*?)"
+    r"(?=\n\s*(?:Thought\s*:|Action\s*\d*\s*:)|\Z)",
+    re.DOTALL,
+)
+
+MISSING_ACTION_ERROR = (
+    "Formato inválido: cada ação deve ter as linhas 'Action:' e 'Action Input:', "
+    "ou a resposta deve conter 'Final Answer:'."
+)
+
+# Instruções acrescentadas à descrição das ferramentas no modo paralelo
+PARALLEL_TOOLS_INSTRUCTIONS = """
+
+Você pode executar VÁRIAS ferramentas independentes na mesma etapa. Para isso, escreva um par
+"Action:"/"Action Input:" para cada chamada, um após o outro, antes de aguardar as observações.
+Todas as chamadas são executadas ao mesmo tempo e as observações retornam juntas, na mesma ordem.
+Agrupe apenas chamadas que não dependem do resultado umas das outras. Exemplo:
+
+Thought: Preciso do clima e dos pontos turísticos de praia.
+Action: Weather Forecast
+Action Input: 2025/08/01 - 2025/08/04
+Action: Query RAG
+Action Input: praias
+"""
+
+
+class ReActMultiActionOutputParser(AgentOutputParser):
+    """
+    Parser ReAct que aceita várias ações por etapa.
+
+    Cada par "Action:"/"Action Input:" vira um `AgentAction`; o `AgentExecutor`
+    executa a lista toda antes de devolver as observações ao modelo. Uma resposta
+    com um único par se comporta como o `ReActSingleInputOutputParser`.
+    """
+
+    def parse(self, text: str) -> Union[list[AgentAction], AgentFinish]:
+        matches = list(ACTION_PATTERN.finditer(text))
+        if matches:
+            actions = []
+            inicio = 0
+            for match in matches:
+                tool = match.group(1).strip()
+                tool_input = match.group(2).strip().strip('"')
+                # O log de cada ação inclui o raciocínio ("Thought") escrito antes dela
+                actions.append(AgentAction(tool, tool_input, text[inicio:match.end()]))
+                inicio = match.end()
+            return actions
+
+        if FINAL_ANSWER_ACTION in text:
+            return AgentFinish({"output": text.split(FINAL_ANSWER_ACTION)[-1].strip()}, text)
+
+        raise OutputParserException(
+            f"Could not parse LLM output: `{text}`",
+            observation=MISSING_ACTION_ERROR,
+            llm_output=text,
+            send_to_llm=True,
+        )
+
+    @property
+    def _type(self) -> str:
+        return "react-multi-action"
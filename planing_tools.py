@@ -1,80 +1,49 @@
 from dotenv import load_dotenv
 import os
+import time
 import requests
+from chroma_store import (
+    CHROMA_PATH, COLLECTION_NAME, city_filter, get_client, get_collection, migrate_legacy_stores, pending_legacy_stores,
+)
 from get_embedding_function import get_embedding_function
+from rag_cache import QueryCache
+from hybrid_retrieval import get_bm25_index, mmr_select, reciprocal_rank_fusion
+from poi_index import get_poi_index
+from forecast import format_forecast
+from itinerary import candidate_pois, format_itinerary, plan_itinerary
+from weather_client import WeatherClient, parse_date, parse_date_range
 from langchain_chroma import Chroma
-import chromadb
+from lazy_init import lazy_resource
+from tracing import count, span
 
 load_dotenv()
 
-client = chromadb.Client()
-collection = client.get_collection(name="agente-turistico")
 
-
-CHROMA_PATH = "chroma"
+RAG_K = 5
+RAG_CANDIDATES = 20  # Candidatos de cada busca (vetorial e BM25) antes da fusão
 WEATHER_API = os.getenv('WEATHER_API')
-BASE_URL = "http://api.weatherapi.com/v1/forecast.json"
 
-def weatherapi_forecast_periods(date_string: str, destino: str) -> str:
+@lazy_resource("Weather client")
+def get_weather_client():
+    return WeatherClient(WEATHER_API)
+
+
+def weatherapi_forecast_periods(date_string: str, destino: str, detalhado: bool = False) -> str:
     """
     Obtém a previsão do tempo para a cidade da cidade destino em uma data específica,
     separada em manhã, tarde e noite.
 
     Args:
         date_string (str): Uma string contendo a data no formato yyyy-mm-dd.
+        detalhado (bool): Se True, inclui a previsão de cada hora além do resumo por período.
 
     Returns:
         str: Uma string contendo as previsões separadas por períodos para a data especificada.
     """
     try:
-        params = {
-            "key": WEATHER_API,
-            "q": destino.capitalize(),
-            "dt": date_string,
-            "aqi": "no",
-            "alerts": "no",
-            "lang": "pt"
-        }
-        response = requests.get(BASE_URL, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        if data and data.get("forecast") and data["forecast"].get("forecastday"):
-            forecast_data = data["forecast"]["forecastday"][0]
-            hourly_data = forecast_data.get("hour", [])
-
-            periods = {
-                "Manhã": range(5, 12),
-                "Tarde": range(13, 18),
-                "Noite": range(18, 24)
-            }
-
-            result = f"Previsão para {date_string} em {destino.capitalize()}:\n"
-            for period, hours in periods.items():
-                result += f"\n{period}:\n"
-                filtered_data = [
-                    {
-                        "hora": hour["time"].split(" ")[1],
-                        "temperatura": hour["temp_c"],
-                        "condicao": hour["condition"]["text"],
-                        "chance_de_chuva": hour["chance_of_rain"],
-                        "umidade": hour["humidity"]
-                    }
-                    for hour in hourly_data if int(hour["time"].split(" ")[1].split(":")[0]) in hours
-                ]
-                if filtered_data:
-                    for hour in filtered_data:
-                        result += (
-                            f"Hora: {hour['hora']} - "
-                            f"Temp: {hour['temperatura']}°C, "
-                            f"Condição: {hour['condicao']}, "
-                            f"Chance de chuva: {hour['chance_de_chuva']}%, "
-                            f"Umidade: {hour['umidade']}%\n"
-                        )
-                else:
-                    result += "  Nenhuma previsão encontrada para este período.\n"
-
-            return result
+        forecast_data = get_weather_client().forecast_day(destino, parse_date(date_string))
+        if forecast_data:
+            return format_forecast(forecast_data, date_string, destino, detalhado)
         else:
             return "Previsão não encontrada para essa data."
     except requests.exceptions.RequestException as e:
@@ -82,12 +51,212 @@ def weatherapi_forecast_periods(date_string: str, destino: str) -> str:
     except Exception as e:
         return f"Erro inesperado: {str(e)}"
 
+
+def weatherapi_forecast_range(date_range: str, destino: str, detalhado: bool = False) -> str:
+    """
+    Obtém a previsão do tempo para todos os dias de um intervalo em uma única chamada.
+
+    Os dias são consultados concorrentemente e as previsões já obtidas são
+    reaproveitadas do cache.
+
+    Args:
+        date_range (str): Um intervalo no formato "yyyy/mm/dd - yyyy/mm/dd" ou uma única data,
+            de no máximo `MAX_FORECAST_DAYS` dias.
+        detalhado (bool): Se True, inclui a previsão de cada hora além do resumo por período.
+
+    Returns:
+        str: As previsões por período de cada dia do intervalo.
+    """
+    try:
+        dias = parse_date_range(date_range)
+    except ValueError as e:
+        return f"Erro: {str(e)}"
+
+    resultados = []
+    for dia, forecast_data in zip(dias, get_weather_client().forecast_range(destino, dias)):
+        date_string = dia.strftime("%Y/%m/%d")
+        if isinstance(forecast_data, requests.exceptions.RequestException):
+            resultados.append(f"Erro ao buscar informações meteorológicas para {date_string}: {str(forecast_data)}")
+        elif isinstance(forecast_data, ValueError):
+            resultados.append(f"Previsão indisponível para {date_string}: {str(forecast_data)}")
+        elif isinstance(forecast_data, Exception):
+            resultados.append(f"Erro inesperado para {date_string}: {str(forecast_data)}")
+        elif forecast_data:
+            resultados.append(format_forecast(forecast_data, date_string, destino, detalhado))
+        else:
+            resultados.append(f"Previsão não encontrada para {date_string}.")
+    return "\n".join(resultados)
+
+
+@lazy_resource("Chroma")
+def get_chroma_db() -> Chroma:
+    """
+    Retorna o banco Chroma compartilhado por todos os destinos.
+
+    As cidades ficam em uma única coleção e são separadas por filtro nos
+    metadados, então um único cliente atende qualquer número de destinos.
+
+    Bancos ainda no layout antigo (um por cidade) são copiados para a coleção
+    antes da primeira consulta, sem novo embedding e sem apagar os originais.
+
+    Returns:
+        Chroma: O cliente Chroma compartilhado.
+    """
+    # Valida (ou registra) a configuração de embedding da coleção antes da primeira consulta
+    get_collection()
+    if pending_legacy_stores():
+        migrate_legacy_stores()
+    return Chroma(
+        client=get_client(),
+        collection_name=COLLECTION_NAME,
+        embedding_function=get_embedding_function(),
+    )
+
+
+def preload_chroma_dbs(destinos) -> dict:
+    """
+    Carrega o modelo de embedding, abre o banco Chroma e os índices BM25 dos
+    destinos informados.
+
+    Deve ser chamada na inicialização da aplicação para que a primeira consulta
+    ao RAG não pague o custo de carregamento.
+
+    Returns:
+        dict: A quantidade de destinos e o tempo de carregamento.
+    """
+    inicio = time.perf_counter()
+    get_embedding_function()
+    get_chroma_db()
+    destinos = list(destinos)
+    for destino in destinos:
+        get_bm25_index(f"{CHROMA_PATH}/{destino}")
+    return {"destinos": len(destinos), "load_time_s": time.perf_counter() - inicio}
+
+
+# Cache de resultados do RAG compartilhado entre as sessões do processo
+rag_cache = QueryCache()
+
+
+def retrieve(query_text: str, destino: str, k: int = RAG_K, hybrid: bool = True, mmr: bool = True,
+             query_embedding=None) -> list[tuple[str, str]]:
+    """
+    Busca os chunks mais relevantes do destino.
+
+    No modo híbrido, os candidatos da busca vetorial e do índice BM25 da cidade
+    são combinados por reciprocal rank fusion; com `mmr`, chunks quase
+    repetidos (sobreposição entre chunks vizinhos) são descartados. Sem índice
+    BM25 (base ainda não reprocessada), usa apenas a busca vetorial.
+
+    Args:
+        query_text (str): A consulta em linguagem natural.
+        destino (str): O nome normalizado da cidade (ex.: "natal").
+        k (int): Quantidade de chunks retornados.
+        query_embedding: O embedding da consulta, se já calculado.
+
+    Returns:
+        list[tuple[str, str]]: Pares (id do chunk, texto) em ordem de relevância.
+    """
+    if query_embedding is None:
+        query_embedding = get_embedding_function().embed_query(query_text)
+    results = get_chroma_db().similarity_search_by_vector_with_relevance_scores(
+        query_embedding, k=RAG_CANDIDATES if hybrid or mmr else k, filter=city_filter(destino)
+    )
+    texts = {}
+    vector_ranking = []
+    for doc, _score in results:
+        doc_id = doc.id or doc.metadata.get("id")
+        texts[doc_id] = doc.page_content
+        vector_ranking.append(doc_id)
+
+    bm25 = get_bm25_index(f"{CHROMA_PATH}/{destino}") if hybrid else None
+    if bm25 is not None:
+        bm25_ranking = []
+        for doc_id, _score in bm25.search(query_text, k=RAG_CANDIDATES):
+            texts.setdefault(doc_id, bm25.text(doc_id))
+            bm25_ranking.append(doc_id)
+        ranking = reciprocal_rank_fusion([vector_ranking, bm25_ranking])
+    else:
+        ranking = reciprocal_rank_fusion([vector_ranking])
+
+    if mmr:
+        selected = mmr_select(ranking, texts, k)
+    else:
+        selected = [doc_id for doc_id, _score in ranking[:k]]
+    return [(doc_id, texts[doc_id]) for doc_id in selected]
+
+
 def query_rag(query_text: str, destino: str) -> str:
-    embedding_function = get_embedding_function()
-    db = Chroma(collection_name="agente-turistico", persist_directory=f"{CHROMA_PATH}/{destino}", embedding_function=embedding_function)
+    cached = rag_cache.get(destino, query_text)
+    if cached is not None:
+        count("cache_hits")
+        return cached
 
-    
-    results = db.similarity_search_with_score(f"{destino}: {query_text}", k=5)
+    # O destino já é filtrado pela base; prefixá-lo na consulta só adicionava ruído
+    with span("embedding"):
+        query_embedding = get_embedding_function().embed_query(query_text)
+    cached = rag_cache.get_similar(destino, query_embedding)
+    if cached is not None:
+        count("cache_hits")
+        rag_cache.put(destino, query_text, cached, query_embedding)
+        return cached
 
-    context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results])
+    with span("retrieve"):
+        results = retrieve(query_text, destino, query_embedding=query_embedding)
+
+    context_text = "\n\n---\n\n".join([text for _doc_id, text in results])
+    rag_cache.put(destino, query_text, context_text, query_embedding)
     return context_text
+
+
+def list_attractions(interest: str, destino: str, k: int = 10) -> str:
+    """
+    Lista os pontos turísticos do destino que combinam com um interesse,
+    a partir do índice estruturado gerado pelo `populate_database`, sem busca semântica.
+
+    Args:
+        interest (str): Categorias ou interesses (ex.: "praias e trilhas", "dia de chuva").
+        destino (str): O nome normalizado da cidade (ex.: "natal").
+
+    Returns:
+        str: Um ponto por linha, com categoria, duração típica, bairro e se é ao ar livre.
+    """
+    index = get_poi_index(f"{CHROMA_PATH}/{destino}")
+    if index is None:
+        return "Índice de atrações indisponível para este destino. Use a ferramenta Query RAG."
+    linhas = []
+    for poi in index.search(interest, k=k):
+        detalhes = [poi["category"], "ao ar livre" if poi["outdoor"] else "local coberto", f"cerca de {poi['duration_min']} min"]
+        if poi["neighbourhood"]:
+            detalhes.append(f"bairro {poi['neighbourhood']}")
+        linhas.append(f"- {poi['name']} ({', '.join(detalhes)})")
+    return "\n".join(linhas) if linhas else "Nenhuma atração encontrada para esse interesse."
+
+
+def optimize_itinerary(tool_input: str, destino: str) -> str:
+    """
+    Monta o roteiro dia a dia com as atrações do destino, sem LLM e sem rede.
+
+    As atrações vêm do índice de pontos turísticos e a chuva prevista vem das
+    previsões já consultadas pela ferramenta Weather Forecast (em cache); dias
+    sem previsão são planejados sem restrição de chuva.
+
+    Args:
+        tool_input (str): O intervalo de datas e, após ";", os interesses
+            (ex.: "2025/08/01 - 2025/08/03; praias e museus").
+        destino (str): O nome normalizado da cidade (ex.: "natal").
+
+    Returns:
+        str: As atrações de cada dia por período, com horários.
+    """
+    date_range, _, interest = tool_input.partition(";")
+    try:
+        dias = parse_date_range(date_range)
+    except ValueError as e:
+        return f"Erro: {str(e)}"
+    index = get_poi_index(f"{CHROMA_PATH}/{destino}")
+    if index is None:
+        return "Índice de atrações indisponível para este destino. Use a ferramenta Query RAG."
+    client = get_weather_client()
+    forecasts = [client.get_cached(destino, dia) for dia in dias]
+    pois = candidate_pois(index, interest.strip(), destino, len(dias))
+    return format_itinerary(plan_itinerary(pois, dias, forecasts), destino)
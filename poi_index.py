@@ -0,0 +1,213 @@
+import json
+import os
+import re
+import threading
+from unidecode import unidecode
+
+POI_FILE = "poi.json"
+
+# Palavra que inicia o nome de um ponto turístico -> (categoria, ao ar livre, duração típica em minutos)
+TIPOS = {
+    "praia": ("praia", True, 180),
+    "ponta": ("praia", True, 180),
+    "baia": ("praia", True, 180),
+    "piscinas": ("praia", True, 150),
+    "forte": ("historia", True, 90),
+    "memorial": ("museu", False, 60),
+    "museu": ("museu", False, 90),
+    "teatro": ("cultura", False, 120),
+    "casa": ("cultura", False, 60),
+    "centro": ("cultura", False, 60),
+    "parque": ("natureza", True, 120),
+    "lagoa": ("natureza", True, 150),
+    "morro": ("natureza", True, 60),
+    "dunas": ("natureza", True, 120),
+    "acude": ("natureza", True, 90),
+    "ilha": ("natureza", True, 90),
+    "rio": ("natureza", True, 120),
+    "santuario": ("natureza", True, 120),
+    "mirante": ("natureza", True, 45),
+    "trilha": ("natureza", True, 120),
+    "mercado": ("compras", False, 60),
+    "feira": ("compras", True, 60),
+    "shopping": ("compras", False, 90),
+    "catedral": ("religioso", False, 45),
+    "igreja": ("religioso", False, 45),
+    "capela": ("religioso", False, 30),
+    "aquario": ("passeio", False, 90),
+    "ponte": ("passeio", True, 30),
+    "farol": ("passeio", True, 45),
+}
+
+# Interesses do usuário que apontam para cada categoria
+INTERESSES = {
+    "praia": {"praia", "praias", "mar", "banho", "sol", "piscinas", "mergulho"},
+    "natureza": {"natureza", "trilha", "trilhas", "ecologico", "ecoturismo", "dunas", "lagoa", "aventura", "paisagem", "paisagens", "mirante"},
+    "historia": {"historia", "historico", "historicos", "patrimonio", "forte", "arquitetura"},
+    "museu": {"museu", "museus", "arte", "exposicao", "exposicoes"},
+    "cultura": {"cultura", "cultural", "teatro", "show", "shows", "tradicao"},
+    "compras": {"compras", "artesanato", "mercado", "feira", "lembrancinhas", "souvenir"},
+    "religioso": {"igreja", "igrejas", "religioso", "religiao", "catedral", "fe"},
+    "passeio": {"passeio", "passeios", "familia", "criancas", "aquario"},
+}
+INTERNO = {"chuva", "chuvoso", "coberto", "fechado", "interno"}
+AO_AR_LIVRE = {"livre", "externo", "sol"}
+
+CONECTORES = {"de", "do", "da", "dos", "das"}
+PALAVRA = r"[A-Za-zÀ-ÿ'’-]+"
+NOME = re.compile(
+    r"(?<![\wÀ-ÿ])((?i:" + "|".join(sorted({*TIPOS, "baía", "açude", "santuário", "aquário"}, key=len, reverse=True)) + r"))"
+    r"((?:\s+(?:(?:de|do|da|dos|das)\s+" + PALAVRA + r"|[A-ZÁÉÍÓÚÂÊÔÃÕÇ]" + PALAVRA + r")){1,4})"
+)
+BAIRRO = re.compile(r"\bbairro\s+(?:de\s+|do\s+|da\s+|dos\s+|das\s+)?([A-ZÁÉÍÓÚÂÊÔÃÕÇ]" + PALAVRA + r"(?:\s+[A-ZÁÉÍÓÚÂÊÔÃÕÇ]" + PALAVRA + r")*)")
+IGNORAR = {"rio grande", "ponta de", "casa de", "centro de"}  # Nomes que não são atrações
+
+
+def _chave(texto: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", unidecode(texto.lower())))
+
+
+def _formatar_nome(tipo: str, resto: str) -> str:
+    palavras = [tipo.capitalize()] + [p if p in CONECTORES else p[0].upper() + p[1:] for p in resto.split()]
+    return " ".join(palavras)
+
+
+def extract_pois(ids: list[str], texts: list[str]) -> list[dict]:
+    """
+    Extrai pontos turísticos dos chunks por regras, sem LLM.
+
+    Um ponto é um tipo de lugar ("Praia", "Forte", "Museu"...) seguido de um
+    nome ("do Madeiro", "dos Reis Magos"). Nomes repetidos em vários chunks são
+    unificados; o bairro vem de menções a "bairro X" no mesmo chunk.
+
+    Returns:
+        list[dict]: Pontos ordenados pelo número de menções no corpus.
+    """
+    pois = {}
+    for doc_id, text in zip(ids, texts):
+        # Junta palavras quebradas pelo limite de linha da transcrição
+        text = re.sub(r"(?<=\w)-?\n(?=\w)", "", text).replace("\n", " ")
+        bairro = BAIRRO.search(text)
+        for match in NOME.finditer(text):
+            tipo = unidecode(match.group(1).lower())
+            resto = match.group(2).strip()
+            palavras = resto.split()
+            # Descarta continuações curtas demais para serem nomes ("praia de se")
+            if len(palavras[-1]) < 3 or palavras[-1] in CONECTORES:
+                continue
+            nome = _formatar_nome(match.group(1).lower(), resto)
+            chave = _chave(nome)
+            if any(chave.startswith(ignorar) for ignorar in IGNORAR):
+                continue
+            categoria, ao_ar_livre, duracao = TIPOS[tipo]
+            poi = pois.setdefault(chave, {
+                "name": nome,
+                "category": categoria,
+                "neighbourhood": "",
+                "duration_min": duracao,
+                "outdoor": ao_ar_livre,
+                "chunk_ids": [],
+                "mentions": 0,
+            })
+            poi["mentions"] += 1
+            if doc_id not in poi["chunk_ids"]:
+                poi["chunk_ids"].append(doc_id)
+            if bairro and not poi["neighbourhood"]:
+                poi["neighbourhood"] = bairro.group(1)
+    return sorted(pois.values(), key=lambda poi: poi["mentions"], reverse=True)
+
+
+class POIIndex:
+    """
+    Índice colunar dos pontos turísticos de uma cidade.
+
+    Cada campo é uma lista (coluna) com uma posição por ponto, salvas em
+    `chroma/<cidade>/poi.json` pelo `populate_database`. Na carga, as posições
+    são agrupadas por categoria, de modo que uma consulta só percorre os
+    pontos das categorias pedidas.
+    """
+
+    COLUMNS = ("name", "category", "neighbourhood", "duration_min", "outdoor", "chunk_ids", "mentions")
+
+    def __init__(self, columns: dict):
+        self.columns = columns
+        self.by_category = {}
+        for row, categoria in enumerate(columns["category"]):
+            self.by_category.setdefault(categoria, []).append(row)
+        self._keys = [_chave(nome) for nome in columns["name"]]
+
+    @classmethod
+    def from_pois(cls, pois: list[dict]) -> "POIIndex":
+        return cls({column: [poi[column] for poi in pois] for column in cls.COLUMNS})
+
+    def __len__(self) -> int:
+        return len(self.columns["name"])
+
+    def row(self, row: int) -> dict:
+        return {column: values[row] for column, values in self.columns.items()}
+
+    def search(self, interest: str = "", outdoor: bool = None, k: int = 10) -> list[dict]:
+        """
+        Retorna até `k` pontos que combinam com o interesse, por número de menções.
+
+        O interesse pode citar categorias ("praias e museus"), sinônimos
+        ("artesanato", "trilhas") ou parte de um nome ("Madeiro"). Sem nenhuma
+        correspondência, retorna os pontos mais citados da cidade.
+        """
+        termos = set(_chave(interest).split())
+        if outdoor is None and termos & INTERNO:
+            outdoor = False
+        elif outdoor is None and termos & AO_AR_LIVRE:
+            outdoor = True
+        categorias = [categoria for categoria, sinonimos in INTERESSES.items() if termos & (sinonimos | {categoria})]
+        if categorias:
+            rows = sorted({row for categoria in categorias for row in self.by_category.get(categoria, [])})
+        else:
+            chave = _chave(interest)
+            rows = [row for row, key in enumerate(self._keys) if chave and chave in key] or range(len(self))
+        if outdoor is not None:
+            rows = [row for row in rows if self.columns["outdoor"][row] == outdoor]
+        melhores = sorted(rows, key=lambda row: self.columns["mentions"][row], reverse=True)[:k]
+        return [self.row(row) for row in melhores]
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.columns, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "POIIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+
+def build_poi_index(collection, chroma_path: str, where: dict = None) -> POIIndex:
+    """
+    Constrói e salva o índice de pontos turísticos de uma cidade a partir da
+    coleção Chroma, usando apenas os chunks que satisfazem o filtro `where`.
+    """
+    items = collection.get(where=where, include=["documents"])
+    index = POIIndex.from_pois(extract_pois(items["ids"], items["documents"]))
+    index.save(os.path.join(chroma_path, POI_FILE))
+    return index
+
+
+# Índices carregados por caminho, recarregados quando o arquivo muda
+_poi_cache = {}
+_poi_lock = threading.Lock()
+
+
+def get_poi_index(chroma_path: str):
+    """Retorna o índice de pontos turísticos da cidade, ou None se ele ainda não foi construído."""
+    path = os.path.join(chroma_path, POI_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _poi_lock:
+        cached = _poi_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, POIIndex.load(path))
+            _poi_cache[path] = cached
+    return cached[1]
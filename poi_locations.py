@@ -0,0 +1,128 @@
+from poi_index import _chave
+
+# Coordenadas (latitude, longitude) aproximadas dos principais pontos turísticos
+# de cada destino, usadas para ordenar as visitas do roteiro. A precisão de
+# algumas centenas de metros basta para estimar deslocamentos.
+#
+# As chaves são o nome canônico normalizado de cada lugar, e um nome do
+# `poi_index` corresponde a uma chave quando começa por ela ("museu cafe filho"
+# cobre "Museu Café Filho de Natal"). Lugares diferentes podem ter as mesmas
+# coordenadas (o teatro dentro do shopping) e continuam sendo pontos distintos.
+COORDENADAS = {
+    "natal": {
+        "praia de ponta negra": (-5.8806, -35.1667),
+        "mercado de ponta negra": (-5.8790, -35.1720),
+        "morro do careca": (-5.8878, -35.1628),
+        "praia dos artistas": (-5.7830, -35.1900),
+        "praia do meio": (-5.7730, -35.1930),
+        "praia do forte": (-5.7600, -35.1930),
+        "forte dos reis magos": (-5.7567, -35.1947),
+        "praia da redinha": (-5.7419, -35.2050),
+        "ponte newton navarro": (-5.7530, -35.2010),
+        "aquario natal": (-5.7240, -35.2120),
+        "parque das dunas": (-5.8120, -35.1880),
+        "farol de mae luiza": (-5.7985, -35.1870),
+        "teatro alberto maranhao": (-5.7850, -35.2070),
+        "casa da ribeira": (-5.7795, -35.2055),
+        "museu ferroviario": (-5.7760, -35.2060),
+        "museu cafe filho": (-5.7790, -35.2060),
+        "museu de cultura popular djalma": (-5.7780, -35.2050),
+        "centro nautico potengy": (-5.7690, -35.2070),
+        "centro historico de natal": (-5.7890, -35.2095),
+        "memorial camara cascudo": (-5.7895, -35.2095),
+        "museu de arte sacra": (-5.7880, -35.2090),
+        "igreja de santo antonio": (-5.7880, -35.2095),
+        "igreja matriz": (-5.7893, -35.2098),
+        "igreja de nossa senhora do rosario dos pretos": (-5.7865, -35.2110),
+        "shopping midway mall": (-5.8120, -35.2070),
+        "teatro riachuelo": (-5.8120, -35.2070),
+        "shopping do artesanato": (-5.8600, -35.1870),
+        "dunas de genipabu": (-5.6640, -35.2100),
+        "lagoa de jacuma": (-5.5730, -35.2550),
+        "praia de muriu": (-5.5490, -35.2450),
+        "praia de pirangi": (-6.0100, -35.1150),
+        "praia de camurupim": (-6.0380, -35.1060),
+    },
+    "pipa": {
+        "praia do centro": (-6.2275, -35.0440),
+        "praia do amor": (-6.2370, -35.0410),
+        "baia dos golfinhos": (-6.2310, -35.0430),
+        "praia do madeiro": (-6.2130, -35.0530),
+        "santuario ecologico de pipa": (-6.2190, -35.0520),
+        "praia de minas": (-6.2470, -35.0400),
+        "lagoa guarairas": (-6.2000, -35.1200),
+    },
+    "caico": {
+        "catedral de santana": (-6.4583, -37.0972),
+        "ilha de santana": (-6.4540, -37.0990),
+        "mercado publico": (-6.4590, -37.0960),
+        "casa do artesao": (-6.4585, -37.0968),
+        "feira livre": (-6.4595, -37.0955),
+        "igreja do rosario": (-6.4575, -37.0985),
+        "capela de sao sebastiao": (-6.4610, -37.0990),
+        "centro cultural adjunto dias": (-6.4578, -37.0978),
+        "casa da cultura popular": (-6.4580, -37.0980),
+        "acude itans": (-6.4700, -37.0700),
+        "casa forte do cuo": (-6.4330, -37.0800),
+    },
+}
+
+# Outros nomes de cada lugar -> chave canônica em COORDENADAS: nomes populares
+# e as grafias erradas ou truncadas que aparecem nas transcrições dos guias
+# ("Catedral de Sant’Ana" vira "catedral de sant ana" após a normalização)
+ALIASES = {
+    "natal": {
+        "ponta negra": "praia de ponta negra",
+        "praia de pontanegra": "praia de ponta negra",
+        "ponte nilton avaro": "ponte newton navarro",
+        "teatro alberto maranha": "teatro alberto maranhao",
+        "museu da cultura popular djalma": "museu de cultura popular djalma",
+        "igreja do galo": "igreja de santo antonio",
+        "teatro do shopping midway mall": "teatro riachuelo",
+        "parque turistico ecologico dunas de genipabu": "dunas de genipabu",
+        "praia de piraji": "praia de pirangi",
+    },
+    "pipa": {
+        "praia da pipa": "praia do centro",
+        "praia de pipa": "praia do centro",
+        "baia dos gol": "baia dos golfinhos",
+        "praia da bairro dos golfinhos": "baia dos golfinhos",
+    },
+    "caico": {
+        "catedral de sant": "catedral de santana",
+        "igreja de sant": "catedral de santana",
+        "ilha de sant": "ilha de santana",
+    },
+}
+
+# Prefixo (chave canônica ou alias) -> chave canônica, do prefixo mais longo para o
+# mais curto em cada cidade, para que o nome mais específico vença
+_prefixos = {
+    destino: sorted(
+        [(chave, chave) for chave in coordenadas] + list(ALIASES.get(destino, {}).items()),
+        key=lambda item: len(item[0]),
+        reverse=True,
+    )
+    for destino, coordenadas in COORDENADAS.items()
+}
+
+
+def canonical_name(destino: str, nome: str):
+    """
+    Retorna a chave canônica do ponto turístico em `COORDENADAS`, resolvendo
+    aliases e grafias das transcrições, ou None se ele não for conhecido.
+    """
+    chave = _chave(nome)
+    for prefixo, canonico in _prefixos.get(destino, []):
+        if chave == prefixo or chave.startswith(prefixo + " "):
+            return canonico
+    return None
+
+
+def locate(destino: str, nome: str):
+    """
+    Retorna as coordenadas aproximadas de um ponto turístico do destino, ou None
+    se ele não estiver entre os pontos conhecidos.
+    """
+    canonico = canonical_name(destino, nome)
+    return COORDENADAS[destino][canonico] if canonico else None
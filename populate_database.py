@@ -1,47 +1,248 @@
 import argparse
 import os
+import queue
 import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.document_loaders.pdf import PyPDFDirectoryLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema.document import Document
+from chroma_store import (
+    CHROMA_PATH, CITY_FIELD, city_filter, city_path, get_collection, migrate_legacy_stores, pending_legacy_stores,
+)
 from get_embedding_function import get_embedding_function
-from langchain_chroma import Chroma
+from hybrid_retrieval import BM25_FILE, build_bm25_index
+from index_manifest import IndexManifest, chunk_id, content_hash, normalize_source
+from poi_index import POI_FILE, build_poi_index
+from rag_cache import mark_corpus_changed
 
 
-CHROMA_ROOT_PATH = "chroma"  
-DATA_ROOT_PATH = "pdf"       
+DATA_ROOT_PATH = "pdf"
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 80
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_EMBED_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 8
 
 
 def main():
-    
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--reset", action="store_true", help="Reset the databases.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Chunks per embedding batch.")
+    parser.add_argument("--embed-workers", type=int, default=DEFAULT_EMBED_WORKERS, help="Number of embedding threads.")
+    parser.add_argument("--load-workers", type=int, default=os.cpu_count(), help="Number of PDF loading processes.")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="Maximum batches waiting between stages.")
     args = parser.parse_args()
     if args.reset:
         print("Clearing all Chromas")
         clear_all_databases()
+    elif pending_legacy_stores():
+        # Copia os bancos antigos (sem apagá-los) antes da ingestão incremental, que parte deles
+        migrate_legacy_stores()
+
+    cities = list_cities()
+    print(f"🔄 Processando as cidades: {', '.join(cities)}")
+    report = run_ingestion(
+        cities,
+        batch_size=args.batch_size,
+        embed_workers=args.embed_workers,
+        load_workers=args.load_workers,
+        queue_size=args.queue_size,
+    )
+    print_report(report)
+
+
+def run_ingestion(cities: dict, batch_size: int = DEFAULT_BATCH_SIZE, embed_workers: int = DEFAULT_EMBED_WORKERS,
+                  load_workers: int = None, queue_size: int = DEFAULT_QUEUE_SIZE, embeddings=None) -> dict:
+    """
+    Executa o pipeline de ingestão incremental para várias cidades em paralelo.
+
+    Etapas:
+    0. Comparação dos PDFs com o manifesto da cidade: arquivos inalterados não são
+       nem lidos, e os vetores de PDFs removidos são apagados. Sem manifesto, todos
+       os PDFs da cidade são relidos e os seus chunks substituídos.
+    1. Carregamento e divisão dos PDFs em um pool de processos (um PDF por tarefa).
+    2. Embedding dos chunks novos em lotes de tamanho fixo por `embed_workers` threads.
+    3. Escrita dos vetores no Chroma de cada cidade por uma thread dedicada.
+
+    As etapas são ligadas por filas limitadas: quando o embedding não acompanha,
+    o produtor fica bloqueado em vez de acumular chunks em memória.
+
+    Args:
+        cities (dict): Mapeamento nome da cidade -> pasta com os PDFs.
+        embeddings: Modelo de embedding a usar no lugar do padrão com cache em
+            disco (ex.: o modelo substituto do benchmark offline).
+
+    Returns:
+        dict: Relatório com chunks e throughput (chunks/s) por cidade e no total.
+    """
+    inicio = time.perf_counter()
+    embed_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    report = {
+        city: {"chunks": 0, "new_chunks": 0, "deleted_chunks": 0, "skipped_files": 0, "embed_time_s": 0.0}
+        for city in cities
+    }
+    report_lock = threading.Lock()
+    errors = []
 
-    
-    for city_folder in os.listdir(DATA_ROOT_PATH):
-        city_path = os.path.join(DATA_ROOT_PATH, city_folder)
-        
-        
-        if os.path.isdir(city_path):
-            print(f"🔄 Processando a cidade: {city_folder}")
-            process_city(city_folder, city_path)
+    def embed_worker():
+        while True:
+            item = embed_queue.get()
+            if item is None:
+                break
+            city, batch = item
+            try:
+                inicio_lote = time.perf_counter()
+                # Carregado só quando há chunks novos; o registro garante uma única carga
+                model = embeddings or get_embedding_function(cached=True)
+                vectors = model.embed_documents([chunk.page_content for chunk in batch])
+                with report_lock:
+                    report[city]["embed_time_s"] += time.perf_counter() - inicio_lote
+                write_queue.put((city, batch, vectors))
+            except Exception as e:
+                errors.append(e)
 
+    def writer():
+        collection = None
+        while True:
+            item = write_queue.get()
+            if item is None:
+                break
+            city, batch, vectors = item
+            try:
+                if collection is None:
+                    collection = get_collection()
+                collection.add(
+                    ids=[chunk.metadata["id"] for chunk in batch],
+                    embeddings=vectors,
+                    documents=[chunk.page_content for chunk in batch],
+                    metadatas=[{**clean_metadata(chunk.metadata), CITY_FIELD: city} for chunk in batch],
+                )
+                with report_lock:
+                    report[city]["new_chunks"] += len(batch)
+            except Exception as e:
+                errors.append(e)
 
-def process_city(city_name: str, city_path: str):
+    embed_threads = [threading.Thread(target=embed_worker, daemon=True) for _ in range(embed_workers)]
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    for thread in embed_threads + [writer_thread]:
+        thread.start()
+
+    manifests = {}
+    changed_pdfs = {}
+    for city, pdf_folder in cities.items():
+        manifest = IndexManifest(city_path(city))
+        pdf_paths = list_pdfs(pdf_folder)
+        changed_pdfs[city] = [pdf_path for pdf_path in pdf_paths if not manifest.is_unchanged(pdf_path)]
+        report[city]["skipped_files"] = len(pdf_paths) - len(changed_pdfs[city])
+        report[city]["deleted_chunks"] = delete_removed_sources(manifest, pdf_paths, city)
+        manifests[city] = manifest
+
+    for city, chunks_by_file in load_cities(changed_pdfs, load_workers):
+        new_chunks = []
+        for pdf_path, chunks in chunks_by_file.items():
+            report[city]["chunks"] += len(chunks)
+            file_new_chunks, deleted = sync_file_chunks(pdf_path, calculate_chunk_ids(chunks))
+            new_chunks.extend(file_new_chunks)
+            report[city]["deleted_chunks"] += deleted
+            manifests[city].update(pdf_path, {chunk.metadata["id"]: chunk.metadata["content_hash"] for chunk in chunks})
+        if new_chunks:
+            print(f"👉 Adicionando {len(new_chunks)} novo(s) documento(s) da cidade '{city}'")
+        else:
+            print(f"✅ Nenhum novo documento para adicionar da cidade '{city}'")
+        for i in range(0, len(new_chunks), batch_size):
+            embed_queue.put((city, new_chunks[i:i + batch_size]))
+
+    for _ in embed_threads:
+        embed_queue.put(None)
+    for thread in embed_threads:
+        thread.join()
+    write_queue.put(None)
+    writer_thread.join()
+    if errors:
+        raise errors[0]
+
+    for city, city_report in report.items():
+        manifests[city].save()
+        changed = city_report["new_chunks"] or city_report["deleted_chunks"]
+        if changed or not os.path.exists(os.path.join(city_path(city), BM25_FILE)):
+            # O índice BM25 é reconstruído a partir da coleção, já com os chunks apagados
+            build_bm25_index(get_collection(), city_path(city), where=city_filter(city))
+        if changed or not os.path.exists(os.path.join(city_path(city), POI_FILE)):
+            build_poi_index(get_collection(), city_path(city), where=city_filter(city))
+        if changed:
+            mark_corpus_changed(city_path(city))
+        city_report["chunks_per_s"] = (
+            city_report["new_chunks"] / city_report["embed_time_s"] if city_report["embed_time_s"] else 0.0
+        )
+
+    total_time = time.perf_counter() - inicio
+    total_new = sum(city_report["new_chunks"] for city_report in report.values())
+    report["total"] = {
+        "new_chunks": total_new,
+        "elapsed_s": total_time,
+        "chunks_per_s": total_new / total_time if total_time else 0.0,
+    }
+    return report
+
+
+def load_cities(pdfs_by_city: dict, load_workers: int = None):
     """
-    Processa uma subpasta de cidade, criando ou atualizando o Chroma correspondente.
+    Carrega e divide os PDFs das cidades em um pool de processos.
+
+    Gera pares (cidade, {pdf: chunks}) à medida que todos os PDFs de uma cidade
+    terminam, de modo que o embedding da primeira cidade começa antes do fim das demais.
     """
-    
-    chroma_city_path = os.path.join(CHROMA_ROOT_PATH, f"{city_name}")
+    pending = {}
+    chunks_by_city = {city: {} for city in pdfs_by_city}
+    with ProcessPoolExecutor(max_workers=load_workers) as executor:
+        futures = {}
+        for city, pdf_paths in pdfs_by_city.items():
+            pending[city] = len(pdf_paths)
+            if not pdf_paths:
+                yield city, {}
+            for pdf_path in pdf_paths:
+                futures[executor.submit(load_and_split_pdf, pdf_path)] = (city, pdf_path)
+
+        for future in as_completed(futures):
+            city, pdf_path = futures[future]
+            chunks_by_city[city][pdf_path] = future.result()
+            pending[city] -= 1
+            if pending[city] == 0:
+                yield city, chunks_by_city.pop(city)
 
-    
-    documents = load_documents(city_path)
-    chunks = split_documents(documents)
-    add_to_chroma(chunks, chroma_city_path)
+
+def list_cities(data_root: str = DATA_ROOT_PATH) -> dict:
+    """
+    Retorna o mapeamento nome da cidade -> pasta com os PDFs (uma subpasta por cidade).
+    """
+    return {
+        city_folder: os.path.join(data_root, city_folder)
+        for city_folder in os.listdir(data_root)
+        if os.path.isdir(os.path.join(data_root, city_folder))
+    }
+
+
+def list_pdfs(city_path: str) -> list[str]:
+    # Caminhos sempre com "/", que viram a fonte dos chunks e a chave do manifesto em qualquer sistema
+    return sorted(
+        normalize_source(os.path.join(city_path, filename))
+        for filename in os.listdir(city_path)
+        if filename.lower().endswith(".pdf")
+    )
+
+
+def load_and_split_pdf(pdf_path: str) -> list[Document]:
+    """
+    Carrega e divide um único PDF. Executada nos processos do pool.
+    """
+    return split_documents(PyPDFLoader(pdf_path).load())
 
 
 def load_documents(city_path: str):
@@ -57,77 +258,117 @@ def split_documents(documents: list[Document]):
     Divide os documentos em chunks menores.
     """
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=80,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
         length_function=len,
         is_separator_regex=False,
     )
     return text_splitter.split_documents(documents)
 
 
-def add_to_chroma(chunks: list[Document], chroma_path: str):
+def sync_file_chunks(pdf_path: str, chunks: list[Document]):
     """
-    Adiciona ou atualiza os documentos no Chroma específico da cidade.
-    """
-    
-    db = Chroma(
-        persist_directory=chroma_path, embedding_function=get_embedding_function()
-    )
+    Sincroniza os chunks de um PDF alterado com o Chroma.
 
-    
-    chunks_with_ids = calculate_chunk_ids(chunks)
+    Apaga os IDs que não existem mais no arquivo e retorna apenas os chunks
+    ainda não indexados, que precisam de embedding. Os chunks do arquivo são
+    procurados com os dois separadores de caminho, então os gravados no Windows
+    ("pdf\\natal\\guia.pdf") são substituídos em vez de duplicados.
 
-    
-    existing_items = db.get(include=[]) 
-    existing_ids = set(existing_items["ids"])
-    print(f"Número de documentos no banco de dados '{chroma_path}': {len(existing_ids)}")
+    Returns:
+        tuple: (chunks novos, quantidade de chunks apagados)
+    """
+    collection = get_collection()
+    existing_ids = set(collection.get(where=source_filter(pdf_path), include=[])["ids"])
+    current_ids = {chunk.metadata["id"] for chunk in chunks}
+    stale_ids = existing_ids - current_ids
+    if stale_ids:
+        print(f"🗑️ Removendo {len(stale_ids)} chunk(s) desatualizado(s) de '{pdf_path}'")
+        collection.delete(ids=list(stale_ids))
+    return [chunk for chunk in chunks if chunk.metadata["id"] not in existing_ids], len(stale_ids)
 
-    
-    new_chunks = [chunk for chunk in chunks_with_ids if chunk.metadata["id"] not in existing_ids]
 
-    if len(new_chunks):
-        print(f"👉 Adicionando {len(new_chunks)} novo(s) documento(s) ao banco '{chroma_path}'")
-        new_chunk_ids = [chunk.metadata["id"] for chunk in new_chunks]
-        db.add_documents(new_chunks, ids=new_chunk_ids)
-        
-    else:
-        print(f"✅ Nenhum novo documento para adicionar ao banco '{chroma_path}'")
+def source_filter(pdf_path: str) -> dict:
+    """Filtro do Chroma para os chunks de um PDF, gravados com "/" ou com "\\"."""
+    source = normalize_source(pdf_path)
+    return {"source": {"$in": [source, source.replace("/", "\\")]}}
 
 
-def calculate_chunk_ids(chunks):
+def delete_removed_sources(manifest: IndexManifest, pdf_paths: list[str], city: str) -> int:
     """
-    Calcula IDs únicos para cada chunk com base na fonte e na página.
+    Apaga do Chroma os vetores de PDFs que não existem mais na pasta da cidade.
+
+    Só são apagadas as fontes registradas no manifesto. Sem manifesto, a
+    cidade é reconstruída: todos os PDFs são relidos e `sync_file_chunks`
+    substitui os chunks de cada um, mas fontes sem PDF em `pdf/` (como guias
+    que nunca foram versionados) são mantidas, pois não há registro de que
+    tenham sido removidas.
+
+    Returns:
+        int: A quantidade de chunks apagados.
     """
-    last_page_id = None
-    current_chunk_index = 0
+    if not manifest.exists:
+        return 0
 
-    for chunk in chunks:
-        source = chunk.metadata.get("source")
-        page = chunk.metadata.get("page")
-        current_page_id = f"{source}:{page}"
+    collection = get_collection()
+    current_sources = {normalize_source(pdf_path) for pdf_path in pdf_paths}
+    deleted = 0
+    for source in list(manifest.files):
+        if normalize_source(source) in current_sources:
+            continue
+        stale_ids = collection.get(where=source_filter(source), include=[])["ids"]
+        if stale_ids:
+            print(f"🗑️ Removendo {len(stale_ids)} chunk(s) do arquivo removido '{source}'")
+            collection.delete(ids=stale_ids)
+            deleted += len(stale_ids)
+        manifest.remove(source)
+    return deleted
 
-        
-        if current_page_id == last_page_id:
-            current_chunk_index += 1
-        else:
-            current_chunk_index = 0
 
+def clean_metadata(metadata: dict) -> dict:
+    # O Chroma não aceita valores nulos nos metadados
+    return {key: value for key, value in metadata.items() if value is not None}
+
+
+def calculate_chunk_ids(chunks):
+    """
+    Calcula IDs únicos para cada chunk com base na fonte, na página e no hash do conteúdo.
 
-        chunk_id = f"{current_page_id}:{current_chunk_index}"
-        last_page_id = current_page_id
+    Como o ID depende do texto, editar uma página gera IDs novos apenas para os
+    chunks alterados, que são então re-embedados.
+    """
+    seen_ids = {}
 
-        
-        chunk.metadata["id"] = chunk_id
+    for chunk in chunks:
+        digest = content_hash(chunk.page_content)
+        chunk.metadata["id"] = chunk_id(chunk.metadata.get("source"), chunk.metadata.get("page"), digest, seen_ids)
+        chunk.metadata["content_hash"] = digest
 
     return chunks
 
 
+def print_report(report: dict):
+    """
+    Exibe o throughput da ingestão por cidade e no total.
+    """
+    for city, city_report in report.items():
+        if city == "total":
+            continue
+        print(
+            f"📊 {city}: {city_report['new_chunks']}/{city_report['chunks']} chunks embedados "
+            f"({city_report['chunks_per_s']:.1f} chunks/s), {city_report['deleted_chunks']} removidos, "
+            f"{city_report['skipped_files']} arquivo(s) inalterado(s)"
+        )
+    total = report["total"]
+    print(f"📊 Total: {total['new_chunks']} chunks em {total['elapsed_s']:.1f}s ({total['chunks_per_s']:.1f} chunks/s)")
+
+
 def clear_all_databases():
     """
     Remove todos os bancos de dados Chroma existentes.
     """
-    if os.path.exists(CHROMA_ROOT_PATH):
-        shutil.rmtree(CHROMA_ROOT_PATH)
+    if os.path.exists(CHROMA_PATH):
+        shutil.rmtree(CHROMA_PATH)
 
 
 if __name__ == "__main__":
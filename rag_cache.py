@@ -0,0 +1,144 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from unidecode import unidecode
+
+CHROMA_PATH = os.getenv("CHROMA_PATH", "chroma")
+CORPUS_VERSION_FILE = "corpus_version"
+
+# Palavras que não mudam o sentido da busca ("praias em Natal" == "praias Natal")
+STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "em", "no", "na",
+    "nos", "nas", "e", "para", "pra", "por", "com", "um", "uma", "uns", "umas",
+}
+
+
+def normalize_query(query_text: str, destino: str = "") -> str:
+    """
+    Normaliza uma consulta: minúsculas, sem acentos, sem pontuação,
+    sem stopwords e sem o nome do destino.
+    """
+    texto = unidecode(query_text.lower())
+    palavras = re.findall(r"[a-z0-9]+", texto)
+    ignorar = STOPWORDS | set(re.findall(r"[a-z0-9]+", unidecode(destino.lower())))
+    return " ".join(p for p in palavras if p not in ignorar)
+
+
+def corpus_version_path(chroma_path: str) -> str:
+    return os.path.join(chroma_path, CORPUS_VERSION_FILE)
+
+
+def mark_corpus_changed(chroma_path: str):
+    """
+    Registra que o corpus de um banco Chroma foi alterado, invalidando
+    as entradas em cache de todos os processos que o consultam.
+    """
+    os.makedirs(chroma_path, exist_ok=True)
+    with open(corpus_version_path(chroma_path), "w") as f:
+        f.write(str(time.time_ns()))
+
+
+def corpus_version(destino: str) -> int:
+    try:
+        return os.stat(corpus_version_path(os.path.join(CHROMA_PATH, destino))).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class QueryCache:
+    """
+    Cache LRU com TTL para os resultados do RAG, indexado por
+    (destino, consulta normalizada).
+
+    Quando a chave exata não existe, uma segunda busca compara o embedding
+    da consulta com os das entradas do mesmo destino e reaproveita o resultado
+    cuja similaridade de cosseno ultrapassar o limiar.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _is_valid(self, entry, version) -> bool:
+        _value, _embedding, created_at, entry_version = entry
+        return entry_version == version and time.monotonic() - created_at <= self.ttl_seconds
+
+    def get(self, destino: str, query_text: str):
+        """Busca pela chave exata. Retorna None se não houver entrada válida."""
+        key = (destino, normalize_query(query_text, destino))
+        version = corpus_version(destino)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_valid(entry, version):
+                    self._entries.move_to_end(key)
+                    self.stats["exact_hits"] += 1
+                    return entry[0]
+                del self._entries[key]
+                self.stats["expirations"] += 1
+        return None
+
+    def get_similar(self, destino: str, embedding):
+        """
+        Busca a entrada do destino com o embedding mais próximo.
+        Conta como falta (miss) se nenhuma ultrapassar o limiar.
+        """
+        query_vector = _unit(embedding)
+        version = corpus_version(destino)
+        with self._lock:
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if key[0] == destino and entry[1] is not None and self._is_valid(entry, version)
+            ]
+            if candidates:
+                similarities = np.stack([entry[1] for _key, entry in candidates]) @ query_vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.stats["semantic_hits"] += 1
+                    return entry[0]
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, destino: str, query_text: str, value: str, embedding=None):
+        key = (destino, normalize_query(query_text, destino))
+        vector = _unit(embedding) if embedding is not None else None
+        entry = (value, vector, time.monotonic(), corpus_version(destino))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, destino: str = None):
+        """Remove as entradas de um destino, ou todas se nenhum for informado."""
+        with self._lock:
+            if destino is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == destino]:
+                    del self._entries[key]
+
+    def hit_rate(self) -> float:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def report(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "hit_rate": self.hit_rate()}
+
+
+def _unit(embedding):
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,40 @@
+import threading
+import time
+
+
+class AdaptiveRateLimiter:
+    """
+    Limitador de taxa adaptativo (AIMD) para APIs com cota por segundo.
+
+    Cada `acquire` espera o intervalo correspondente à taxa atual. A taxa cresce
+    aos poucos a cada sucesso e cai pela metade quando a API sinaliza limite
+    excedido, substituindo pausas fixas como `time.sleep(1)`.
+    """
+
+    def __init__(self, rate: float = 5.0, min_rate: float = 0.5, max_rate: float = 20.0, increase: float = 0.5):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, permits: int = 1):
+        """Bloqueia até que `permits` requisições possam ser enviadas."""
+        with self._lock:
+            agora = time.monotonic()
+            slot = max(agora, self._next_slot)
+            self._next_slot = slot + permits / self.rate
+        espera = slot - agora
+        if espera > 0:
+            time.sleep(espera)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_rate_limited(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            # Aguarda ao menos um intervalo da nova taxa antes da próxima requisição
+            self._next_slot = max(self._next_slot, time.monotonic() + 1 / self.rate)
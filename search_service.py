@@ -0,0 +1,180 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from conversation_memory import estimate_tokens
+from rag_cache import normalize_query
+from tracing import count
+
+SEARCH_CACHE_PATH = "search_cache.sqlite3"
+SEARCH_TTL = 6 * 3600  # Eventos mudam pouco ao longo do dia
+SEARCH_DEADLINE = 8.0  # Segundos máximos por chamada da ferramenta
+SEARCH_MAX_RESULTS = 6
+SEARCH_TOKEN_BUDGET = 400
+MAX_WORKERS = 4
+SNIPPET_MAX_CHARS = 240
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_results (
+    destino TEXT,
+    query TEXT,
+    results TEXT,
+    created_at REAL,
+    PRIMARY KEY (destino, query)
+);
+"""
+
+
+def split_queries(query_text: str) -> list[str]:
+    """
+    Separa uma entrada com várias buscas (uma por linha ou separadas por ";")
+    e remove as repetidas após a normalização.
+    """
+    queries = []
+    vistas = set()
+    for query in re.split(r"[;\n]+", query_text):
+        query = query.strip().strip('"').strip()
+        if query and normalize_query(query) not in vistas:
+            vistas.add(normalize_query(query))
+            queries.append(query)
+    return queries
+
+
+def compact_snippet(snippet: str, max_chars: int = SNIPPET_MAX_CHARS) -> str:
+    """Reduz o trecho às frases iniciais que cabem em `max_chars`."""
+    snippet = " ".join(snippet.split())
+    if len(snippet) <= max_chars:
+        return snippet
+    frases = re.split(r"(?<=[.!?])\s+", snippet)
+    compacto = ""
+    for frase in frases:
+        if len(compacto) + len(frase) + 1 > max_chars:
+            break
+        compacto = f"{compacto} {frase}".strip()
+    return compacto or snippet[:max_chars].rsplit(" ", 1)[0] + "…"
+
+
+class SearchService:
+    """
+    Busca na web com cache persistente, deduplicação e prazo máximo por chamada.
+
+    - Os resultados ficam em SQLite por (destino, consulta normalizada) durante
+      `ttl_seconds`, compartilhados entre conversas e reinícios do processo;
+    - buscas idênticas em andamento ao mesmo tempo compartilham uma única
+      chamada ao backend;
+    - várias consultas na mesma entrada são feitas concorrentemente;
+    - a chamada retorna em até `deadline` segundos, com o que já tiver chegado;
+    - a saída é uma lista compacta de trechos limitada a `token_budget` tokens.
+
+    O backend é qualquer objeto com `results(query, max_results)` retornando
+    dicionários com "title", "snippet" e "link", como o `DuckDuckGoSearchAPIWrapper`.
+    """
+
+    def __init__(self, backend, path: str = SEARCH_CACHE_PATH, ttl_seconds: float = SEARCH_TTL,
+                 deadline: float = SEARCH_DEADLINE, max_results: int = SEARCH_MAX_RESULTS,
+                 token_budget: int = SEARCH_TOKEN_BUDGET, max_workers: int = MAX_WORKERS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.deadline = deadline
+        self.max_results = max_results
+        self.token_budget = token_budget
+        self.stats = {"hits": 0, "misses": 0, "shared": 0, "timeouts": 0, "errors": 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def _get_cached(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT results, created_at FROM search_results WHERE destino = ? AND query = ?", key
+            ).fetchone()
+        if row is not None and time.time() - row[1] <= self.ttl_seconds:
+            return json.loads(row[0])
+        return None
+
+    def _fetch(self, key, query: str) -> list[dict]:
+        try:
+            results = self.backend.results(query, self.max_results)
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_results (destino, query, results, created_at) VALUES (?, ?, ?, ?)",
+                    (*key, json.dumps(results, ensure_ascii=False), time.time()),
+                )
+                self._db.commit()
+            return results
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _submit(self, query: str, destino: str):
+        """Retorna um future com os resultados da consulta, reaproveitando cache e buscas em andamento."""
+        key = (destino or "", normalize_query(query, destino or ""))
+        cached = self._get_cached(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            count("cache_hits")
+            future = Future()
+            future.set_result(cached)
+            return future
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["shared"] += 1
+                return future
+            self.stats["misses"] += 1
+            # A busca continua após o prazo e o resultado fica no cache para a próxima chamada
+            future = self._executor.submit(self._fetch, key, query)
+            self._inflight[key] = future
+        return future
+
+    def search_results(self, query_text: str, destino: str = None) -> list[dict]:
+        """
+        Executa as consultas da entrada e retorna os resultados sem repetição,
+        na ordem das consultas. Consultas que não terminarem no prazo são ignoradas.
+        """
+        futures = [self._submit(query, destino) for query in split_queries(query_text)]
+        limite = time.monotonic() + self.deadline
+        resultados = []
+        vistos = set()
+        for future in futures:
+            try:
+                results = future.result(timeout=max(0.0, limite - time.monotonic()))
+            except FutureTimeoutError:
+                self.stats["timeouts"] += 1
+                continue
+            except Exception:
+                self.stats["errors"] += 1
+                continue
+            for result in results:
+                chave = result.get("link") or normalize_query(result.get("snippet", ""))
+                if chave not in vistos:
+                    vistos.add(chave)
+                    resultados.append(result)
+        return resultados
+
+    def search(self, query_text: str, destino: str = None) -> str:
+        """
+        Busca e formata os resultados como trechos compactos dentro do orçamento de tokens.
+        """
+        linhas = []
+        usados = 0
+        for result in self.search_results(query_text, destino):
+            snippet = compact_snippet(result.get("snippet", ""))
+            if not snippet:
+                continue
+            linha = f"- {result.get('title', '').strip()}: {snippet}"
+            tokens = estimate_tokens(linha)
+            if usados + tokens > self.token_budget:
+                break
+            linhas.append(linha)
+            usados += tokens
+        if not linhas:
+            return "Nenhum resultado encontrado a tempo. Tente uma busca mais específica ou siga sem ela."
+        return "\n".join(linhas)
+
+    def report(self) -> dict:
+        return dict(self.stats)
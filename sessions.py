@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+MAX_SESSIONS = 200
+IDLE_TIMEOUT = 30 * 60  # Segundos sem uso até a sessão ser descartada
+TRACE_HISTORY = 20  # Turnos com medições de tempo mantidos por sessão
+
+
+class AgentSession:
+    """
+    Estado de uma conversa: memória e executores próprios, os traces dos
+    últimos turnos e um lock que impede duas execuções simultâneas na mesma conversa.
+    """
+
+    def __init__(self, session_id: str, memory, travel_executor, parallel_travel_executor, calendar_executor):
+        self.session_id = session_id
+        self.memory = memory
+        self.travel_executor = travel_executor
+        self.parallel_travel_executor = parallel_travel_executor
+        self.calendar_executor = calendar_executor
+        self.traces = deque(maxlen=TRACE_HISTORY)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class AgentSessionRegistry:
+    """
+    Registro das sessões ativas, indexado pelo id da sessão do Streamlit.
+
+    Cada sessão é criada por `factory(session_id, history)` no primeiro acesso.
+    Sessões sem uso por mais de `idle_timeout` segundos são descartadas e, acima
+    de `max_sessions`, as menos usadas recentemente saem primeiro; sessões com
+    um turno em andamento nunca são descartadas.
+    """
+
+    def __init__(self, factory, max_sessions: int = MAX_SESSIONS, idle_timeout: float = IDLE_TIMEOUT):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "evicted_idle": 0, "evicted_capacity": 0}
+
+    def get(self, session_id: str, history=()) -> AgentSession:
+        """
+        Devolve a sessão, criando-a se for preciso. `history` são as mensagens
+        ({"role", "content"}) que a interface ainda mostra; uma sessão criada de
+        novo, depois de descartada, reconstrói a memória a partir delas.
+        """
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self.factory(session_id, history)
+                self._sessions[session_id] = session
+                self.stats["created"] += 1
+                self._evict_capacity(session_id)
+            self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            return session
+
+    def peek(self, session_id: str):
+        """Devolve a sessão se ela existir, sem criá-la nem contar como uso."""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict_idle(self):
+        limite = time.monotonic() - self.idle_timeout
+        # O OrderedDict está em ordem de uso: as sessões ociosas ficam no início
+        for session_id, session in list(self._sessions.items()):
+            if session.last_used >= limite:
+                break
+            # Sessões no meio de um turno (lock ocupado) não são descartadas
+            if session.lock.locked():
+                continue
+            del self._sessions[session_id]
+            self.stats["evicted_idle"] += 1
+
+    def _evict_capacity(self, nova_sessao: str):
+        excesso = len(self._sessions) - self.max_sessions
+        for session_id, session in list(self._sessions.items()):
+            if excesso <= 0:
+                break
+            if session_id == nova_sessao or session.lock.locked():
+                continue
+            del self._sessions[session_id]
+            self.stats["evicted_capacity"] += 1
+            excesso -= 1
+
+    def __len__(self):
+        return len(self._sessions)
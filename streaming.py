@@ -0,0 +1,130 @@
+import threading
+from langchain_core.callbacks import BaseCallbackHandler
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Fora do Streamlit (ex.: testes)
+    add_script_run_ctx = get_script_run_ctx = None
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+CURSOR = "▌"
+
+# Mensagens de status exibidas enquanto cada ferramenta é executada
+TOOL_STATUS = {
+    "Weather Forecast": "consultando clima",
+    "Itinerary Optimizer": "organizando o roteiro",
+    "Query RAG": "consultando os guias turísticos",
+    "List Attractions": "listando as atrações",
+    "DuckDuckGo Search": "buscando eventos na internet",
+    "Calendar Agent": "acessando o Google Calendar",
+}
+
+
+class StreamlitAgentCallbackHandler(BaseCallbackHandler):
+    """
+    Envia o progresso do agente para a interface do Streamlit enquanto ele roda.
+
+    - O início e o fim de cada ferramenta aparecem no container de status
+      (ex.: "consultando clima 2025/08/01…").
+    - Os tokens da resposta final (o que vem depois de "Final Answer:") são
+      escritos no placeholder à medida que chegam do LLM.
+
+    O agente de calendário roda dentro de uma ferramenta e herda os callbacks:
+    as suas ferramentas aparecem no status, mas a sua resposta final não é
+    transmitida nem encerra o turno, que termina só com o agente principal.
+
+    No modo paralelo, as ferramentas (e o agente de calendário dentro delas)
+    rodam em threads do executor do asyncio; o contexto do script do Streamlit,
+    guardado na criação do handler, é anexado a essas threads antes de atualizar
+    a interface, para que as atualizações cheguem à sessão certa.
+    """
+
+    # Executa no mesmo thread do script do Streamlit também no modo assíncrono
+    run_inline = True
+
+    def __init__(self, status_container, answer_placeholder):
+        self.status = status_container
+        self.placeholder = answer_placeholder
+        self._buffer = ""
+        self._answer = ""
+        self._streaming_answer = False
+        self._pais = {}  # run_id -> parent_run_id das execuções vistas
+        self._ferramentas = set()
+        self._ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx else None
+
+    @property
+    def answer(self) -> str:
+        return self._answer
+
+    def _na_sessao_do_script(self):
+        """Anexa o contexto do script à thread atual, se ela ainda não o tiver."""
+        if self._ctx is not None and get_script_run_ctx(suppress_warning=True) is not self._ctx:
+            add_script_run_ctx(threading.current_thread(), self._ctx)
+
+    def _aninhado(self, run_id) -> bool:
+        """Verifica se a execução está dentro de uma ferramenta (ex.: o agente de calendário)."""
+        run_id = self._pais.get(run_id)
+        while run_id is not None:
+            if run_id in self._ferramentas:
+                return True
+            run_id = self._pais.get(run_id)
+        return False
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._pais[run_id] = parent_run_id
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._pais[run_id] = parent_run_id
+        if not self._aninhado(run_id):
+            self._reset_buffer()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._pais[run_id] = parent_run_id
+        if not self._aninhado(run_id):
+            self._reset_buffer()
+
+    def _reset_buffer(self):
+        self._buffer = ""
+        self._streaming_answer = False
+
+    def on_llm_new_token(self, token: str, *, run_id=None, **kwargs):
+        if self._aninhado(run_id):
+            return
+        self._buffer += token
+        if not self._streaming_answer:
+            indice = self._buffer.find(FINAL_ANSWER_MARKER)
+            if indice == -1:
+                return
+            self._streaming_answer = True
+            self._answer = self._buffer[indice + len(FINAL_ANSWER_MARKER):].lstrip()
+        else:
+            self._answer += token
+        self._na_sessao_do_script()
+        self.placeholder.markdown(self._answer + CURSOR)
+
+    def on_tool_start(self, serialized, input_str: str, *, run_id=None, parent_run_id=None, **kwargs):
+        self._pais[run_id] = parent_run_id
+        self._ferramentas.add(run_id)
+        nome = (serialized or {}).get("name") or kwargs.get("name", "")
+        acao = TOOL_STATUS.get(nome, f"usando {nome}")
+        entrada = input_str.strip()
+        if len(entrada) > 60:
+            entrada = entrada[:57] + "..."
+        self._na_sessao_do_script()
+        self.status.update(label=f"{acao.capitalize()} {entrada}…", state="running")
+        self.status.write(f"🔧 {acao} {entrada}…")
+
+    def on_tool_end(self, output, **kwargs):
+        self._na_sessao_do_script()
+        self.status.update(label="Pensando…", state="running")
+
+    def on_tool_error(self, error, **kwargs):
+        self._na_sessao_do_script()
+        self.status.write(f"⚠️ Erro na ferramenta: {error}")
+
+    def on_agent_finish(self, finish, *, run_id=None, parent_run_id=None, **kwargs):
+        # Só o agente principal (sem execução pai) encerra o turno
+        if parent_run_id is not None:
+            return
+        self._na_sessao_do_script()
+        self.status.update(label="Resposta pronta", state="complete", expanded=False)
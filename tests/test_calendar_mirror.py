@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from calendar_mirror import CalendarMirror, _bound_to_utc, to_utc
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeService:
+    """Serviço do Google Calendar falso com uma única página de eventos."""
+
+    def __init__(self, items):
+        self.items = items
+
+    def events(self):
+        return self
+
+    def list(self, **kwargs):
+        return FakeRequest({"items": self.items, "nextSyncToken": "token"})
+
+
+def evento(event_id, inicio: datetime, horas=1):
+    return {
+        "id": event_id,
+        "start": {"dateTime": inicio.isoformat()},
+        "end": {"dateTime": (inicio + timedelta(hours=horas)).isoformat()},
+    }
+
+
+def test_horarios_sem_offset_ficam_no_fuso_de_fortaleza():
+    assert _bound_to_utc("2025-08-01") == "2025-08-01T03:00:00Z"
+    assert _bound_to_utc("2025-08-01T09:00:00") == "2025-08-01T12:00:00Z"
+    assert _bound_to_utc(datetime(2025, 8, 1, 9)) == "2025-08-01T12:00:00Z"
+    assert _bound_to_utc("2025-08-01T09:00:00Z") == "2025-08-01T09:00:00Z"
+    assert to_utc({"date": "2025-08-01"}) == "2025-08-01T03:00:00Z"
+    assert to_utc({"dateTime": "2025-08-01T09:00:00", "timeZone": "Europe/Lisbon"}) == "2025-08-01T08:00:00Z"
+
+
+def test_listagem_comeca_agora(tmp_path):
+    agora = datetime.now(timezone.utc)
+    items = [evento(f"passado{i}", agora - timedelta(days=30 - i)) for i in range(5)]
+    items += [evento("em_andamento", agora - timedelta(minutes=30)), evento("futuro", agora + timedelta(days=1))]
+    mirror = CalendarMirror(FakeService(items), path=str(tmp_path / "mirror.sqlite3"))
+
+    assert [e["id"] for e in mirror.list_events("primary", limit=2)] == ["em_andamento", "futuro"]
+    assert len(mirror.list_events("primary", time_min=agora - timedelta(days=60))) == 7
+
+
+def test_intervalo_em_datas_locais(tmp_path):
+    # 23h em Fortaleza do dia 1 já é dia 2 em UTC, mas pertence ao dia 1
+    noite = datetime(2025, 8, 1, 23, tzinfo=timezone(timedelta(hours=-3)))
+    mirror = CalendarMirror(FakeService([evento("jantar", noite)]), path=str(tmp_path / "mirror.sqlite3"))
+
+    assert [e["id"] for e in mirror.list_events("primary", "2025-08-01", "2025-08-02")] == ["jantar"]
+    assert mirror.list_events("primary", "2025-08-02", "2025-08-03") == []
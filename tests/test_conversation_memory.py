@@ -0,0 +1,66 @@
+import pytest
+
+pytest.importorskip("langchain.memory")
+
+from langchain_core.messages import AIMessage
+
+from conversation_memory import TokenBudgetMemory
+
+
+class FakeLLM:
+    """LLM falso: conta as chamadas de resumo."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return AIMessage(content=f"Resumo {self.calls}.")
+
+
+def memory(llm, **kwargs):
+    return TokenBudgetMemory(llm=llm, max_token_limit=200, max_message_tokens=50, keep_recent_turns=2, **kwargs)
+
+
+def test_trocas_antigas_vao_para_o_resumo():
+    llm = FakeLLM()
+    mem = memory(llm)
+    for i in range(6):
+        mem.save_context({"input": f"Pergunta {i} " + "x" * 100}, {"output": f"Resposta {i} " + "y" * 100})
+
+    assert 0 < llm.calls < 6
+    assert mem.moving_summary_buffer.startswith("Resumo")
+    assert len(mem.chat_memory.messages) >= 4
+    assert mem._messages_tokens(mem.chat_memory.messages) <= mem.max_token_limit
+
+
+def test_trocas_recentes_longas_sao_compactadas_sem_chamar_o_llm():
+    llm = FakeLLM()
+    mem = memory(llm)
+    roteiro = "\n".join(f"Hora: {h:02d}:00 - Temp: {20 + h % 5}°C - Chuva: {h % 3}%" for h in range(12))
+    for i in range(2):
+        mem.save_context({"input": f"Roteiro {i}"}, {"output": roteiro})
+
+    assert llm.calls == 0
+    assert mem.moving_summary_buffer == ""
+    messages = mem.chat_memory.messages
+    assert len(messages) == 4
+    assert mem._messages_tokens(messages) <= mem.max_token_limit
+    # A resposta mais recente é preservada na íntegra
+    assert messages[-1].content == roteiro
+
+
+def test_memoria_reconstruida_a_partir_da_interface():
+    mem = memory(FakeLLM())
+    mem.save_context({"input": "Oi"}, {"output": "Olá!"})
+    historico = [
+        {"role": "user", "content": "Quero ir a Natal em agosto"},
+        {"role": "assistant", "content": "Ótimo! Quais são os seus interesses?"},
+    ]
+
+    mem.load_history(historico)
+
+    assert [(type(m).__name__, m.content) for m in mem.chat_memory.messages] == [
+        ("HumanMessage", "Quero ir a Natal em agosto"),
+        ("AIMessage", "Ótimo! Quais são os seus interesses?"),
+    ]
@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from embedding_cache import CachedEmbeddings
+
+
+class FakeEmbeddings:
+    """Modelo falso: registra os textos embedados."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), float(sum(map(ord, text)) % 97)] for text in texts]
+
+
+def test_lista_vazia_com_cache_vazio(tmp_path):
+    model = FakeEmbeddings()
+    cache = CachedEmbeddings(model, "fake", cache_dir=str(tmp_path))
+
+    assert cache.embed_documents([]) == []
+    assert model.calls == []
+
+
+def test_textos_repetidos_vem_do_cache(tmp_path):
+    model = FakeEmbeddings()
+    cache = CachedEmbeddings(model, "fake", cache_dir=str(tmp_path))
+
+    primeira = cache.embed_documents(["Ponta Negra", "Pipa", "Ponta Negra"])
+    segunda = CachedEmbeddings(FakeEmbeddings(), "fake", cache_dir=str(tmp_path)).embed_documents(["Pipa"])
+
+    assert model.calls == [["Ponta Negra", "Pipa"]]
+    assert primeira[0] == primeira[2] and segunda == [primeira[1]]
+    assert cache.stats == {"hits": 1, "misses": 2}
+
+
+def test_estatisticas_com_varias_threads(tmp_path):
+    cache = CachedEmbeddings(FakeEmbeddings(), "fake", cache_dir=str(tmp_path))
+    cache.embed_documents(["Caicó"])
+    threads = [threading.Thread(target=lambda: [cache.embed_documents(["Caicó"]) for _ in range(200)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.stats == {"hits": 800, "misses": 1}
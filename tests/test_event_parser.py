@@ -0,0 +1,56 @@
+from datetime import date
+
+import pytest
+
+from event_parser import parse_event
+
+HOJE = date(2025, 8, 1)  # sexta-feira
+
+
+def horario(query):
+    evento = parse_event(query, hoje=HOJE)
+    return evento and (evento["start"], evento["end"])
+
+
+def test_intervalo_das_as():
+    assert horario("Reunião amanhã das 9 às 11h") == ("2025-08-02T09:00:00", "2025-08-02T11:00:00")
+    assert horario("Almoço dia 10 das 12h às 13h30") == ("2025-08-10T12:00:00", "2025-08-10T13:30:00")
+
+
+def test_hora_de_inicio_com_duracao_antes():
+    assert horario("Passeio de buggy de 3h amanhã às 9h") == ("2025-08-02T09:00:00", "2025-08-02T12:00:00")
+    assert horario("Tour de 4h pelo centro histórico no sábado às 14h") == ("2025-08-02T14:00:00", "2025-08-02T18:00:00")
+
+
+@pytest.mark.parametrize("query, fim", [
+    ("Mergulho amanhã às 8h por 3 horas", "2025-08-02T11:00:00"),
+    ("Aula de surf de 2 horas amanhã às 10h", "2025-08-02T12:00:00"),
+    ("Jantar amanhã às 20h", "2025-08-02T21:00:00"),
+])
+def test_duracao(query, fim):
+    assert horario(query)[1] == fim
+
+
+@pytest.mark.parametrize("query", [
+    "Tour de 4h às 14h amanhã",  # intervalo de 4h às 14h ou 4h de duração a partir das 14h
+    "Reunião amanhã às 9h ou às 10h",
+    "Passeio de 3h amanhã",  # sem horário de início
+    "Reunião amanhã 9h",  # horário sem "às"
+    "Passeio amanhã, 9h às 12h",  # intervalo sem "das"
+    "Reunião amanhã 9h às 10h",
+    "Aula amanhã às 9h até 11h",  # o fim não pode ser descartado
+    "Evento 10/08 às 19h até 22h",
+    "Passeio sábado e domingo às 9h",  # mais de um dia
+    "Jantar hoje ou amanhã às 20h",
+    "Show amanhã às 12h da noite",  # meia-noite ou meio-dia
+])
+def test_ambiguo_fica_com_o_llm(query):
+    assert parse_event(query, hoje=HOJE) is None
+
+
+def test_datas_nao_viram_horarios():
+    assert horario("Check-in 2025-08-05 às 14h") == ("2025-08-05T14:00:00", "2025-08-05T15:00:00")
+
+
+def test_periodo_do_dia():
+    assert horario("Show amanhã às 8h da noite") == ("2025-08-02T20:00:00", "2025-08-02T21:00:00")
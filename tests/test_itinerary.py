@@ -0,0 +1,42 @@
+from itinerary import candidate_pois
+from poi_locations import canonical_name, locate
+
+
+class FakeIndex:
+    """Índice de pontos turísticos falso que devolve os pontos na ordem recebida."""
+
+    def __init__(self, nomes):
+        self.pois = [{"name": nome, "category": "passeio", "outdoor": False, "duration_min": 60} for nome in nomes]
+
+    def __len__(self):
+        return len(self.pois)
+
+    def search(self, interest="", outdoor=None, k=10):
+        return self.pois[:k]
+
+
+def test_aliases_das_transcricoes():
+    assert canonical_name("natal", "Ponte Nilton Avaro") == "ponte newton navarro"
+    assert canonical_name("natal", "Praia de Pontanegra") == "praia de ponta negra"
+    assert canonical_name("caico", "Catedral de Sant’Ana") == "catedral de santana"
+    assert canonical_name("caico", "Catedral de Santana") == "catedral de santana"
+    assert locate("pipa", "Baía dos Golfinhos") == locate("pipa", "Praia da Bairro dos Golfinhos")
+    assert locate("natal", "Lugar Desconhecido") is None
+
+
+def test_mesmo_lugar_vira_um_ponto():
+    index = FakeIndex(["Ponta Negra", "Praia de Ponta Negra", "Praia de Pontanegra", "Morro do Careca"])
+
+    nomes = [poi["name"] for poi in candidate_pois(index, "", "natal", n_days=1)]
+
+    assert nomes == ["Ponta Negra", "Morro do Careca"]
+
+
+def test_lugares_distintos_com_as_mesmas_coordenadas():
+    index = FakeIndex(["Shopping Midway Mall", "Teatro Riachuelo", "Museu Sem Coordenadas", "Museu sem coordenadas"])
+
+    pois = candidate_pois(index, "", "natal", n_days=1)
+
+    assert [poi["name"] for poi in pois] == ["Shopping Midway Mall", "Teatro Riachuelo", "Museu Sem Coordenadas"]
+    assert pois[0]["coords"] == pois[1]["coords"]
+    assert pois[2]["coords"] is None
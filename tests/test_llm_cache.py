@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("langchain.agents")
+
+from langchain.agents import AgentExecutor
+from langchain.agents.output_parsers import ReActSingleInputOutputParser
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import PromptTemplate
+
+from llm_cache import SQLiteLLMCache
+
+
+def create_executor(cache, stream_runnable):
+    # Cada chamada que chega ao modelo devolve uma resposta diferente
+    llm = FakeListChatModel(responses=["Final Answer: Ponta Negra", "Final Answer: Pipa"], cache=cache)
+    prompt = PromptTemplate.from_template("Pergunta: {input}\n{agent_scratchpad}")
+    agent = {"input": lambda x: x["input"], "agent_scratchpad": lambda x: ""} | prompt | llm | ReActSingleInputOutputParser()
+    return AgentExecutor(agent=agent, tools=[], stream_runnable=stream_runnable)
+
+
+def test_etapa_repetida_do_agente_vem_do_cache(tmp_path):
+    cache = SQLiteLLMCache("agentes", path=str(tmp_path / "llm_cache.sqlite3"))
+    executor = create_executor(cache, stream_runnable=False)
+
+    primeira = executor.invoke({"input": "Qual praia visitar em Natal?"})
+    segunda = executor.invoke({"input": "Qual praia visitar em Natal?"})
+
+    assert primeira["output"] == segunda["output"] == "Ponta Negra"
+    assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_agente_em_streaming_nao_consulta_o_cache(tmp_path):
+    cache = SQLiteLLMCache("agentes", path=str(tmp_path / "llm_cache.sqlite3"))
+    executor = create_executor(cache, stream_runnable=True)
+
+    executor.invoke({"input": "Qual praia visitar em Natal?"})
+    segunda = executor.invoke({"input": "Qual praia visitar em Natal?"})
+
+    assert segunda["output"] == "Pipa"
+    assert cache.stats["hits"] == 0
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip("langchain.agents")
+
+from langchain_core.agents import AgentFinish
+from langchain_core.exceptions import OutputParserException
+
+from multi_action import ReActMultiActionOutputParser
+
+
+def parse(text):
+    return ReActMultiActionOutputParser().parse(text)
+
+
+def test_uma_acao():
+    text = "Thought: Preciso do clima.\nAction: Weather Forecast\nAction Input: 2025/08/01 - 2025/08/04"
+
+    [action] = parse(text)
+
+    assert (action.tool, action.tool_input) == ("Weather Forecast", "2025/08/01 - 2025/08/04")
+    assert action.log == text
+
+
+def test_varias_acoes_com_pensamentos_intercalados():
+    text = (
+        "Thought: Preciso do clima e das praias.\n"
+        "Action: Weather Forecast\n"
+        "Action Input: 2025/08/01\n"
+        "Thought: Também preciso de eventos.\n"
+        "Action 2: DuckDuckGo Search\n"
+        'Action Input 2: "shows em Natal"\n'
+        "Action: Query RAG\n"
+        "Action Input: praias"
+    )
+
+    actions = parse(text)
+
+    assert [(a.tool, a.tool_input) for a in actions] == [
+        ("Weather Forecast", "2025/08/01"),
+        ("DuckDuckGo Search", "shows em Natal"),
+        ("Query RAG", "praias"),
+    ]
+    # Nenhum trecho da resposta se perde: os logs juntos reproduzem o texto
+    assert "".join(a.log for a in actions) == text
+    assert "Também preciso de eventos." in actions[1].log
+
+
+def test_resposta_final():
+    result = parse("Thought: Já tenho tudo.\nFinal Answer: Roteiro pronto!")
+
+    assert isinstance(result, AgentFinish)
+    assert result.return_values == {"output": "Roteiro pronto!"}
+
+
+def test_formato_invalido_volta_ao_modelo():
+    with pytest.raises(OutputParserException) as erro:
+        parse("Vou pensar mais um pouco.")
+
+    assert erro.value.send_to_llm
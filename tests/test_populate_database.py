@@ -0,0 +1,193 @@
+import hashlib
+import os
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain_community")
+canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+
+import chromadb
+
+import chroma_store
+import populate_database
+from index_manifest import IndexManifest
+
+
+class FakeEmbeddings:
+    """Embeddings determinísticos e pequenos, sem modelo."""
+
+    def embed_documents(self, texts):
+        return [[byte / 255 for byte in hashlib.sha256(text.encode("utf-8")).digest()[:8]] for text in texts]
+
+
+def write_pdf(path, pages):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pdf = canvas.Canvas(path)
+    for text in pages:
+        y = 800
+        for line in text.splitlines():
+            pdf.drawString(40, y, line)
+            y -= 14
+        pdf.showPage()
+    pdf.save()
+
+
+def texto(assunto, linhas=3):
+    return "\n".join(f"{assunto}: informação turística número {i} sobre o destino." for i in range(linhas))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Caminhos absolutos: o chromadb reaproveita o cliente aberto para o mesmo caminho
+    monkeypatch.setattr(chroma_store, "CHROMA_PATH", str(tmp_path / "chroma"))
+    client = chromadb.PersistentClient(path=chroma_store.CHROMA_PATH)
+    monkeypatch.setattr(chroma_store, "get_client", lambda: client)
+    return tmp_path
+
+
+def ingest():
+    return populate_database.run_ingestion(
+        populate_database.list_cities(), embeddings=FakeEmbeddings(), load_workers=1
+    )
+
+
+def city_chunks(city="natal"):
+    return chroma_store.get_collection().get(where=chroma_store.city_filter(city), include=["metadatas"])["metadatas"]
+
+
+def create_legacy_store(city, pdf_paths, orphan_chunks=()):
+    """Banco no layout antigo, gerado no Windows: fontes com "\\" e IDs "fonte:página:índice"."""
+    ids, documents, metadatas = [], [], []
+    for pdf_path in pdf_paths:
+        source = pdf_path.replace("/", "\\")
+        por_pagina = {}
+        for chunk in populate_database.load_and_split_pdf(pdf_path):
+            page = chunk.metadata["page"]
+            index = por_pagina.get(page, 0)
+            por_pagina[page] = index + 1
+            ids.append(f"{source}:{page}:{index}")
+            documents.append(chunk.page_content)
+            metadatas.append({"source": source, "page": page, "id": ids[-1]})
+    for i, document in enumerate(orphan_chunks):
+        source = f"pdf\\{city}\\ebook.pdf"
+        ids.append(f"{source}:{i}:0")
+        documents.append(document)
+        metadatas.append({"source": source, "page": i, "id": ids[-1]})
+    legacy = chromadb.PersistentClient(path=chroma_store.city_path(city)).get_or_create_collection("langchain")
+    legacy.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=FakeEmbeddings().embed_documents(documents))
+    return len(ids)
+
+
+def test_migracao_seguida_de_ingestao_nao_duplica(workdir):
+    write_pdf("pdf/natal/guia.pdf", [texto("Ponta Negra"), texto("Forte dos Reis Magos")])
+    total = create_legacy_store("natal", ["pdf/natal/guia.pdf"], orphan_chunks=["Ebook do centro histórico."])
+
+    assert chroma_store.migrate_legacy_stores() == {"natal": total}
+    assert chroma_store.pending_legacy_stores() == {}
+    assert os.path.exists("chroma/natal/bm25.json") and os.path.exists("chroma/natal/poi.json")
+    assert "pdf/natal/guia.pdf" in IndexManifest("chroma/natal").files
+
+    report = ingest()
+
+    chunks = city_chunks()
+    assert len(chunks) == total
+    assert report["total"]["new_chunks"] == 0
+    assert all("\\" not in chunk["source"] for chunk in chunks)
+    # O ebook não está em pdf/, mas os seus chunks são mantidos
+    assert sum(chunk["source"] == "pdf/natal/ebook.pdf" for chunk in chunks) == 1
+    # Os bancos antigos continuam no disco e não são migrados de novo
+    assert os.path.exists("chroma/natal/chroma.sqlite3")
+    assert chroma_store.migrate_legacy_stores() == {}
+
+
+def test_populate_migra_os_bancos_antigos_automaticamente(workdir, monkeypatch):
+    write_pdf("pdf/natal/guia.pdf", [texto("Morro do Careca")])
+    total = create_legacy_store("natal", ["pdf/natal/guia.pdf"])
+    run_ingestion = populate_database.run_ingestion
+    relatorios = []
+
+    def run_ingestion_falso(cities, **kwargs):
+        relatorios.append(run_ingestion(cities, embeddings=FakeEmbeddings(), load_workers=1))
+        return relatorios[-1]
+
+    monkeypatch.setattr(populate_database, "run_ingestion", run_ingestion_falso)
+    monkeypatch.setattr("sys.argv", ["populate_database.py"])
+
+    populate_database.main()
+
+    assert chroma_store.pending_legacy_stores() == {}
+    assert len(city_chunks()) == total
+    assert relatorios[0]["total"]["new_chunks"] == 0
+
+
+def sources(city="natal"):
+    return sorted({chunk["source"] for chunk in city_chunks(city)})
+
+
+def test_pdf_adicionado(workdir):
+    write_pdf("pdf/natal/guia.pdf", [texto("Ponta Negra")])
+    primeiro = ingest()
+    write_pdf("pdf/natal/museus.pdf", [texto("Museu Câmara Cascudo")])
+
+    report = ingest()
+
+    assert report["natal"]["skipped_files"] == 1
+    assert report["total"]["new_chunks"] == len(city_chunks()) - primeiro["total"]["new_chunks"]
+    assert sources() == ["pdf/natal/guia.pdf", "pdf/natal/museus.pdf"]
+    assert ingest()["total"]["new_chunks"] == 0
+
+
+def test_pdf_alterado(workdir):
+    write_pdf("pdf/natal/guia.pdf", [texto("Ponta Negra"), texto("Forte dos Reis Magos")])
+    ingest()
+    antes = {chunk["id"] for chunk in city_chunks()}
+
+    write_pdf("pdf/natal/guia.pdf", [texto("Ponta Negra"), texto("Parque das Dunas")])
+    report = ingest()
+
+    chunks = city_chunks()
+    depois = {chunk["id"] for chunk in chunks}
+    # Só a página alterada é re-embedada
+    assert report["total"]["new_chunks"] == len(depois - antes) > 0
+    assert report["natal"]["deleted_chunks"] == len(antes - depois) > 0
+    assert len(chunks) == len(depois)
+    documentos = chroma_store.get_collection().get(where=chroma_store.city_filter("natal"))["documents"]
+    assert not any("Reis Magos" in documento for documento in documentos)
+
+
+def test_pdf_removido(workdir):
+    write_pdf("pdf/natal/guia.pdf", [texto("Ponta Negra")])
+    write_pdf("pdf/natal/museus.pdf", [texto("Museu Câmara Cascudo")])
+    ingest()
+
+    os.remove("pdf/natal/museus.pdf")
+    report = ingest()
+
+    assert report["natal"]["deleted_chunks"] > 0
+    assert sources() == ["pdf/natal/guia.pdf"]
+    assert "pdf/natal/museus.pdf" not in IndexManifest("chroma/natal").files
+
+
+def test_sem_manifesto_reconstroi_a_cidade(workdir):
+    write_pdf("pdf/natal/guia.pdf", [texto("Ponta Negra")])
+    ingest()
+    total = len(city_chunks())
+    # Base sem manifesto com as fontes gravadas no Windows e um guia que não está em pdf/
+    collection = chroma_store.get_collection()
+    antigos = collection.get(where=chroma_store.city_filter("natal"), include=["embeddings", "documents", "metadatas"])
+    collection.delete(ids=antigos["ids"])
+    collection.add(
+        ids=[f"antigo:{i}" for i in range(total)] + ["ebook:0"],
+        embeddings=list(antigos["embeddings"]) + [antigos["embeddings"][0]],
+        documents=antigos["documents"] + ["Ebook do centro histórico."],
+        metadatas=[{**metadata, "source": "pdf\\natal\\guia.pdf"} for metadata in antigos["metadatas"]]
+        + [{"source": "pdf\\natal\\ebook.pdf", "city": "natal"}],
+    )
+    os.remove("chroma/natal/manifest.json")
+
+    ingest()
+
+    assert len(city_chunks()) == total + 1
+    assert sources() == ["pdf/natal/guia.pdf", "pdf\\natal\\ebook.pdf"]
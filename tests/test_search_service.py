@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from conversation_memory import estimate_tokens
+from search_service import SearchService
+
+
+class FakeBackend:
+    """Backend de busca falso: registra as consultas e pode atrasar ou segurar as respostas."""
+
+    def __init__(self, n_results=3, delays=None, gate=None):
+        self.n_results = n_results
+        self.delays = delays or {}
+        self.gate = gate
+        self.started = threading.Event()
+        self.calls = []
+
+    def results(self, query, max_results):
+        self.calls.append(query)
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        time.sleep(self.delays.get(query, 0))
+        return [
+            {"title": f"{query} {i}", "snippet": f"Trecho {i} sobre {query}.", "link": f"https://exemplo.com/{query}/{i}"}
+            for i in range(min(self.n_results, max_results))
+        ]
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "search_cache.sqlite3")
+
+
+def test_cache_evita_nova_busca(cache_path):
+    backend = FakeBackend()
+    service = SearchService(backend, path=cache_path)
+
+    primeira = service.search_results("shows em Natal", destino="natal")
+    segunda = service.search_results("Shows em natal!", destino="natal")
+
+    assert segunda == primeira
+    assert backend.calls == ["shows em Natal"]
+    assert service.report()["hits"] == 1
+
+    # O cache é persistente e vale para uma nova instância
+    outro = SearchService(FakeBackend(), path=cache_path)
+    assert outro.search_results("shows em Natal", destino="natal") == primeira
+    assert outro.backend.calls == []
+
+
+def test_cache_expirado_busca_de_novo(cache_path):
+    backend = FakeBackend()
+    service = SearchService(backend, path=cache_path, ttl_seconds=0)
+
+    service.search_results("feiras", destino="natal")
+    time.sleep(0.01)
+    service.search_results("feiras", destino="natal")
+
+    assert len(backend.calls) == 2
+
+
+def test_buscas_simultaneas_compartilham_a_chamada(cache_path):
+    gate = threading.Event()
+    backend = FakeBackend(gate=gate)
+    service = SearchService(backend, path=cache_path)
+    resultados = []
+
+    def buscar():
+        resultados.append(service.search_results("festas juninas", destino="caico"))
+
+    threads = [threading.Thread(target=buscar) for _ in range(2)]
+    threads[0].start()
+    assert backend.started.wait(timeout=5)
+    threads[1].start()
+    limite = time.monotonic() + 5
+    while service.report()["shared"] < 1 and time.monotonic() < limite:
+        time.sleep(0.01)
+    gate.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert backend.calls == ["festas juninas"]
+    assert service.report()["shared"] == 1
+    assert len(resultados) == 2 and resultados[0] == resultados[1]
+
+
+def test_prazo_retorna_o_que_chegou(cache_path):
+    backend = FakeBackend(delays={"lenta": 1.0})
+    service = SearchService(backend, path=cache_path, deadline=0.2)
+
+    inicio = time.monotonic()
+    resultados = service.search_results("rapida; lenta")
+    decorrido = time.monotonic() - inicio
+
+    assert decorrido < 0.8
+    assert [r["title"] for r in resultados] == ["rapida 0", "rapida 1", "rapida 2"]
+    assert service.report()["timeouts"] == 1
+
+
+def test_prazo_sem_resultados(cache_path):
+    service = SearchService(FakeBackend(delays={"lenta": 1.0}), path=cache_path, deadline=0.1)
+
+    assert service.search("lenta").startswith("Nenhum resultado encontrado a tempo")
+
+
+def test_orcamento_de_tokens(cache_path):
+    service = SearchService(FakeBackend(n_results=6), path=cache_path, token_budget=40)
+
+    saida = service.search("passeios de buggy; mergulho em Maracajaú")
+    linhas = saida.splitlines()
+
+    assert 0 < len(linhas) < 12
+    assert sum(estimate_tokens(linha) for linha in linhas) <= 40
+    assert all(linha.startswith("- ") for linha in linhas)
@@ -0,0 +1,40 @@
+import time
+
+from sessions import AgentSession, AgentSessionRegistry
+
+
+def create_session(session_id, history=()):
+    return AgentSession(session_id, memory=list(history), travel_executor=None, parallel_travel_executor=None, calendar_executor=None)
+
+
+def test_sessao_descartada_e_recriada_com_o_historico():
+    registry = AgentSessionRegistry(create_session, idle_timeout=0.01)
+    historico = [{"role": "user", "content": "Quero ir a Pipa"}, {"role": "assistant", "content": "Para quando?"}]
+
+    primeira = registry.get("a", historico)
+    time.sleep(0.02)
+    segunda = registry.get("a", historico)
+
+    assert segunda is not primeira
+    assert segunda.memory == historico
+    assert registry.stats == {"created": 2, "evicted_idle": 1, "evicted_capacity": 0}
+
+
+def test_sessao_em_andamento_nao_e_descartada():
+    registry = AgentSessionRegistry(create_session, max_sessions=1, idle_timeout=0.01)
+    ocupada = registry.get("a")
+    with ocupada.lock:
+        time.sleep(0.02)
+        registry.get("b")
+        registry.get("c")
+
+        assert registry.peek("a") is ocupada
+    assert registry.peek("b") is None
+    assert len(registry) == 2
+
+
+def test_peek_nao_cria_sessao():
+    registry = AgentSessionRegistry(create_session)
+
+    assert registry.peek("a") is None
+    assert len(registry) == 0 and registry.stats["created"] == 0
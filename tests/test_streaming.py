@@ -0,0 +1,91 @@
+import threading
+from uuid import uuid4
+
+import streaming
+from streaming import TOOL_STATUS, StreamlitAgentCallbackHandler
+
+
+class FakeStatus:
+    def __init__(self):
+        self.updates = []
+        self.lines = []
+
+    def update(self, **kwargs):
+        self.updates.append(kwargs)
+
+    def write(self, text):
+        self.lines.append(text)
+
+
+class FakePlaceholder:
+    def __init__(self):
+        self.text = ""
+
+    def markdown(self, text):
+        self.text = text
+
+
+def responder(handler, texto, parent_run_id):
+    run_id = uuid4()
+    handler.on_chat_model_start({}, [], run_id=run_id, parent_run_id=parent_run_id)
+    for token in texto.split(" "):
+        handler.on_llm_new_token(token + " ", run_id=run_id, parent_run_id=parent_run_id)
+
+
+def test_agente_aninhado_nao_encerra_o_turno():
+    status, placeholder = FakeStatus(), FakePlaceholder()
+    handler = StreamlitAgentCallbackHandler(status, placeholder)
+    agente = uuid4()
+    handler.on_chain_start({}, {}, run_id=agente, parent_run_id=None)
+
+    ferramenta = uuid4()
+    handler.on_tool_start({"name": "Calendar Agent"}, "criar evento", run_id=ferramenta, parent_run_id=agente)
+    agente_calendario = uuid4()
+    handler.on_chain_start({}, {}, run_id=agente_calendario, parent_run_id=ferramenta)
+    responder(handler, "Final Answer: evento criado", agente_calendario)
+    handler.on_agent_finish(None, run_id=agente_calendario, parent_run_id=ferramenta)
+    handler.on_tool_end("evento criado", run_id=ferramenta, parent_run_id=agente)
+
+    assert handler.answer == ""
+    assert all(update.get("state") != "complete" for update in status.updates)
+
+    responder(handler, "Final Answer: Roteiro pronto", agente)
+    handler.on_agent_finish(None, run_id=agente, parent_run_id=None)
+
+    assert handler.answer.strip() == "Roteiro pronto"
+    assert status.updates[-1]["state"] == "complete"
+
+
+def test_status_das_ferramentas():
+    status = FakeStatus()
+    handler = StreamlitAgentCallbackHandler(status, FakePlaceholder())
+
+    handler.on_tool_start({"name": "List Attractions"}, "praias", run_id=uuid4(), parent_run_id=uuid4())
+
+    assert status.lines == [f"🔧 {TOOL_STATUS['List Attractions']} praias…"]
+
+
+def test_ferramentas_em_outras_threads_recebem_o_contexto_do_script(monkeypatch):
+    contextos = {threading.current_thread(): "contexto do script"}
+    monkeypatch.setattr(streaming, "get_script_run_ctx", lambda suppress_warning=False: contextos.get(threading.current_thread()))
+    monkeypatch.setattr(streaming, "add_script_run_ctx", lambda thread, ctx: contextos.__setitem__(thread, ctx))
+
+    class StatusDaSessao(FakeStatus):
+        def write(self, text):
+            # O Streamlit só entrega a atualização se a thread tiver o contexto do script
+            assert streaming.get_script_run_ctx() == "contexto do script"
+            super().write(text)
+
+    status = StatusDaSessao()
+    handler = StreamlitAgentCallbackHandler(status, FakePlaceholder())
+    # Como no modo paralelo: a ferramenta roda em uma thread do executor
+    worker = threading.Thread(
+        target=handler.on_tool_start,
+        args=({"name": "Calendar Agent"}, "criar evento"),
+        kwargs={"run_id": uuid4(), "parent_run_id": uuid4()},
+    )
+    worker.start()
+    worker.join()
+
+    assert status.lines == [f"🔧 {TOOL_STATUS['Calendar Agent']} criar evento…"]
+    assert contextos[worker] == "contexto do script"
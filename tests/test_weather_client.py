@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+
+import pytest
+
+from weather_client import MAX_FORECAST_DAYS, WeatherClient, parse_date_range
+
+
+def test_intervalo_de_datas():
+    assert parse_date_range("2025/08/01 - 2025/08/03") == [date(2025, 8, 1), date(2025, 8, 2), date(2025, 8, 3)]
+    assert parse_date_range("03/08/2025 a 01/08/2025") == [date(2025, 8, 1), date(2025, 8, 2), date(2025, 8, 3)]
+    assert parse_date_range("2025-08-01") == [date(2025, 8, 1)]
+
+
+def test_intervalo_acima_do_horizonte():
+    assert len(parse_date_range("2025/08/01 - 2025/08/14")) == MAX_FORECAST_DAYS
+    with pytest.raises(ValueError, match="no máximo 14 dias"):
+        parse_date_range("2025/08/01 - 2025/08/15")
+    with pytest.raises(ValueError):
+        parse_date_range("2025/01/01 - 2025/12/31")
+
+
+def test_data_alem_do_horizonte_nao_chama_a_api():
+    client = WeatherClient(api_key="chave")
+    dias = [date.today() + timedelta(days=MAX_FORECAST_DAYS), date.today() + timedelta(days=40)]
+
+    resultados = client.forecast_range("natal", dias)
+
+    assert all(isinstance(resultado, ValueError) for resultado in resultados)
+    assert client.stats["misses"] == 0
@@ -0,0 +1,271 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Arquivo JSONL com um span por linha, no formato de span do OpenTelemetry.
+# Vazio desativa a exportação; os spans continuam disponíveis em memória.
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+MAX_ATTRIBUTE_CHARS = 200
+
+# Chains do LangChain registradas como spans; as demais (prompt, parser,
+# RunnableSequence...) só repassam o pai para os spans abaixo delas
+TRACED_CHAINS = {"AgentExecutor"}
+
+# Trace do turno em andamento e span aberto no contexto atual (ferramenta, LLM ou operação)
+_trace_atual = contextvars.ContextVar("trace_atual", default=None)
+_span_atual = contextvars.ContextVar("span_atual", default=None)
+_export_lock = threading.Lock()
+
+
+def _truncate(value) -> str:
+    value = str(value)
+    return value if len(value) <= MAX_ATTRIBUTE_CHARS else value[:MAX_ATTRIBUTE_CHARS - 1] + "…"
+
+
+class Trace:
+    """
+    Spans de um turno da conversa, isto é, de uma execução do AgentExecutor.
+
+    Cada span é um dicionário com "name", "kind" ("agent", "llm", "tool" ou
+    "io"), "start" (epoch em segundos), "duration_ms", "span_id", "parent_id",
+    "status" e "attributes" (tokens, acertos de cache, entrada da ferramenta...).
+    Os spans podem ser registrados de várias threads.
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration_ms = None
+        self.spans = []
+        self._inicio = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def new_span(self, name: str, kind: str, parent=None, span_id: str = None, **attributes) -> dict:
+        return {
+            "name": name,
+            "kind": kind,
+            "start": time.time(),
+            "duration_ms": None,
+            "span_id": span_id or uuid.uuid4().hex[:16],
+            "parent_id": parent["span_id"] if parent else None,
+            "status": "ok",
+            "attributes": attributes,
+            "_inicio": time.perf_counter(),
+        }
+
+    def end_span(self, span: dict, error: BaseException = None):
+        span["duration_ms"] = (time.perf_counter() - span.pop("_inicio")) * 1000
+        if error is not None:
+            span["status"] = "error"
+            span["attributes"]["error"] = _truncate(error)
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self, path: str = TRACE_FILE):
+        """Encerra o turno e acrescenta os seus spans ao arquivo de exportação."""
+        self.duration_ms = (time.perf_counter() - self._inicio) * 1000
+        if path:
+            export_jsonl(self, path)
+
+    def summary(self) -> dict:
+        """
+        Resumo do turno: tempo total, tempo e chamadas do LLM, tokens, acertos de
+        cache e o tempo de cada ferramenta e operação, da mais lenta para a mais rápida.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        llm = [span for span in spans if span["kind"] == "llm"]
+        etapas = {}
+        for span in spans:
+            if span["kind"] in ("tool", "io"):
+                etapa = etapas.setdefault(span["name"], {"name": span["name"], "kind": span["kind"], "calls": 0, "ms": 0.0})
+                etapa["calls"] += 1
+                etapa["ms"] += span["duration_ms"]
+        return {
+            "total_ms": self.duration_ms,
+            "llm_calls": len(llm),
+            "llm_ms": sum(span["duration_ms"] for span in llm),
+            "input_tokens": sum(span["attributes"].get("input_tokens", 0) for span in llm),
+            "output_tokens": sum(span["attributes"].get("output_tokens", 0) for span in llm),
+            "cache_hits": sum(span["attributes"].get("cache_hits", 0) for span in spans),
+            "errors": sum(span["status"] == "error" for span in spans),
+            "steps": sorted(etapas.values(), key=lambda etapa: etapa["ms"], reverse=True),
+        }
+
+
+def to_otel(trace: Trace, span: dict) -> dict:
+    """Converte um span para o formato JSON de span do OpenTelemetry."""
+    inicio_ns = int(span["start"] * 1e9)
+    return {
+        "traceId": trace.trace_id,
+        "spanId": span["span_id"],
+        "parentSpanId": span["parent_id"] or "",
+        "name": span["name"],
+        "kind": span["kind"],
+        "startTimeUnixNano": inicio_ns,
+        "endTimeUnixNano": inicio_ns + int(span["duration_ms"] * 1e6),
+        "attributes": {**trace.attributes, **span["attributes"]},
+        "status": {"code": "ERROR" if span["status"] == "error" else "OK"},
+    }
+
+
+def export_jsonl(trace: Trace, path: str = TRACE_FILE):
+    linhas = [json.dumps(to_otel(trace, span), ensure_ascii=False, default=str) for span in trace.spans]
+    with _export_lock, open(path, "a", encoding="utf-8") as f:
+        f.writelines(linha + "\n" for linha in linhas)
+
+
+@contextmanager
+def activate(trace: Trace):
+    """Torna `trace` o trace do turno no contexto atual (e nas threads que o copiarem)."""
+    token = _trace_atual.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace_atual.reset(token)
+
+
+@contextmanager
+def span(name: str, kind: str = "io", **attributes):
+    """
+    Registra uma operação (chamada HTTP, embedding, consulta à API) como span
+    filho do span aberto no contexto. Fora de um turno rastreado, não faz nada.
+
+    Yields:
+        dict: Os atributos do span, que podem ser completados dentro do bloco.
+    """
+    trace = _trace_atual.get()
+    if trace is None:
+        yield attributes
+        return
+    registro = trace.new_span(name, kind, parent=_span_atual.get(), **attributes)
+    token = _span_atual.set(registro)
+    try:
+        yield registro["attributes"]
+    except BaseException as e:
+        trace.end_span(registro, error=e)
+        raise
+    else:
+        trace.end_span(registro)
+    finally:
+        _span_atual.reset(token)
+
+
+def count(attribute: str = "cache_hits", value: int = 1):
+    """Soma `value` a um contador (ex.: acertos de cache) do span aberto no contexto."""
+    registro = _span_atual.get()
+    if registro is not None:
+        registro["attributes"][attribute] = registro["attributes"].get(attribute, 0) + value
+
+
+def _token_usage(response) -> dict:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return {"input_tokens": usage.get("input_tokens", 0), "output_tokens": usage.get("output_tokens", 0)}
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return {"input_tokens": usage.get("prompt_tokens", 0), "output_tokens": usage.get("completion_tokens", 0)}
+    return {}
+
+
+def _model_name(serialized, kwargs) -> str:
+    return (kwargs.get("invocation_params") or {}).get("model") or (serialized or {}).get("name") or "llm"
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Registra no trace do turno um span por execução de agente, chamada ao LLM
+    (com os tokens) e ferramenta, aninhados pelos `run_id` do LangChain.
+
+    Enquanto uma ferramenta ou chamada ao LLM roda, o seu span fica aberto no
+    contexto, de modo que `span()` e `count()` usados dentro dela (HTTP,
+    embedding, caches) ficam pendurados nele. O agente de calendário, chamado
+    de dentro de uma ferramenta, herda os callbacks e aparece como filho dela.
+    """
+
+    # Executa no contexto da própria execução também no modo assíncrono
+    run_inline = True
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self._abertos = {}
+        # run_id -> span registrado mais próximo (o próprio ou o de um ancestral)
+        self._spans_por_run = {}
+
+    def _start(self, run_id, parent_run_id, name: str, kind: str, **attributes):
+        parent = self._spans_por_run.get(parent_run_id)
+        # Os últimos 16 dígitos do run_id são aleatórios também nos UUIDs v7 do LangChain
+        registro = self.trace.new_span(name, kind, parent=parent, span_id=run_id.hex[-16:], **attributes)
+        self._spans_por_run[run_id] = registro
+        self._abertos[run_id] = (registro, _span_atual.get())
+        _span_atual.set(registro)
+
+    def _end(self, run_id, error: BaseException = None, **attributes):
+        aberto = self._abertos.pop(run_id, None)
+        if aberto is None:
+            return
+        registro, anterior = aberto
+        registro["attributes"].update(attributes)
+        self.trace.end_span(registro, error=error)
+        _span_atual.set(anterior)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "")
+        if name in TRACED_CHAINS:
+            entrada = inputs.get("input", "") if isinstance(inputs, dict) else inputs
+            self._start(run_id, parent_run_id, name, "agent", input=_truncate(entrada))
+        else:
+            self._spans_por_run[run_id] = self._spans_por_run.get(parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, _model_name(serialized, kwargs), "llm")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, _model_name(serialized, kwargs), "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id, **_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name", "tool")
+        self._start(run_id, parent_run_id, name, "tool", input=_truncate(input_str))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, output_chars=len(str(output)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+
+def format_summary(summary: dict) -> str:
+    """Formata o resumo de um turno em linhas curtas para a barra lateral."""
+    linhas = [
+        f"Total: {summary['total_ms'] / 1000:.1f} s",
+        f"LLM: {summary['llm_ms'] / 1000:.1f} s em {summary['llm_calls']} chamada(s), "
+        f"{summary['input_tokens']} tokens de entrada e {summary['output_tokens']} de saída",
+    ]
+    for etapa in summary["steps"]:
+        linhas.append(f"{etapa['name']}: {etapa['ms'] / 1000:.2f} s ({etapa['calls']}x)")
+    if summary["cache_hits"]:
+        linhas.append(f"Acertos de cache: {summary['cache_hits']}")
+    if summary["errors"]:
+        linhas.append(f"Erros: {summary['errors']}")
+    return "\n".join(linhas)
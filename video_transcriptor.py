@@ -1,95 +1,247 @@
-from moviepy.editor import *
-import whisper
+import argparse
+import json
 import os
+import re
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 
 # Caminho da pasta principal com as subpastas de vídeos e onde os PDFs serão salvos
-videos_root_folder = "pasta_com_videos"  # Pasta principal contendo as subpastas por cidade
-pdf_root_folder = "pdf"  # Pasta principal para salvar os PDFs
+VIDEOS_ROOT_PATH = "pasta_com_videos"  # Pasta principal contendo as subpastas por cidade
+PDF_ROOT_PATH = "pdf"  # Pasta principal para salvar os PDFs
+MANIFEST_FILE = "transcricoes.json"  # Vídeos já transcritos, salvo na pasta de vídeos
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
 
-# Criar a pasta PDF principal, caso não exista
-if not os.path.exists(pdf_root_folder):
-    os.makedirs(pdf_root_folder)
-
-# Carregar o modelo Whisper
-modelo = whisper.load_model("base")
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+DEFAULT_WORKERS = 2
 
 # Configurações da página PDF
 page_width, page_height = letter
 margin_left = 50
 margin_top = 750
+margin_bottom = 50
 line_spacing = 14
 line_length = 90  # Limite de caracteres por linha (ajuste conforme necessário)
 
-# Iterar pelas subpastas dentro da pasta principal de vídeos
-for city_folder in os.listdir(videos_root_folder):
-    city_path = os.path.join(videos_root_folder, city_folder)
-    
-    if os.path.isdir(city_path):  # Verificar se é uma pasta (cidade)
-        # Criar a subpasta correspondente na pasta PDF
-        city_pdf_folder = os.path.join(pdf_root_folder, city_folder)
-        if not os.path.exists(city_pdf_folder):
-            os.makedirs(city_pdf_folder)
-        
-        # Contador para nomear os arquivos de transcrição dentro da cidade
-        contador = 1
-        
-        # Iterar pelos arquivos de vídeo dentro da subpasta da cidade
-        for video_filename in os.listdir(city_path):
-            if video_filename.endswith(('.mp4', '.avi', '.mov')):  # Filtrar apenas arquivos de vídeo
-                # Caminho completo do arquivo de vídeo
-                video_path = os.path.join(city_path, video_filename)
-                
-                # Carregar o vídeo
-                video = VideoFileClip(video_path)
-                
-                # Extrair áudio do vídeo e salvar como um arquivo WAV temporário
-                audio_path = "audio_extraido.wav"
-                video.audio.write_audiofile(audio_path, codec='pcm_s16le')
-                
-                # Transcrever o áudio
-                result = modelo.transcribe(audio_path)
-                
-                # Nome do arquivo PDF
-                pdf_filename = f"transcription_{contador}.pdf"
-                pdf_path = os.path.join(city_pdf_folder, pdf_filename)
-                
-                # Criar o PDF e adicionar o texto transcrito
-                c = canvas.Canvas(pdf_path, pagesize=letter)
-                text = result["text"]
-                
-                # Configurar o texto no PDF
-                c.setFont("Helvetica", 12)  # Fonte e tamanho
-                c.drawString(margin_left, margin_top, f"Transcrição do vídeo: {video_filename}")  # Título
-                
-                # Posição inicial do texto
-                y_position = margin_top - 30
-                
-                # Adicionar o texto transcrito ao PDF, quebrando em linhas menores
-                for paragraph in text.split("\n"):
-                    while len(paragraph) > 0:
-                        # Pegar um trecho que caiba na linha
-                        line = paragraph[:line_length]
-                        paragraph = paragraph[line_length:]
-                        
-                        # Adicionar a linha ao PDF
-                        c.drawString(margin_left, y_position, line.strip())
-                        y_position -= line_spacing
-                        
-                        # Se chegar ao final da página, criar uma nova
-                        if y_position < 50:
-                            c.showPage()
-                            c.setFont("Helvetica", 12)
-                            y_position = margin_top
-
-                # Salvar o PDF
-                c.save()
-                
-                # Excluir o arquivo de áudio temporário
-                os.remove(audio_path)
-                
-                # Incrementar o contador para o próximo arquivo
-                contador += 1
-
-print(f"Transcrições concluídas e salvas como PDFs na pasta '{pdf_root_folder}'.")
+# Modelo Whisper de cada processo do pool, carregado uma vez por processo
+_modelo = None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=WHISPER_MODEL, help="Tamanho do modelo Whisper (tiny, base, small, medium, large).")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Número de processos de transcrição.")
+    parser.add_argument("--videos", default=VIDEOS_ROOT_PATH, help="Pasta com uma subpasta de vídeos por cidade.")
+    parser.add_argument("--force", action="store_true", help="Transcreve novamente os vídeos já concluídos.")
+    args = parser.parse_args()
+
+    report = transcribe_all(args.videos, model_name=args.model, workers=args.workers, force=args.force)
+    print_report(report)
+    print(f"Transcrições concluídas e salvas como PDFs na pasta '{PDF_ROOT_PATH}'.")
+
+
+def transcribe_all(videos_root: str = VIDEOS_ROOT_PATH, model_name: str = WHISPER_MODEL,
+                   workers: int = DEFAULT_WORKERS, force: bool = False) -> dict:
+    """
+    Transcreve os vídeos de cada cidade para PDFs em `pdf/<cidade>/`.
+
+    Os vídeos são distribuídos entre `workers` processos, cada um com o seu
+    próprio modelo Whisper. O áudio é decodificado direto para um array de
+    16 kHz em memória (sem WAV intermediário) e cada PDF é escrito em um arquivo
+    temporário próprio, renomeado ao final. Os vídeos concluídos ficam no
+    manifesto, então uma execução interrompida continua de onde parou.
+
+    Returns:
+        dict: Métricas de tempo por vídeo e o total.
+    """
+    manifest_path = os.path.join(videos_root, MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
+    inicio = time.perf_counter()
+
+    videos = list_videos(videos_root)
+    tasks = []
+    for city, video_path in videos:
+        entry = manifest.get(video_path)
+        if not force and is_done(entry, video_path, model_name):
+            continue
+        city_pdf_folder = os.path.join(PDF_ROOT_PATH, city)
+        os.makedirs(city_pdf_folder, exist_ok=True)
+        # Um vídeo refeito mantém o seu PDF; os novos recebem o próximo número livre da cidade
+        pdf_path = entry["pdf"] if entry else next_pdf_path(city_pdf_folder, manifest, tasks)
+        tasks.append((video_path, pdf_path))
+
+    report = {"videos": {}, "skipped": len(videos) - len(tasks)}
+    if tasks:
+        print(f"🔄 Transcrevendo {len(tasks)} vídeo(s) com o modelo '{model_name}' em {workers} processo(s)")
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(model_name, workers)) as executor:
+            futures = {executor.submit(transcribe_video, video_path, pdf_path): video_path for video_path, pdf_path in tasks}
+            for future in as_completed(futures):
+                video_path = futures[future]
+                metrics = future.result()
+                report["videos"][video_path] = metrics
+                stat = os.stat(video_path)
+                manifest[video_path] = {
+                    "pdf": metrics["pdf"],
+                    "model": model_name,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "metrics": metrics,
+                }
+                # Salvo a cada vídeo para que uma interrupção não perca os já concluídos
+                save_manifest(manifest_path, manifest)
+                print(f"✅ {video_path} -> {metrics['pdf']} ({metrics['total_s']:.1f}s)")
+
+    report["total"] = {"videos": len(tasks), "elapsed_s": time.perf_counter() - inicio}
+    return report
+
+
+def init_worker(model_name: str, workers: int):
+    """
+    Carrega o modelo Whisper no processo do pool, dividindo os núcleos entre os processos.
+    """
+    global _modelo
+    import torch
+    import whisper
+
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    _modelo = whisper.load_model(model_name)
+
+
+def transcribe_video(video_path: str, pdf_path: str) -> dict:
+    """
+    Transcreve um vídeo e escreve o PDF. Executada nos processos do pool.
+
+    Returns:
+        dict: Tempos de decodificação, transcrição e escrita do PDF, em segundos,
+            a duração do áudio e o fator de tempo real (tempo total / duração).
+    """
+    from whisper.audio import SAMPLE_RATE, load_audio
+
+    inicio = time.perf_counter()
+    # O ffmpeg decodifica o áudio do vídeo direto para float32 mono em 16 kHz
+    audio = load_audio(video_path)
+    decode_s = time.perf_counter() - inicio
+
+    inicio_transcricao = time.perf_counter()
+    result = _modelo.transcribe(audio)
+    transcribe_s = time.perf_counter() - inicio_transcricao
+
+    inicio_pdf = time.perf_counter()
+    write_pdf(pdf_path, os.path.basename(video_path), (segment["text"] for segment in result["segments"]))
+    pdf_s = time.perf_counter() - inicio_pdf
+
+    audio_s = len(audio) / SAMPLE_RATE
+    total_s = time.perf_counter() - inicio
+    return {
+        "pdf": pdf_path,
+        "audio_s": audio_s,
+        "decode_s": decode_s,
+        "transcribe_s": transcribe_s,
+        "pdf_s": pdf_s,
+        "total_s": total_s,
+        "realtime_factor": total_s / audio_s if audio_s else 0.0,
+    }
+
+
+def write_pdf(pdf_path: str, video_filename: str, segments):
+    """
+    Escreve a transcrição em um PDF, segmento a segmento, quebrando em linhas menores.
+
+    O PDF é gerado em um arquivo temporário e renomeado ao final, para que um
+    processo interrompido não deixe um PDF pela metade em `pdf/`.
+    """
+    tmp_path = f"{pdf_path}.tmp"
+    c = canvas.Canvas(tmp_path, pagesize=letter)
+    c.setFont("Helvetica", 12)  # Fonte e tamanho
+    c.drawString(margin_left, margin_top, f"Transcrição do vídeo: {video_filename}")  # Título
+
+    # Posição inicial do texto
+    y_position = margin_top - 30
+    for segment in segments:
+        for line in textwrap.wrap(segment.strip(), line_length):
+            c.drawString(margin_left, y_position, line)
+            y_position -= line_spacing
+
+            # Se chegar ao final da página, criar uma nova
+            if y_position < margin_bottom:
+                c.showPage()
+                c.setFont("Helvetica", 12)
+                y_position = margin_top
+
+    c.save()
+    os.replace(tmp_path, pdf_path)
+
+
+def list_videos(videos_root: str) -> list[tuple[str, str]]:
+    """
+    Retorna os pares (cidade, vídeo) de cada subpasta de cidade, em ordem.
+    """
+    return [
+        (city_folder, os.path.join(videos_root, city_folder, video_filename))
+        for city_folder in sorted(os.listdir(videos_root))
+        if os.path.isdir(os.path.join(videos_root, city_folder))
+        for video_filename in sorted(os.listdir(os.path.join(videos_root, city_folder)))
+        if video_filename.endswith(VIDEO_EXTENSIONS)
+    ]
+
+
+def next_pdf_path(city_pdf_folder: str, manifest: dict, tasks: list) -> str:
+    """
+    Retorna o próximo `transcription_<n>.pdf` livre da cidade, considerando os
+    arquivos existentes, o manifesto e as tarefas já agendadas.
+    """
+    taken = set(os.listdir(city_pdf_folder))
+    taken |= {os.path.basename(entry["pdf"]) for entry in manifest.values()
+              if os.path.dirname(entry["pdf"]) == city_pdf_folder}
+    taken |= {os.path.basename(pdf_path) for _video, pdf_path in tasks
+              if os.path.dirname(pdf_path) == city_pdf_folder}
+    numeros = [int(m.group(1)) for name in taken if (m := re.fullmatch(r"transcription_(\d+)\.pdf", name))]
+    return os.path.join(city_pdf_folder, f"transcription_{max(numeros, default=0) + 1}.pdf")
+
+
+def is_done(entry: dict, video_path: str, model_name: str) -> bool:
+    """
+    Verifica se o vídeo já foi transcrito com o mesmo modelo, não mudou
+    desde então e o PDF gerado ainda existe.
+    """
+    if entry is None or entry["model"] != model_name or not os.path.exists(entry["pdf"]):
+        return False
+    stat = os.stat(video_path)
+    return entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+
+def load_manifest(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: str, manifest: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def print_report(report: dict):
+    """
+    Exibe o tempo de cada etapa por vídeo e o total.
+    """
+    for video_path, metrics in report["videos"].items():
+        print(
+            f"📊 {video_path}: {metrics['audio_s']:.0f}s de áudio, decodificação {metrics['decode_s']:.1f}s, "
+            f"transcrição {metrics['transcribe_s']:.1f}s, PDF {metrics['pdf_s']:.1f}s "
+            f"({metrics['realtime_factor']:.2f}x tempo real)"
+        )
+    total = report["total"]
+    print(
+        f"📊 Total: {total['videos']} vídeo(s) em {total['elapsed_s']:.1f}s, "
+        f"{report['skipped']} já transcrito(s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from tracing import count, span
+
+BASE_URL = "http://api.weatherapi.com/v1/forecast.json"
+REQUEST_TIMEOUT = (3.05, 10)
+MAX_WORKERS = 8
+
+# Previsões próximas mudam a cada atualização do modelo (cerca de 1h na WeatherAPI);
+# previsões distantes variam pouco, então podem ficar mais tempo em cache.
+SHORT_RANGE_TTL = 30 * 60
+LONG_RANGE_TTL = 3 * 60 * 60
+SHORT_RANGE_DAYS = 2
+
+# Horizonte do endpoint de previsão da WeatherAPI: hoje e os 13 dias seguintes
+MAX_FORECAST_DAYS = 14
+
+
+def parse_date(date_string: str) -> date:
+    """
+    Converte uma data nos formatos yyyy/mm/dd, yyyy-mm-dd ou dd/mm/yyyy.
+    """
+    date_string = date_string.strip().strip("'\"")
+    for fmt in ("%Y/%m/%d", "%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(date_string, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: {date_string}")
+
+
+def parse_date_range(date_range: str, max_days: int = MAX_FORECAST_DAYS) -> list[date]:
+    """
+    Converte um intervalo como "2025/08/01 - 2025/08/04" ou "2025/08/01 a 2025/08/04"
+    (ou uma única data) na lista de dias do intervalo.
+
+    Raises:
+        ValueError: Se o intervalo for inválido ou tiver mais de `max_days` dias.
+    """
+    datas = re.findall(r"\d{4}[/-]\d{2}[/-]\d{2}|\d{2}/\d{2}/\d{4}", date_range)
+    if not datas:
+        raise ValueError(f"Intervalo de datas inválido: {date_range}")
+    inicio = parse_date(datas[0])
+    fim = parse_date(datas[-1])
+    if fim < inicio:
+        inicio, fim = fim, inicio
+    n_dias = (fim - inicio).days + 1
+    if n_dias > max_days:
+        raise ValueError(
+            f"O intervalo tem {n_dias} dias, mas a previsão do tempo cobre no máximo {max_days} dias. "
+            f"Consulte um intervalo menor."
+        )
+    return [inicio + timedelta(days=i) for i in range(n_dias)]
+
+
+class WeatherClient:
+    """
+    Cliente da WeatherAPI com conexões reutilizadas, consultas concorrentes
+    e cache das previsões por (destino, data).
+    """
+
+    def __init__(self, api_key: str, max_workers: int = MAX_WORKERS):
+        self.api_key = api_key
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _ttl(self, dia: date) -> float:
+        return SHORT_RANGE_TTL if (dia - date.today()).days <= SHORT_RANGE_DAYS else LONG_RANGE_TTL
+
+    def get_cached(self, destino: str, dia: date):
+        """Retorna a previsão em cache, ou None se não existir ou tiver expirado."""
+        with self._lock:
+            entry = self._cache.get((destino, dia))
+        if entry is not None and time.monotonic() - entry[1] <= self._ttl(dia):
+            return entry[0]
+        return None
+
+    def forecast_day(self, destino: str, dia: date) -> dict:
+        """
+        Obtém o `forecastday` da WeatherAPI para um destino e uma data.
+
+        Returns:
+            dict: O primeiro item de `forecast.forecastday`, ou None se a API
+            não retornar previsão para a data.
+
+        Raises:
+            ValueError: Se a data estiver além do horizonte de `MAX_FORECAST_DAYS` dias.
+        """
+        if (dia - date.today()).days >= MAX_FORECAST_DAYS:
+            raise ValueError(
+                f"A previsão do tempo só está disponível para os próximos {MAX_FORECAST_DAYS} dias."
+            )
+        cached = self.get_cached(destino, dia)
+        if cached is not None:
+            self.stats["hits"] += 1
+            count("cache_hits")
+            return cached
+
+        self.stats["misses"] += 1
+        params = {
+            "key": self.api_key,
+            "q": destino.capitalize(),
+            "dt": dia.isoformat(),
+            "aqi": "no",
+            "alerts": "no",
+            "lang": "pt"
+        }
+        with span("weatherapi", dia=dia.isoformat()):
+            response = self.session.get(BASE_URL, params=params, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+        data = response.json()
+
+        forecastday = None
+        if data and data.get("forecast") and data["forecast"].get("forecastday"):
+            forecastday = data["forecast"]["forecastday"][0]
+            with self._lock:
+                self._cache[(destino, dia)] = (forecastday, time.monotonic())
+        return forecastday
+
+    def forecast_range(self, destino: str, dias: list[date]) -> list:
+        """
+        Obtém as previsões de todos os dias concorrentemente.
+
+        Returns:
+            list: Um item por dia, na mesma ordem: o `forecastday` ou a exceção
+            levantada ao consultá-lo.
+        """
+        # Cada dia roda com uma cópia do contexto, para que as medições fiquem no turno atual
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, self.forecast_day, destino, dia)
+            for dia in dias
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results